@@ -1,69 +1,68 @@
 import streamlit as st
-import openai
 import os
 import json
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from functools import lru_cache
+from llm_runtime import (
+    canonical_request_key, latency_budget, llm_call_stats, load_environment, record_usage,
+    single_flight, submit_background, token_usage_snapshot
+)
+from meal_data import (
+    DAYS, DEFAULT_DIET_TYPE, DIET_TYPES, FALLBACK_TEMPLATES, GROCERY_CATEGORIES,
+    GROCERY_CATEGORY_ORDER, MARINADE_METHODS, MEAL_LABELS, MEAL_TYPES, NUTRIENT_LABELS, NUTRIENTS,
+    PREP_INGREDIENTS, PREP_NOTE_KEYWORDS, PREP_VEGETABLES, SOAK_GRAINS, fallback_template, freeze, thaw
+)
+from chat_cache import cache_key as chat_cache_key, facet_context, response_cache
+from chat_router import answer_locally
+from chat_store import ChatLog
+from ingredients import canonical_id, canonical_key, display_name, normalize
+from model_routing import routed_completion
+from nutrition import fill_meal_nutrition, fill_plan_nutrition
+from plan_validation import PlanStreamValidator, PlanViolation, meal_problem, profile_matchers
+from plan_wire import decode_plan_tsv, plan_format
+from profile_diff import EXCLUSION_FIELDS, changed_fields, compile_exclusions, exclusion_terms, find_excluded_meals, meal_text
+from shared_store import get_store, store_delete, store_get, store_set, store_stats
+from telemetry import observe, span, stage_summary, start_metrics_server, timed
+from ui_profiler import collapsed_stacks, profile_rerun, profiled, profiling_enabled
+from variety_index import VarietyIndex, build_index, find_repeats
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file (once per process)
+load_environment()
 
-def initialize_session_state():
-    """Initialize session state variables"""
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
-    if "user_profile" not in st.session_state:
-        st.session_state.user_profile = {}
-    if "meal_plan" not in st.session_state:
-        st.session_state.meal_plan = {}
-    if "profile_completed" not in st.session_state:
-        st.session_state.profile_completed = False
-    if "grocery_list" not in st.session_state:
-        st.session_state.grocery_list = {}
-    if "prep_reminders" not in st.session_state:
-        st.session_state.prep_reminders = {}
-    if "grocery_checked" not in st.session_state:
-        st.session_state.grocery_checked = {}
-    if "prep_completed" not in st.session_state:
-        st.session_state.prep_completed = {}
+# How often a session checks whether its background meal plan is ready
+PLACEHOLDER_POLL_SECONDS = 1.0
 
-def get_openai_response(messages, user_context=""):
-    """Get response from OpenAI API with user context"""
-    try:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        # Create system message with user context
-        system_message = f"""You are a helpful AI assistant specializing in meal planning and cooking advice. 
-        
-        User Profile Context:
-        {user_context}
-        
-        Use this information to provide personalized recommendations. Always consider the user's dietary restrictions, preferences, and health goals when suggesting meals or recipes."""
-        
-        full_messages = [{"role": "system", "content": system_message}] + messages
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=full_messages,
-            temperature=0.7,
-            max_tokens=1000
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
+# Number of earlier weekly plans checked for repeated meals
+MEAL_HISTORY_WEEKS = 4
 
-def generate_meal_plan(user_profile):
-    """Generate a 7-day meal plan based on user profile"""
-    try:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        profile_text = format_user_profile_for_ai(user_profile)
-        
-        prompt = f"""Create a 7-day meal plan based on this user profile:
+# Chat messages shown per page in the sidebar
+CHAT_PAGE_SIZE = 10
+
+# Above this many meals ruled out by a profile edit, the whole plan is regenerated instead
+PARTIAL_REPLAN_MAX_MEALS = 12
 
-{profile_text}
+# Extra attempts at each slot still missing after a streamed plan is aborted by validation (MEAL_PLANNER_STREAM_VALIDATION)
+STREAM_VALIDATION_RETRIES = int(os.getenv("MEAL_PLANNER_STREAM_VALIDATION_RETRIES", "2"))
+# Replacement meals requested at once while repairing an aborted plan
+STREAM_REPAIR_WORKERS = int(os.getenv("MEAL_PLANNER_STREAM_REPAIR_WORKERS", "4"))
+
+# Lifetimes of entries in the shared store (only used when MEAL_PLANNER_STORE is set)
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("MEAL_PLANNER_PLAN_CACHE_TTL", 7 * 24 * 60 * 60))
+SESSION_TTL_SECONDS = float(os.getenv("MEAL_PLANNER_SESSION_TTL", 30 * 24 * 60 * 60))
+# Query parameter that ties a browser tab to its saved session
+SESSION_QUERY_PARAM = "session"
+
+# Static prompt text is kept byte-identical between calls so that
+# provider-side prompt prefix caching can reuse it
+CHAT_SYSTEM_PROMPT = """You are a helpful AI assistant specializing in meal planning and cooking advice.
+
+The user's profile is provided in the next system message. Use this information to provide personalized recommendations. Always consider the user's dietary restrictions, preferences, and health goals when suggesting meals or recipes."""
+
+MEAL_PLAN_INSTRUCTIONS = """Create a 7-day meal plan for the user profile given in the user message.
 
 CRITICAL REQUIREMENTS:
 1. MAXIMUM VARIETY - NO REPETITIVE MEALS across all 7 days
@@ -75,46 +74,46 @@ CRITICAL REQUIREMENTS:
 7. Respond with ONLY valid JSON. No extra text, no markdown, no explanations.
 
 JSON format:
-{{
-  "Monday": {{
-    "breakfast": {{
-      "meal": "creative specific description", 
-      "ingredients": ["ingredient1", "ingredient2", "ingredient3", "ingredient4"], 
+{
+  "Monday": {
+    "breakfast": {
+      "meal": "creative specific description",
+      "ingredients": ["ingredient1", "ingredient2", "ingredient3", "ingredient4"],
       "prep_notes": "detailed advance preparation timing",
       "calories": 350, "protein": 15, "carbs": 45, "fat": 12, "fiber": 6
-    }},
-    "lunch": {{
-      "meal": "unique cuisine-inspired description", 
-      "ingredients": ["ingredient1", "ingredient2", "ingredient3", "ingredient4"], 
+    },
+    "lunch": {
+      "meal": "unique cuisine-inspired description",
+      "ingredients": ["ingredient1", "ingredient2", "ingredient3", "ingredient4"],
       "prep_notes": "specific prep timing and methods",
       "calories": 450, "protein": 25, "carbs": 55, "fat": 15, "fiber": 8
-    }},
-    "dinner": {{
-      "meal": "diverse protein and cooking method", 
-      "ingredients": ["ingredient1", "ingredient2", "ingredient3", "ingredient4"], 
+    },
+    "dinner": {
+      "meal": "diverse protein and cooking method",
+      "ingredients": ["ingredient1", "ingredient2", "ingredient3", "ingredient4"],
       "prep_notes": "marinating, overnight prep details",
       "calories": 500, "protein": 30, "carbs": 50, "fat": 18, "fiber": 10
-    }},
-    "snack1": {{
-      "meal": "creative healthy snack", 
-      "ingredients": ["ingredient1", "ingredient2"], 
+    },
+    "snack1": {
+      "meal": "creative healthy snack",
+      "ingredients": ["ingredient1", "ingredient2"],
       "prep_notes": "preparation method and timing",
       "calories": 150, "protein": 8, "carbs": 15, "fat": 6, "fiber": 3
-    }},
-    "snack2": {{
-      "meal": "different style snack", 
-      "ingredients": ["ingredient1", "ingredient2"], 
+    },
+    "snack2": {
+      "meal": "different style snack",
+      "ingredients": ["ingredient1", "ingredient2"],
       "prep_notes": "specific prep notes",
       "calories": 120, "protein": 5, "carbs": 12, "fat": 4, "fiber": 2
-    }}
-  }},
-  "Tuesday": {{...completely different meals...}},
-  "Wednesday": {{...totally unique options...}},
-  "Thursday": {{...new flavors and styles...}},
-  "Friday": {{...diverse international options...}},
-  "Saturday": {{...weekend special meals...}},
-  "Sunday": {{...comfort food variety...}}
-}}
+    }
+  },
+  "Tuesday": {...completely different meals...},
+  "Wednesday": {...totally unique options...},
+  "Thursday": {...new flavors and styles...},
+  "Friday": {...diverse international options...},
+  "Saturday": {...weekend special meals...},
+  "Sunday": {...comfort food variety...}
+}
 
 VARIETY EXAMPLES:
 - Breakfasts: overnight oats, scrambled eggs, chia pudding, avocado toast, smoothie bowl, protein pancakes, omelet
@@ -123,236 +122,334 @@ VARIETY EXAMPLES:
 - Prep methods: marinating overnight, soaking grains, defrosting proteins, chopping vegetables night before
 
 Include detailed prep notes with specific timing. Respect dietary restrictions and preferences."""
+
+SINGLE_MEAL_INSTRUCTIONS = """Suggest ONE replacement meal for a slot in a user's weekly meal plan.
+
+Requirements:
+1. Respect the user's dietary restrictions, allergies and dislikes
+2. The meal must be clearly different from every meal listed under "Avoid"
+3. Respond with ONLY a valid JSON object. No extra text, no markdown, no explanations.
+
+JSON format:
+{"meal": "specific description", "ingredients": ["ingredient1", "ingredient2", "ingredient3"], "prep_notes": "advance preparation timing", "calories": 400, "protein": 20, "carbs": 45, "fat": 12, "fiber": 6}"""
+
+# With MEAL_PLANNER_LOCAL_NUTRITION the model only names meals and quantified ingredients;
+# nutrient fields are computed from the bundled nutrient table instead
+MEAL_PLAN_INSTRUCTIONS_LOCAL_NUTRITION = re.sub(r',\n\s*"calories": [^\n]*', "", MEAL_PLAN_INSTRUCTIONS).replace(
+    '["ingredient1", "ingredient2"', '["120 g ingredient1", "1 cup ingredient2"'
+).replace(
+    "7. Respond with ONLY valid JSON.",
+    "7. Give every ingredient with its quantity (grams, cups, tbsp or a count).\n8. Respond with ONLY valid JSON."
+)
+SINGLE_MEAL_INSTRUCTIONS_LOCAL_NUTRITION = re.sub(r', "calories": [^}]*', "", SINGLE_MEAL_INSTRUCTIONS).replace(
+    '["ingredient1", "ingredient2"', '["120 g ingredient1", "1 cup ingredient2"'
+)
+
+# MEAL_PLANNER_PLAN_FORMAT=tsv asks for one tab-separated line per meal (see plan_wire.py),
+# which drops the repeated JSON keys from the output the model has to generate
+_PLAN_REQUIREMENTS, _, _PLAN_FORMAT_AND_EXAMPLES = MEAL_PLAN_INSTRUCTIONS.partition("7. Respond with ONLY valid JSON.")
+_PLAN_EXAMPLES = _PLAN_FORMAT_AND_EXAMPLES[_PLAN_FORMAT_AND_EXAMPLES.index("VARIETY EXAMPLES:"):]
+MEAL_PLAN_INSTRUCTIONS_TSV = _PLAN_REQUIREMENTS + """7. Respond with ONLY the 35 meal lines below. No header, no extra text, no markdown.
+
+Line format, one line per meal, fields separated by a TAB character:
+day<TAB>slot<TAB>meal<TAB>ingredients<TAB>prep_notes<TAB>calories<TAB>protein<TAB>carbs<TAB>fat<TAB>fiber
+
+- day: Mon, Tue, Wed, Thu, Fri, Sat, Sun
+- slot: B (breakfast), L (lunch), D (dinner), S1 (snack 1), S2 (snack 2)
+- ingredients: separated by "; "
+- calories, protein, carbs, fat, fiber: whole numbers (protein, carbs, fat, fiber in grams)
+
+Example:
+Mon	B	creative specific description	ingredient1; ingredient2; ingredient3	detailed advance preparation timing	350	15	45	12	6
+Mon	L	unique cuisine-inspired description	ingredient1; ingredient2; ingredient3; ingredient4	specific prep timing and methods	450	25	55	15	8
+
+""" + _PLAN_EXAMPLES
+MEAL_PLAN_INSTRUCTIONS_TSV_LOCAL_NUTRITION = MEAL_PLAN_INSTRUCTIONS_TSV.replace(
+    "<TAB>prep_notes<TAB>calories<TAB>protein<TAB>carbs<TAB>fat<TAB>fiber", "<TAB>prep_notes"
+).replace(
+    '- ingredients: separated by "; "\n- calories, protein, carbs, fat, fiber: whole numbers (protein, carbs, fat, fiber in grams)',
+    '- ingredients: separated by "; ", each with its quantity (grams, cups, tbsp or a count)'
+).replace("\t350\t15\t45\t12\t6", "").replace("\t450\t25\t55\t15\t8", "").replace(
+    "ingredient1; ingredient2", "120 g ingredient1; 1 cup ingredient2"
+)
+
+JSON_REPAIR_INSTRUCTIONS = """The text below was meant to be a single JSON object but does not parse.
+Return the same data as ONE valid JSON object: fix quoting, commas and brackets, and do not add, drop or change any values.
+Respond with ONLY the JSON object. No extra text, no markdown, no explanations."""
+
+def initialize_session_state():
+    """Initialize session state variables"""
+    if "chat_log" not in st.session_state:
+        st.session_state.chat_log = ChatLog()
+    if "chat_page" not in st.session_state:
+        st.session_state.chat_page = 0
+    if "user_profile" not in st.session_state:
+        st.session_state.user_profile = {}
+    if "meal_plan" not in st.session_state:
+        st.session_state.meal_plan = {}
+    if "profile_completed" not in st.session_state:
+        st.session_state.profile_completed = False
+    if "grocery_list" not in st.session_state:
+        st.session_state.grocery_list = {}
+    if "prep_reminders" not in st.session_state:
+        st.session_state.prep_reminders = {}
+    if "grocery_checked" not in st.session_state:
+        st.session_state.grocery_checked = {}
+    if "prep_completed" not in st.session_state:
+        st.session_state.prep_completed = {}
+    if "pending_meal_plan" not in st.session_state:
+        st.session_state.pending_meal_plan = None
+    if "plan_history" not in st.session_state:
+        st.session_state.plan_history = []
+    if "variety_index" not in st.session_state:
+        st.session_state.variety_index = VarietyIndex()
+    if "repeated_meals" not in st.session_state:
+        st.session_state.repeated_meals = []
+    if "pending_job" not in st.session_state:
+        st.session_state.pending_job = None
+
+def get_openai_response(messages, user_context=""):
+    """Get response from OpenAI API with user context"""
+    try:
+        # Static instructions first so the provider can reuse the cached prefix,
+        # then the per-user context, then the conversation itself
+        full_messages = [
+            {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+            {"role": "system", "content": f"User Profile Context:\n{user_context}"},
+        ] + messages
         
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=3000
-        )
+        with span("chat.llm_request"):
+            response = routed_completion("chat", full_messages)
+        record_usage("chat", response)
+        return response.choices[0].message.content
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+def canonical_profile(profile):
+    """Normalize a user profile so equivalent submissions compare equal"""
+    canonical = {}
+    for key, value in (profile or {}).items():
+        if isinstance(value, str):
+            value = " ".join(value.split()).lower()
+        elif isinstance(value, (list, tuple)):
+            value = sorted(str(item).strip().lower() for item in value)
+        canonical[key] = value
+    return canonical
+
+def meal_plan_key(user_profile):
+    """Key shared by every request for an equivalent profile"""
+    return canonical_request_key("meal_plan", canonical_profile(user_profile))
+
+@timed("meal_plan.total")
+def generate_meal_plan(user_profile, fresh=False):
+    """Generate a 7-day meal plan based on user profile"""
+    key = meal_plan_key(user_profile)
+    
+    # A plan another replica already made for an equivalent profile is reused unless a fresh one is asked for
+    if not fresh:
+        cached = store_get(f"plan:{key}")
+        if cached is not None:
+            return cached
+    
+    # Identical profiles submitted at the same time share one LLM request
+    return single_flight(key, _request_and_share_meal_plan, key, user_profile)
+
+def _request_and_share_meal_plan(key, user_profile):
+    """Request a meal plan and publish it to the shared store if it is a real one"""
+    meal_plan = _request_meal_plan(user_profile)
+    if is_usable_plan(meal_plan) and not meal_plan.get("generated_with_fallback"):
+        store_set(f"plan:{key}", meal_plan, PLAN_CACHE_TTL_SECONDS)
+    return meal_plan
+
+def _request_meal_plan(user_profile):
+    """Request a 7-day meal plan from OpenAI and parse the JSON response"""
+    try:
+        profile_text = format_user_profile_for_ai(user_profile)
+        
+        local_nutrition = bool(os.getenv("MEAL_PLANNER_LOCAL_NUTRITION"))
+        wire_format = plan_format()
+        if wire_format == "tsv":
+            instructions = MEAL_PLAN_INSTRUCTIONS_TSV_LOCAL_NUTRITION if local_nutrition else MEAL_PLAN_INSTRUCTIONS_TSV
+        else:
+            instructions = MEAL_PLAN_INSTRUCTIONS_LOCAL_NUTRITION if local_nutrition else MEAL_PLAN_INSTRUCTIONS
+        
+        # User data goes last so the static instructions form a stable, cacheable prefix
+        messages = [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": f"User profile:\n\n{profile_text}"}
+        ]
+        if os.getenv("MEAL_PLANNER_STREAM_VALIDATION"):
+            return request_validated_plan(messages, user_profile, wire_format, local_nutrition)
+        
+        with span("meal_plan.llm_request"):
+            response = routed_completion("meal_plan", messages)
+        record_usage("meal_plan", response)
+        
+        if wire_format == "tsv":
+            try:
+                with span("meal_plan.decode"):
+                    meal_plan = decode_plan_tsv(response.choices[0].message.content)
+            except ValueError as e:
+                return generate_fallback_meal_plan(user_profile, response.choices[0].message.content, str(e))
+            if local_nutrition:
+                with span("meal_plan.nutrition"):
+                    fill_plan_nutrition(meal_plan)
+            return meal_plan
         
         # Try to parse JSON response
         try:
-            response_content = response.choices[0].message.content.strip()
-            
-            # Remove markdown code blocks if present
-            if response_content.startswith("```json"):
-                response_content = response_content[7:]
-            elif response_content.startswith("```"):
-                response_content = response_content[3:]
-            
-            if response_content.endswith("```"):
-                response_content = response_content[:-3]
-            
-            # Clean up the response
-            response_content = response_content.strip()
-            
-            # Find JSON object boundaries
-            start_idx = response_content.find('{')
-            end_idx = response_content.rfind('}')
+            with span("meal_plan.json_cleanup"):
+                response_content, json_content = clean_json_response(response.choices[0].message.content)
             
-            if start_idx != -1 and end_idx != -1:
-                json_content = response_content[start_idx:end_idx+1]
-                
-                # Additional cleaning - fix common JSON issues
-                json_content = json_content.replace('\n', ' ')
-                json_content = json_content.replace('\t', ' ')
-                # Fix multiple spaces
-                import re
-                json_content = re.sub(r'\s+', ' ', json_content)
-                
-                meal_plan = json.loads(json_content)
+            if json_content is not None:
+                with span("meal_plan.parse"):
+                    meal_plan = json.loads(json_content)
+                if local_nutrition:
+                    with span("meal_plan.nutrition"):
+                        fill_plan_nutrition(meal_plan)
                 return meal_plan
             else:
                 return {"error": "Could not find valid JSON in response", "raw_response": response_content}
                 
         except json.JSONDecodeError as e:
-            # If JSON parsing still fails, try a fallback approach
+            # Ask the repair model to fix the JSON before falling back to a template plan
+            repaired = repair_json_response(json_content, str(e))
+            if repaired is not None:
+                if local_nutrition:
+                    fill_plan_nutrition(repaired)
+                return repaired
             return generate_fallback_meal_plan(user_profile, response.choices[0].message.content, str(e))
             
+    except (TimeoutError, PlanViolation) as e:
+        # Over the latency budget, or no valid plan after every retry: serve the template plan rather than nothing
+        return generate_fallback_meal_plan(user_profile, "", str(e))
     except Exception as e:
         return {"error": f"Failed to generate meal plan: {str(e)}"}
 
-def generate_fallback_meal_plan(user_profile, raw_response, error_msg):
-    """Generate a simple fallback meal plan when JSON parsing fails"""
+def request_validated_plan(messages, user_profile, wire_format, local_nutrition):
+    """Stream the plan through the validator; if it aborts, keep the meals that passed and replace only the rest"""
+    validator = PlanStreamValidator(user_profile, wire_format, require_nutrients=not local_nutrition)
+    started = time.perf_counter()
     try:
-        # Create diverse meal plans for each day
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        fallback_plan = {}
+        with span("meal_plan.llm_request"):
+            response = routed_completion("meal_plan", messages, stream_to=validator)
+        record_usage("meal_plan", response)
+        validator.finish()
+    except PlanViolation:
+        # Time spent on the rejected attempt, to see how much an early abort saves
+        observe("meal_plan.validation_abort", time.perf_counter() - started)
+    
+    meals = validator.meals
+    if local_nutrition:
+        with span("meal_plan.nutrition"):
+            fill_plan_nutrition(meals)
+    missing = [(day, meal_type) for day in DAYS for meal_type in MEAL_TYPES if meal_type not in meals.get(day, {})]
+    if missing:
+        with span("meal_plan.slot_repair"):
+            missing = repair_plan_slots(user_profile, meals, missing, local_nutrition)
+    if missing:
+        day, meal_type = missing[0]
+        raise PlanViolation(f"no valid meal after {STREAM_VALIDATION_RETRIES + 1} attempts", day, meal_type)
+    return {day: {meal_type: meals[day][meal_type] for meal_type in MEAL_TYPES} for day in DAYS}
+
+def repair_plan_slots(user_profile, meals, missing, local_nutrition):
+    """Fill the missing slots of a partial plan with validated replacement meals; returns the slots still missing"""
+    matchers = profile_matchers(user_profile)
+    # Already running on a background worker, so the replacements get their own threads instead of the shared pool
+    with ThreadPoolExecutor(max_workers=max(1, min(len(missing), STREAM_REPAIR_WORKERS))) as pool:
+        for _ in range(STREAM_VALIDATION_RETRIES + 1):
+            updates = regenerate_slots(user_profile, {
+                (day, meal_type): same_slot_meals(meals, meal_type) for day, meal_type in missing
+            }, submit=pool.submit)
+            for (day, meal_type), meal in updates.items():
+                # Same checks as the streamed meals; replacement meals carry their own nutrition
+                if meal_problem(meal, matchers, require_nutrients=not local_nutrition) is None:
+                    meals.setdefault(day, {})[meal_type] = meal
+            missing = [(day, meal_type) for day, meal_type in missing if meal_type not in meals.get(day, {})]
+            if not missing:
+                break
+    return missing
+
+def clean_json_response(response_content):
+    """Strip markdown fences and whitespace noise; return (cleaned text, JSON object text or None)"""
+    response_content = response_content.strip()
+    
+    # Remove markdown code blocks if present
+    if response_content.startswith("```json"):
+        response_content = response_content[7:]
+    elif response_content.startswith("```"):
+        response_content = response_content[3:]
+    
+    if response_content.endswith("```"):
+        response_content = response_content[:-3]
+    
+    # Clean up the response
+    response_content = response_content.strip()
+    
+    # Find JSON object boundaries
+    start_idx = response_content.find('{')
+    end_idx = response_content.rfind('}')
+    
+    if start_idx == -1 or end_idx == -1:
+        return response_content, None
+    
+    json_content = response_content[start_idx:end_idx+1]
+    
+    # Additional cleaning - fix common JSON issues
+    json_content = json_content.replace('\n', ' ')
+    json_content = json_content.replace('\t', ' ')
+    # Fix multiple spaces
+    json_content = re.sub(r'\s+', ' ', json_content)
+    
+    return response_content, json_content
+
+def repair_json_response(broken_json, error_msg):
+    """Have the JSON repair model fix malformed plan JSON; None if that fails too"""
+    try:
+        with span("meal_plan.json_repair"):
+            response = routed_completion("json_repair", [
+                {"role": "system", "content": JSON_REPAIR_INSTRUCTIONS},
+                {"role": "user", "content": f"Parser error: {error_msg}\n\n{broken_json}"}
+            ])
+        record_usage("json_repair", response)
+        _, json_content = clean_json_response(response.choices[0].message.content)
+        return json.loads(json_content) if json_content is not None else None
+    except Exception:
+        return None
+
+def generate_meal_replacement(user_profile, day, meal_type, avoid_meals):
+    """Generate a single replacement meal for one slot of the plan"""
+    try:
+        profile_text = format_user_profile_for_ai(user_profile)
+        avoid_text = "\n".join(f"- {meal}" for meal in avoid_meals) or "- (none)"
         
-        # Define diverse meals for each day
-        daily_meals = {
-            "Monday": {
-                "breakfast": {
-                    "meal": "Overnight oats with fruits and nuts",
-                    "ingredients": ["rolled oats", "banana", "almonds", "blueberries", "milk", "honey"],
-                    "prep_notes": "Mix oats with milk and honey the night before, refrigerate overnight",
-                    "calories": 350, "protein": 12, "carbs": 45, "fat": 10, "fiber": 8
-                },
-                "lunch": {
-                    "meal": "Grilled chicken Caesar salad",
-                    "ingredients": ["chicken breast", "romaine lettuce", "parmesan cheese", "croutons", "caesar dressing"],
-                    "prep_notes": "Marinate chicken with herbs overnight, prepare salad components",
-                    "calories": 450, "protein": 30, "carbs": 25, "fat": 15, "fiber": 6
-                },
-                "dinner": {
-                    "meal": "Baked salmon with quinoa and roasted vegetables",
-                    "ingredients": ["salmon fillet", "quinoa", "broccoli", "bell peppers", "olive oil", "lemon"],
-                    "prep_notes": "Rinse quinoa thoroughly, marinate salmon for 30 minutes",
-                    "calories": 520, "protein": 35, "carbs": 42, "fat": 18, "fiber": 7
-                },
-                "snack1": {"meal": "Greek yogurt with berries", "ingredients": ["Greek yogurt", "mixed berries", "honey"], "prep_notes": "Use chilled yogurt", "calories": 150, "protein": 10, "carbs": 15, "fat": 5, "fiber": 3},
-                "snack2": {"meal": "Apple with almond butter", "ingredients": ["apple", "almond butter"], "prep_notes": "Slice apple fresh", "calories": 120, "protein": 4, "carbs": 12, "fat": 8, "fiber": 4}
-            },
-            "Tuesday": {
-                "breakfast": {
-                    "meal": "Scrambled eggs with whole grain toast",
-                    "ingredients": ["eggs", "whole grain bread", "spinach", "tomatoes", "olive oil"],
-                    "prep_notes": "Use fresh eggs at room temperature for fluffier scramble",
-                    "calories": 340, "protein": 18, "carbs": 30, "fat": 14, "fiber": 5
-                },
-                "lunch": {
-                    "meal": "Mediterranean bowl with hummus",
-                    "ingredients": ["chickpeas", "cucumber", "tomatoes", "feta cheese", "olive oil", "pita bread"],
-                    "prep_notes": "Soak chickpeas overnight if using dried ones",
-                    "calories": 480, "protein": 18, "carbs": 55, "fat": 20, "fiber": 12
-                },
-                "dinner": {
-                    "meal": "Stir-fried tofu with brown rice",
-                    "ingredients": ["firm tofu", "brown rice", "broccoli", "carrots", "soy sauce", "ginger"],
-                    "prep_notes": "Press tofu overnight to remove moisture, cook brown rice in advance",
-                    "calories": 490, "protein": 20, "carbs": 60, "fat": 15, "fiber": 8
-                },
-                "snack1": {"meal": "Smoothie bowl", "ingredients": ["banana", "spinach", "protein powder", "granola"], "prep_notes": "Freeze banana overnight", "calories": 180, "protein": 12, "carbs": 25, "fat": 4, "fiber": 6},
-                "snack2": {"meal": "Hummus with vegetables", "ingredients": ["hummus", "carrots", "celery", "bell peppers"], "prep_notes": "Pre-cut vegetables", "calories": 110, "protein": 5, "carbs": 10, "fat": 6, "fiber": 4}
-            },
-            "Wednesday": {
-                "breakfast": {
-                    "meal": "Chia pudding with tropical fruits",
-                    "ingredients": ["chia seeds", "coconut milk", "mango", "pineapple", "honey"],
-                    "prep_notes": "Prepare chia pudding the night before, let it set in refrigerator",
-                    "calories": 320, "protein": 8, "carbs": 35, "fat": 16, "fiber": 12
-                },
-                "lunch": {
-                    "meal": "Turkey and avocado wrap",
-                    "ingredients": ["turkey slices", "avocado", "tortilla", "lettuce", "tomatoes", "mustard"],
-                    "prep_notes": "Use fresh ingredients, prepare vegetables in advance",
-                    "calories": 420, "protein": 25, "carbs": 35, "fat": 18, "fiber": 8
-                },
-                "dinner": {
-                    "meal": "Lean beef stir-fry with vegetables",
-                    "ingredients": ["lean beef", "mixed vegetables", "jasmine rice", "garlic", "soy sauce"],
-                    "prep_notes": "Marinate beef for 2 hours, prep vegetables night before",
-                    "calories": 510, "protein": 32, "carbs": 45, "fat": 16, "fiber": 6
-                },
-                "snack1": {"meal": "Protein energy balls", "ingredients": ["dates", "almonds", "protein powder", "coconut"], "prep_notes": "Make energy balls in advance and refrigerate", "calories": 140, "protein": 8, "carbs": 12, "fat": 7, "fiber": 3},
-                "snack2": {"meal": "Cottage cheese with fruit", "ingredients": ["cottage cheese", "peaches", "cinnamon"], "prep_notes": "Use chilled cottage cheese", "calories": 130, "protein": 12, "carbs": 15, "fat": 2, "fiber": 2}
-            },
-            "Thursday": {
-                "breakfast": {
-                    "meal": "Avocado toast with poached egg",
-                    "ingredients": ["whole grain bread", "avocado", "eggs", "tomatoes", "lime", "pepper"],
-                    "prep_notes": "Use ripe avocado, prepare fresh",
-                    "calories": 380, "protein": 16, "carbs": 30, "fat": 22, "fiber": 10
-                },
-                "lunch": {
-                    "meal": "Lentil soup with crusty bread",
-                    "ingredients": ["red lentils", "vegetables", "vegetable broth", "bread", "herbs"],
-                    "prep_notes": "Soak lentils for 2 hours, chop vegetables night before",
-                    "calories": 440, "protein": 20, "carbs": 65, "fat": 8, "fiber": 15
-                },
-                "dinner": {
-                    "meal": "Grilled chicken with sweet potato",
-                    "ingredients": ["chicken thighs", "sweet potato", "asparagus", "herbs", "olive oil"],
-                    "prep_notes": "Marinate chicken overnight, pre-cut sweet potato",
-                    "calories": 500, "protein": 35, "carbs": 40, "fat": 18, "fiber": 8
-                },
-                "snack1": {"meal": "Trail mix", "ingredients": ["nuts", "dried fruits", "dark chocolate"], "prep_notes": "Store in airtight container", "calories": 160, "protein": 5, "carbs": 15, "fat": 10, "fiber": 3},
-                "snack2": {"meal": "Vegetable smoothie", "ingredients": ["cucumber", "celery", "apple", "lime"], "prep_notes": "Use fresh vegetables", "calories": 100, "protein": 2, "carbs": 20, "fat": 1, "fiber": 5}
-            },
-            "Friday": {
-                "breakfast": {
-                    "meal": "Protein pancakes with berries",
-                    "ingredients": ["protein powder", "banana", "eggs", "oats", "berries"],
-                    "prep_notes": "Prepare batter the night before, cook fresh",
-                    "calories": 360, "protein": 25, "carbs": 35, "fat": 12, "fiber": 6
-                },
-                "lunch": {
-                    "meal": "Asian-style poke bowl",
-                    "ingredients": ["tuna", "sushi rice", "edamame", "cucumber", "sesame oil"],
-                    "prep_notes": "Use sushi-grade fish, prepare rice in advance",
-                    "calories": 460, "protein": 28, "carbs": 50, "fat": 14, "fiber": 5
-                },
-                "dinner": {
-                    "meal": "Vegetable curry with basmati rice",
-                    "ingredients": ["mixed vegetables", "coconut milk", "curry spices", "basmati rice"],
-                    "prep_notes": "Soak basmati rice for 30 minutes, prep vegetables",
-                    "calories": 470, "protein": 12, "carbs": 70, "fat": 16, "fiber": 10
-                },
-                "snack1": {"meal": "Banana with peanut butter", "ingredients": ["banana", "peanut butter"], "prep_notes": "Use natural peanut butter", "calories": 170, "protein": 6, "carbs": 20, "fat": 8, "fiber": 3},
-                "snack2": {"meal": "Herbal tea with honey almonds", "ingredients": ["almonds", "honey", "herbal tea"], "prep_notes": "Lightly toast almonds", "calories": 110, "protein": 4, "carbs": 8, "fat": 8, "fiber": 2}
-            },
-            "Saturday": {
-                "breakfast": {
-                    "meal": "Weekend brunch omelet",
-                    "ingredients": ["eggs", "cheese", "mushrooms", "spinach", "herbs"],
-                    "prep_notes": "Use fresh herbs, room temperature eggs",
-                    "calories": 390, "protein": 22, "carbs": 8, "fat": 28, "fiber": 3
-                },
-                "lunch": {
-                    "meal": "Quinoa stuffed bell peppers",
-                    "ingredients": ["bell peppers", "quinoa", "black beans", "corn", "cheese"],
-                    "prep_notes": "Pre-cook quinoa, hollow out peppers night before",
-                    "calories": 420, "protein": 18, "carbs": 55, "fat": 12, "fiber": 12
-                },
-                "dinner": {
-                    "meal": "Pan-seared cod with roasted vegetables",
-                    "ingredients": ["cod fillet", "zucchini", "bell peppers", "onions", "herbs"],
-                    "prep_notes": "Bring fish to room temperature, prep vegetables",
-                    "calories": 480, "protein": 30, "carbs": 25, "fat": 15, "fiber": 8
-                },
-                "snack1": {"meal": "Fruit salad with yogurt", "ingredients": ["mixed fruits", "yogurt", "mint"], "prep_notes": "Cut fruits fresh, chill", "calories": 140, "protein": 6, "carbs": 25, "fat": 3, "fiber": 4},
-                "snack2": {"meal": "Dark chocolate with nuts", "ingredients": ["dark chocolate", "walnuts"], "prep_notes": "Use 70% cacao chocolate", "calories": 130, "protein": 3, "carbs": 10, "fat": 9, "fiber": 2}
-            },
-            "Sunday": {
-                "breakfast": {
-                    "meal": "Smoothie bowl with granola",
-                    "ingredients": ["frozen fruits", "yogurt", "granola", "chia seeds", "honey"],
-                    "prep_notes": "Freeze fruits overnight, use thick yogurt",
-                    "calories": 370, "protein": 15, "carbs": 50, "fat": 12, "fiber": 8
-                },
-                "lunch": {
-                    "meal": "Grilled vegetable and hummus sandwich",
-                    "ingredients": ["whole grain bread", "zucchini", "eggplant", "hummus", "arugula"],
-                    "prep_notes": "Grill vegetables in advance, store in refrigerator",
-                    "calories": 400, "protein": 16, "carbs": 55, "fat": 14, "fiber": 10
-                },
-                "dinner": {
-                    "meal": "Herb-crusted chicken with mashed cauliflower",
-                    "ingredients": ["chicken breast", "cauliflower", "herbs", "garlic", "olive oil"],
-                    "prep_notes": "Marinate chicken with herbs overnight, prep cauliflower",
-                    "calories": 450, "protein": 35, "carbs": 20, "fat": 16, "fiber": 6
-                },
-                "snack1": {"meal": "Overnight oats parfait", "ingredients": ["oats", "yogurt", "berries", "nuts"], "prep_notes": "Layer ingredients night before", "calories": 180, "protein": 8, "carbs": 25, "fat": 6, "fiber": 5},
-                "snack2": {"meal": "Herbal tea with dates", "ingredients": ["herbal tea", "dates", "almonds"], "prep_notes": "Stuff dates with almonds", "calories": 120, "protein": 3, "carbs": 18, "fat": 4, "fiber": 3}
-            }
-        }
+        local_nutrition = bool(os.getenv("MEAL_PLANNER_LOCAL_NUTRITION"))
+        instructions = SINGLE_MEAL_INSTRUCTIONS_LOCAL_NUTRITION if local_nutrition else SINGLE_MEAL_INSTRUCTIONS
         
-        for day in days:
-            fallback_plan[day] = daily_meals[day]
+        with span("meal_swap.llm_request"):
+            response = routed_completion("meal_swap", [
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": f"User profile:\n\n{profile_text}\n\nSlot: {day} {meal_type}\n\nAvoid:\n{avoid_text}"}
+            ])
+        record_usage("meal_swap", response)
         
-        # Customize based on diet type
-        diet_type = user_profile.get('diet_type', 'Non-Vegetarian')
-        if diet_type in ['Vegetarian', 'Vegan']:
-            for day in days:
-                fallback_plan[day]["lunch"]["meal"] = "Vegetarian protein bowl with legumes"
-                fallback_plan[day]["lunch"]["ingredients"] = ["quinoa", "black beans", "chickpeas", "mixed vegetables", "tahini", "lemon"]
-                fallback_plan[day]["dinner"]["meal"] = "Tofu stir-fry with brown rice and vegetables"
-                fallback_plan[day]["dinner"]["ingredients"] = ["firm tofu", "brown rice", "broccoli", "bell peppers", "soy sauce", "ginger", "garlic"]
-                if diet_type == 'Vegan':
-                    fallback_plan[day]["snack1"]["meal"] = "Almond yogurt with berries"
-                    fallback_plan[day]["snack1"]["ingredients"] = ["almond yogurt", "mixed berries", "maple syrup"]
-                    fallback_plan[day]["breakfast"]["ingredients"] = ["rolled oats", "banana", "almonds", "blueberries", "oat milk", "maple syrup"]
+        response_content, json_content = clean_json_response(response.choices[0].message.content)
+        if json_content is None:
+            return {"error": "Could not find valid JSON in response", "raw_response": response_content}
+        meal = json.loads(json_content)
+        if not isinstance(meal, dict) or "meal" not in meal:
+            return {"error": "Replacement meal is missing its description", "raw_response": response_content}
+        if local_nutrition:
+            fill_meal_nutrition(meal)
+        return meal
+    except Exception as e:
+        return {"error": f"Failed to generate replacement meal: {str(e)}"}
+
+def generate_fallback_meal_plan(user_profile, raw_response, error_msg):
+    """Generate a simple fallback meal plan when JSON parsing fails"""
+    try:
+        # Mutable copy of the precomputed template for the user's diet type
+        fallback_plan = thaw(fallback_template(user_profile.get('diet_type', DEFAULT_DIET_TYPE)))
         
         return {
             "generated_with_fallback": True,
@@ -364,55 +461,64 @@ def generate_fallback_meal_plan(user_profile, raw_response, error_msg):
     except Exception as e:
         return {"error": f"Even fallback generation failed: {str(e)}", "raw_response": raw_response}
 
+@st.cache_resource(show_spinner=False)
+def fallback_bundles():
+    """Fallback plans with their grocery lists and prep reminders, built once per process"""
+    bundles = {}
+    for diet_type, template in FALLBACK_TEMPLATES.items():
+        plan = thaw(template)
+        bundles[diet_type] = freeze({
+            "meal_plan": plan,
+            "grocery_list": generate_grocery_list(plan),
+            "prep_reminders": generate_prep_reminders(plan),
+        })
+    return bundles
+
+# Category keywords normalized like ingredient keys, padded to match whole words only
+GROCERY_CATEGORY_KEYS = {
+    category: tuple(f" {normalize(keyword)} " for keyword in keywords)
+    for category, keywords in GROCERY_CATEGORIES.items()
+}
+
+@lru_cache(maxsize=4096)
+def grocery_category(key):
+    """Category for a canonical ingredient key, by its most specific keyword"""
+    words = f" {key} "
+    best, best_score = "Others", None
+    for category, keywords in GROCERY_CATEGORY_KEYS.items():
+        for keyword in keywords:
+            if keyword in words:
+                # More words win ("oat milk" over "oat"), then the last word ("almond butter" is a butter)
+                score = (keyword.count(" "), words.endswith(keyword))
+                if best_score is None or score > best_score:
+                    best, best_score = category, score
+    return best
+
+@timed("grocery_list")
 def generate_grocery_list(meal_plan):
     """Generate categorized grocery shopping list from meal plan"""
     if not meal_plan or "error" in meal_plan:
         return {}
     
     # Initialize grocery categories
-    grocery_list = {
-        "Proteins": set(),
-        "Grains & Carbs": set(),
-        "Vegetables": set(),
-        "Fruits": set(),
-        "Dairy & Alternatives": set(),
-        "Pantry Items": set(),
-        "Herbs & Spices": set(),
-        "Others": set()
-    }
-    
-    # Categorization mapping
-    categories = {
-        "Proteins": ["chicken", "fish", "beef", "pork", "turkey", "eggs", "tofu", "tempeh", "beans", "lentils", "chickpeas", "quinoa", "nuts", "almonds", "walnuts", "peanuts"],
-        "Grains & Carbs": ["rice", "bread", "pasta", "oats", "quinoa", "barley", "wheat", "flour", "tortillas", "noodles"],
-        "Vegetables": ["broccoli", "spinach", "kale", "tomatoes", "cucumber", "bell peppers", "onions", "garlic", "carrots", "celery", "mushrooms", "zucchini", "cauliflower", "lettuce", "greens"],
-        "Fruits": ["banana", "apple", "berries", "blueberries", "strawberries", "oranges", "lemons", "avocado", "grapes", "mango", "pineapple"],
-        "Dairy & Alternatives": ["milk", "yogurt", "cheese", "butter", "cream", "oat milk", "almond milk", "soy milk", "coconut milk", "almond yogurt"],
-        "Herbs & Spices": ["herbs", "basil", "oregano", "thyme", "rosemary", "cilantro", "parsley", "ginger", "turmeric", "cumin", "paprika", "black pepper", "salt"],
-        "Pantry Items": ["olive oil", "coconut oil", "vinegar", "soy sauce", "honey", "maple syrup", "tahini", "peanut butter", "vanilla", "baking soda", "flour"]
-    }
-    
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    grocery_list = {category: set() for category in GROCERY_CATEGORY_ORDER}
+    seen_ids = set()
     
     # Extract ingredients from all meals
-    for day in days:
+    for day in DAYS:
         if day in meal_plan and isinstance(meal_plan[day], dict):
-            for meal_type in ["breakfast", "lunch", "dinner", "snack1", "snack2"]:
+            for meal_type in MEAL_TYPES:
                 meal = meal_plan[day].get(meal_type, {})
                 if isinstance(meal, dict) and "ingredients" in meal:
                     for ingredient in meal["ingredients"]:
-                        ingredient_lower = ingredient.lower().strip()
-                        
-                        # Categorize ingredient
-                        categorized = False
-                        for category, keywords in categories.items():
-                            if any(keyword in ingredient_lower for keyword in keywords):
-                                grocery_list[category].add(ingredient.title())
-                                categorized = True
-                                break
-                        
-                        if not categorized:
-                            grocery_list["Others"].add(ingredient.title())
+                        # Plurals, descriptors and synonyms collapse onto one shared canonical name
+                        ingredient_id = canonical_id(ingredient)
+                        if ingredient_id in seen_ids:
+                            continue
+                        seen_ids.add(ingredient_id)
+                        # Categorized on the canonical key, so "almonds" and "Almond" file alike
+                        category = grocery_category(canonical_key(ingredient))
+                        grocery_list[category].add(display_name(ingredient_id, ingredient))
     
     # Convert sets to sorted lists and add session state for checkboxes
     for category in grocery_list:
@@ -420,36 +526,19 @@ def generate_grocery_list(meal_plan):
     
     return grocery_list
 
+@timed("prep_reminders")
 def generate_prep_reminders(meal_plan):
     """Generate intelligent meal prep reminders for each day"""
     if not meal_plan or "error" in meal_plan:
         return {}
     
     prep_reminders = {}
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
     
-    # Define ingredients that commonly need advance preparation
-    prep_ingredients = {
-        "soak_overnight": ["oats", "chia seeds", "quinoa", "beans", "lentils", "rice", "almonds", "chickpeas"],
-        "marinate": ["chicken", "fish", "beef", "pork", "turkey", "tofu", "paneer"],
-        "defrost": ["frozen", "meat", "fish", "chicken", "seafood"],
-        "chill": ["yogurt", "milk", "cream", "cheese"],
-        "prep_vegetables": ["salad", "vegetables", "greens", "herbs"]
-    }
-    
-    # Define cooking methods that need advance prep
-    prep_methods = {
-        "overnight": ["overnight oats", "chia pudding", "soaked", "fermented"],
-        "marinated": ["marinated", "grilled", "bbq", "tandoori", "glazed"],
-        "slow_cooked": ["slow cooked", "braised", "stewed", "crockpot"],
-        "baked": ["baked", "roasted"] # Some baked items benefit from advance prep
-    }
-    
-    for i, day in enumerate(days):
+    for i, day in enumerate(DAYS):
         if day in meal_plan and isinstance(meal_plan[day], dict):
             reminders = []
             
-            for meal_type in ["breakfast", "lunch", "dinner", "snack1", "snack2"]:
+            for meal_type in MEAL_TYPES:
                 meal = meal_plan[day].get(meal_type, {})
                 if isinstance(meal, dict):
                     meal_name = meal.get("meal", "Unknown meal")
@@ -459,24 +548,24 @@ def generate_prep_reminders(meal_plan):
                     detected_preps = []
                     
                     # Check explicit prep notes first
-                    if prep_note and any(word in prep_note.lower() for word in ["soak", "marinate", "overnight", "freeze", "defrost", "advance", "chill", "prepare"]):
+                    if prep_note and any(word in prep_note.lower() for word in PREP_NOTE_KEYWORDS):
                         detected_preps.append(prep_note)
                     
                     # Intelligent detection based on ingredients
                     meal_lower = meal_name.lower()
                     
                     # Check for overnight preparation needs
-                    if any(ing in meal_lower for ing in prep_ingredients["soak_overnight"]):
+                    if any(ing in meal_lower for ing in PREP_INGREDIENTS["soak_overnight"]):
                         if "oats" in meal_lower or "overnight" in meal_lower:
                             detected_preps.append("Prepare overnight oats - mix ingredients and refrigerate")
-                        elif any(grain in meal_lower for grain in ["quinoa", "rice", "beans", "lentils"]):
+                        elif any(grain in meal_lower for grain in SOAK_GRAINS):
                             detected_preps.append("Soak grains/legumes overnight for better cooking")
                         elif "chia" in meal_lower:
                             detected_preps.append("Prepare chia pudding - mix and refrigerate overnight")
                     
                     # Check for marination needs
-                    if any(protein in meal_lower for protein in prep_ingredients["marinate"]):
-                        if any(method in meal_lower for method in ["grilled", "bbq", "tandoori", "marinated"]):
+                    if any(protein in meal_lower for protein in PREP_INGREDIENTS["marinate"]):
+                        if any(method in meal_lower for method in MARINADE_METHODS):
                             detected_preps.append(f"Marinate protein for {meal_name} (30 mins to 2 hours for best flavor)")
                     
                     # Check ingredients list for prep needs
@@ -488,7 +577,7 @@ def generate_prep_reminders(meal_plan):
                             detected_preps.append(f"Defrost {ingredient} overnight in refrigerator")
                         
                         # Some vegetables benefit from advance prep
-                        if any(veg in ing_lower for veg in ["salad mix", "herbs", "greens"]) and meal_type in ["lunch", "dinner"]:
+                        if any(veg in ing_lower for veg in PREP_VEGETABLES) and meal_type in ["lunch", "dinner"]:
                             detected_preps.append("Wash and prep vegetables/herbs for easy cooking")
                     
                     # Check for specific meal types that need prep
@@ -513,7 +602,7 @@ def generate_prep_reminders(meal_plan):
             if reminders:
                 # Set reminder for previous day
                 prev_day_index = (i - 1) % 7
-                prev_day = days[prev_day_index]
+                prev_day = DAYS[prev_day_index]
                 
                 if prev_day not in prep_reminders:
                     prep_reminders[prev_day] = []
@@ -550,6 +639,188 @@ def format_user_profile_for_ai(profile):
     """
     return profile_text.strip()
 
+def is_usable_plan(meal_plan):
+    """True for a generated plan that can be shown and remembered as history"""
+    return bool(meal_plan) and "error" not in meal_plan and not meal_plan.get("is_placeholder")
+
+def archive_current_plan():
+    """Remember the current plan so the next one can be checked for repeats"""
+    if not is_usable_plan(st.session_state.meal_plan):
+        return
+    
+    history = st.session_state.plan_history + [st.session_state.meal_plan]
+    if len(history) > MEAL_HISTORY_WEEKS:
+        history = history[-MEAL_HISTORY_WEEKS:]
+        st.session_state.variety_index = build_index(history)
+    else:
+        st.session_state.variety_index.add_plan(len(history) - 1, st.session_state.meal_plan)
+    st.session_state.plan_history = history
+
+def day_nutrition_totals(day_plan):
+    """Sum calories and macros over the meals of one day"""
+    totals = dict.fromkeys(NUTRIENTS, 0)
+    for meal_key in MEAL_TYPES:
+        meal = day_plan.get(meal_key, {})
+        if isinstance(meal, dict):
+            for nutrient in NUTRIENTS:
+                totals[nutrient] += meal.get(nutrient, 0)
+    return totals
+
+def apply_meal_plan(meal_plan):
+    """Store a meal plan with its grocery list and prep reminders in the session"""
+    st.session_state.meal_plan = meal_plan
+    
+    # Generate grocery list and prep reminders
+    st.session_state.grocery_list = generate_grocery_list(meal_plan)
+    st.session_state.prep_reminders = generate_prep_reminders(meal_plan)
+    st.session_state.grocery_checked = {}  # Reset checkbox states
+    
+    # Flag meals that closely repeat earlier weeks
+    with span("variety_check"):
+        st.session_state.repeated_meals = find_repeats(meal_plan, st.session_state.variety_index) if is_usable_plan(meal_plan) else []
+
+def patch_meal_plan(updates):
+    """Replace individual meals and refresh the grocery list and prep reminders"""
+    meal_plan = st.session_state.meal_plan
+    for (day, meal_type), meal in updates.items():
+        meal_plan[day][meal_type] = meal
+    
+    grocery_list = generate_grocery_list(meal_plan)
+    st.session_state.grocery_list = grocery_list
+    st.session_state.prep_reminders = generate_prep_reminders(meal_plan)
+    
+    # Keep ticks for items that are still on the list
+    st.session_state.grocery_checked = {
+        category: {item: checked for item, checked in st.session_state.grocery_checked.get(category, {}).items() if item in items}
+        for category, items in grocery_list.items()
+    }
+
+def same_slot_meals(meal_plan, meal_type):
+    """This week's meals in one meal slot, to keep replacements from duplicating them"""
+    return [
+        meal_plan[day][meal_type].get("meal", "") for day in DAYS
+        if isinstance(meal_plan.get(day), dict) and isinstance(meal_plan[day].get(meal_type), dict)
+    ]
+
+def regenerate_slots(profile, avoid_by_slot, submit=submit_background):
+    """Request replacement meals for several slots in parallel; failed slots are left out"""
+    futures = {
+        (day, meal_type): submit(generate_meal_replacement, profile, day, meal_type, avoid)
+        for (day, meal_type), avoid in avoid_by_slot.items()
+    }
+    
+    updates = {}
+    for slot, future in futures.items():
+        meal = future.result()
+        if "error" not in meal:
+            updates[slot] = meal
+    return updates
+
+def replace_repeated_meals():
+    """Regenerate only the meals flagged as repeats of earlier weeks"""
+    meal_plan = st.session_state.meal_plan
+    # Avoid the earlier meal and the rest of this week's meals in the same slot
+    updates = regenerate_slots(st.session_state.user_profile, {
+        (repeat["day"], repeat["meal_type"]): [repeat["similar_to"]] + same_slot_meals(meal_plan, repeat["meal_type"])
+        for repeat in st.session_state.repeated_meals
+    })
+    
+    patch_meal_plan(updates)
+    st.session_state.repeated_meals = find_repeats(meal_plan, st.session_state.variety_index)
+
+def can_replan_partially(old_profile, new_profile):
+    """True if a profile edit only touches allergies or dislikes of a finished plan"""
+    return (
+        bool(old_profile)
+        and is_usable_plan(st.session_state.meal_plan)
+        and st.session_state.pending_meal_plan is None
+        and changed_fields(old_profile, new_profile) <= EXCLUSION_FIELDS
+    )
+
+def replan_for_exclusions(profile):
+    """Replace only the meals the profile's allergies and dislikes rule out; False if a full replan is needed"""
+    meal_plan = st.session_state.meal_plan
+    matcher = compile_exclusions(exclusion_terms(profile.get("allergies")) + exclusion_terms(profile.get("dislikes")))
+    with span("profile_diff.scan"):
+        excluded = find_excluded_meals(meal_plan, matcher)
+    if len(excluded) > PARTIAL_REPLAN_MAX_MEALS:
+        return False
+    
+    updates = regenerate_slots(profile, {
+        (item["day"], item["meal_type"]): [item["meal"]] + same_slot_meals(meal_plan, item["meal_type"])
+        for item in excluded
+    })
+    # A replacement that still mentions an excluded food is no better than the old meal
+    if len(updates) < len(excluded) or any(matcher.search(meal_text(meal)) for meal in updates.values()):
+        return False
+    
+    patch_meal_plan(updates)
+    st.session_state.repeated_meals = find_repeats(meal_plan, st.session_state.variety_index)
+    return True
+
+def run_meal_plan_job(user_profile, fresh=False):
+    """Background meal plan generation that reports its status to the shared store"""
+    # Expires on its own if this replica dies mid-job, so another replica can take over
+    job_key = f"job:{meal_plan_key(user_profile)}"
+    job_ttl = 2 * latency_budget("meal_plan")
+    store_set(job_key, {"status": "running", "started": time.time()}, job_ttl)
+    meal_plan = generate_meal_plan(user_profile, fresh)
+    status = "done" if is_usable_plan(meal_plan) and not meal_plan.get("generated_with_fallback") else "failed"
+    store_set(job_key, {"status": status, "finished": time.time()}, job_ttl)
+    return meal_plan
+
+def start_meal_plan_generation(profile, spinner_text, fresh=False):
+    """Generate a meal plan, or show a placeholder and generate it in the background"""
+    archive_current_plan()
+    
+    if not os.getenv("MEAL_PLANNER_INSTANT_PLACEHOLDER"):
+        with st.spinner(spinner_text):
+            apply_meal_plan(generate_meal_plan(profile, fresh))
+        return
+    
+    # Show the precomputed template for this diet right away and swap in the real plan when ready
+    bundle = fallback_bundles().get(profile.get("diet_type"), fallback_bundles()[DEFAULT_DIET_TYPE])
+    st.session_state.meal_plan = {"is_placeholder": True, **thaw(bundle["meal_plan"])}
+    st.session_state.grocery_list = thaw(bundle["grocery_list"])
+    st.session_state.prep_reminders = thaw(bundle["prep_reminders"])
+    st.session_state.grocery_checked = {}
+    st.session_state.pending_meal_plan = submit_background(run_meal_plan_job, profile, fresh)
+    st.session_state.pending_job = meal_plan_key(profile)
+
+def collect_pending_meal_plan():
+    """Swap in a finished background meal plan; returns True while one is still generating"""
+    future = st.session_state.pending_meal_plan
+    if future is None:
+        return collect_shared_job()
+    if not future.done():
+        return True
+    
+    st.session_state.pending_meal_plan = None
+    st.session_state.pending_job = None
+    apply_meal_plan(future.result())
+    return False
+
+def collect_shared_job():
+    """Follow a background job started on another replica before this session moved here"""
+    job = st.session_state.pending_job
+    if job is None:
+        return False
+    
+    status = store_get(f"job:{job}") or {}
+    if status.get("status") == "running":
+        return True
+    
+    meal_plan = store_get(f"plan:{job}") if status.get("status") == "done" else None
+    if meal_plan is not None:
+        st.session_state.pending_job = None
+        apply_meal_plan(meal_plan)
+        return False
+    
+    # The job failed or its replica went away; generate the plan here instead
+    st.session_state.pending_meal_plan = submit_background(run_meal_plan_job, st.session_state.user_profile)
+    return True
+
+@profiled
 def user_profile_form():
     """Create user profile form"""
     st.header("👤 User Profile")
@@ -564,10 +835,7 @@ def user_profile_form():
             height = st.number_input("Height (cm)", min_value=50, max_value=250, value=170)
             
         with col2:
-            diet_type = st.selectbox("Diet Type", [
-                "Vegetarian", "Non-Vegetarian", "Vegan", "Pescatarian", 
-                "Keto", "Paleo", "Mediterranean", "Other"
-            ])
+            diet_type = st.selectbox("Diet Type", DIET_TYPES)
             activity_level = st.selectbox("Activity Level", [
                 "Sedentary", "Lightly Active", "Moderately Active", "Very Active", "Extremely Active"
             ])
@@ -602,22 +870,24 @@ def user_profile_form():
                 "medical_conditions": medical_conditions
             }
             
+            previous_profile = st.session_state.user_profile
             st.session_state.user_profile = profile
             st.session_state.profile_completed = True
             
+            # Allergy and dislike edits only replace the meals they affect
+            replanned = False
+            if can_replan_partially(previous_profile, profile):
+                with st.spinner("Updating the meals affected by your changes..."):
+                    replanned = replan_for_exclusions(profile)
+            
             # Generate meal plan
-            with st.spinner("Generating your personalized 7-day meal plan..."):
-                meal_plan = generate_meal_plan(profile)
-                st.session_state.meal_plan = meal_plan
-                
-                # Generate grocery list and prep reminders
-                st.session_state.grocery_list = generate_grocery_list(meal_plan)
-                st.session_state.prep_reminders = generate_prep_reminders(meal_plan)
-                st.session_state.grocery_checked = {}  # Reset checkbox states
+            if not replanned:
+                start_meal_plan_generation(profile, "Generating your personalized 7-day meal plan...")
             
             st.success("✅ Profile saved, meal plan generated, and grocery list created!")
             st.rerun()
 
+@profiled
 def display_meal_plan():
     """Display the 7-day meal plan"""
     if not st.session_state.meal_plan:
@@ -626,6 +896,10 @@ def display_meal_plan():
     
     st.header("📅 Your 7-Day Meal Plan")
     
+    # Placeholder shown while the personalized plan is generated in the background
+    if st.session_state.meal_plan.get("is_placeholder"):
+        st.info("⏳ Showing a starter plan while your personalized meal plan is being generated...")
+    
     # Check for fallback mode
     if st.session_state.meal_plan.get("generated_with_fallback"):
         st.warning("⚠️ Used fallback meal plan due to AI response formatting issues. Click 'Regenerate' for a new personalized plan.")
@@ -640,6 +914,41 @@ def display_meal_plan():
             st.text_area("Raw AI Response:", st.session_state.meal_plan['raw_response'], height=200)
         return
     
+    # Meals that repeat earlier weeks can be swapped one by one instead of regenerating the week
+    if st.session_state.repeated_meals:
+        repeats = st.session_state.repeated_meals
+        st.warning(f"🔁 {len(repeats)} meal(s) closely repeat your last {len(st.session_state.plan_history)} week(s).")
+        with st.expander("See repeated meals"):
+            for repeat in repeats:
+                st.write(f"**{repeat['day']} {repeat['meal_type']}:** {repeat['meal']} ≈ {repeat['similar_to']} ({repeat['similarity']:.0%} similar)")
+        if st.button("🔁 Replace Repeated Meals"):
+            with st.spinner("Replacing repeated meals..."):
+                replace_repeated_meals()
+            st.rerun()
+    
+    # Compact mode builds only the selected day and shows nutrition as tables
+    compact = st.toggle(
+        "⚡ Compact view",
+        value=bool(os.getenv("MEAL_PLANNER_COMPACT_PLAN")),
+        key="compact_plan_view",
+        help="Show one day at a time with nutrition as tables instead of metric cards"
+    )
+    if compact:
+        display_compact_day()
+        display_compact_weekly_summary()
+    else:
+        display_meal_plan_tabs()
+    
+    st.divider()
+    
+    # Regenerate meal plan button
+    if st.button("🔄 Regenerate Meal Plan", disabled=st.session_state.pending_meal_plan is not None):
+        start_meal_plan_generation(st.session_state.user_profile, "Generating new meal plan...", fresh=True)
+        st.rerun()
+
+@profiled
+def display_meal_plan_tabs():
+    """Display every day of the plan in tabs with per-meal nutrition metrics"""
     days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
     
     # Create tabs for each day
@@ -695,32 +1004,19 @@ def display_meal_plan():
                 
                 # Daily nutrition summary
                 st.subheader("📊 Daily Nutrition Summary")
-                total_calories = 0
-                total_protein = 0
-                total_carbs = 0
-                total_fat = 0
-                total_fiber = 0
-                
-                for meal_key in ["breakfast", "lunch", "dinner", "snack1", "snack2"]:
-                    meal = day_plan.get(meal_key, {})
-                    if isinstance(meal, dict):
-                        total_calories += meal.get("calories", 0)
-                        total_protein += meal.get("protein", 0)
-                        total_carbs += meal.get("carbs", 0)
-                        total_fat += meal.get("fat", 0)
-                        total_fiber += meal.get("fiber", 0)
+                totals = day_nutrition_totals(day_plan)
                 
                 summary_col1, summary_col2, summary_col3, summary_col4, summary_col5 = st.columns(5)
                 with summary_col1:
-                    st.metric("Total Calories", f"{total_calories}")
+                    st.metric("Total Calories", f"{totals['calories']}")
                 with summary_col2:
-                    st.metric("Total Protein", f"{total_protein}g")
+                    st.metric("Total Protein", f"{totals['protein']}g")
                 with summary_col3:
-                    st.metric("Total Carbs", f"{total_carbs}g")
+                    st.metric("Total Carbs", f"{totals['carbs']}g")
                 with summary_col4:
-                    st.metric("Total Fat", f"{total_fat}g")
+                    st.metric("Total Fat", f"{totals['fat']}g")
                 with summary_col5:
-                    st.metric("Total Fiber", f"{total_fiber}g")
+                    st.metric("Total Fiber", f"{totals['fiber']}g")
             else:
                 st.error(f"No meal plan available for {day}")
     
@@ -728,67 +1024,142 @@ def display_meal_plan():
     st.header("📈 Weekly Nutrition Summary")
     
     if st.session_state.meal_plan and "error" not in st.session_state.meal_plan:
-        weekly_calories = 0
-        weekly_protein = 0
-        weekly_carbs = 0
-        weekly_fat = 0
-        weekly_fiber = 0
-        
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        
-        for day in days:
+        weekly = dict.fromkeys(NUTRIENTS, 0)
+        for day in DAYS:
             if day in st.session_state.meal_plan:
-                day_plan = st.session_state.meal_plan[day]
-                for meal_key in ["breakfast", "lunch", "dinner", "snack1", "snack2"]:
-                    meal = day_plan.get(meal_key, {})
-                    if isinstance(meal, dict):
-                        weekly_calories += meal.get("calories", 0)
-                        weekly_protein += meal.get("protein", 0)
-                        weekly_carbs += meal.get("carbs", 0)
-                        weekly_fat += meal.get("fat", 0)
-                        weekly_fiber += meal.get("fiber", 0)
+                for nutrient, total in day_nutrition_totals(st.session_state.meal_plan[day]).items():
+                    weekly[nutrient] += total
         
         wcol1, wcol2, wcol3, wcol4, wcol5 = st.columns(5)
         with wcol1:
-            st.metric("Weekly Calories", f"{weekly_calories:,}")
-            st.metric("Daily Avg", f"{weekly_calories//7:,}")
+            st.metric("Weekly Calories", f"{weekly['calories']:,}")
+            st.metric("Daily Avg", f"{weekly['calories']//7:,}")
         with wcol2:
-            st.metric("Weekly Protein", f"{weekly_protein}g")
-            st.metric("Daily Avg", f"{weekly_protein//7}g")
+            st.metric("Weekly Protein", f"{weekly['protein']}g")
+            st.metric("Daily Avg", f"{weekly['protein']//7}g")
         with wcol3:
-            st.metric("Weekly Carbs", f"{weekly_carbs}g")
-            st.metric("Daily Avg", f"{weekly_carbs//7}g")
+            st.metric("Weekly Carbs", f"{weekly['carbs']}g")
+            st.metric("Daily Avg", f"{weekly['carbs']//7}g")
         with wcol4:
-            st.metric("Weekly Fat", f"{weekly_fat}g")
-            st.metric("Daily Avg", f"{weekly_fat//7}g")
+            st.metric("Weekly Fat", f"{weekly['fat']}g")
+            st.metric("Daily Avg", f"{weekly['fat']//7}g")
         with wcol5:
-            st.metric("Weekly Fiber", f"{weekly_fiber}g")
-            st.metric("Daily Avg", f"{weekly_fiber//7}g")
+            st.metric("Weekly Fiber", f"{weekly['fiber']}g")
+            st.metric("Daily Avg", f"{weekly['fiber']//7}g")
+
+@profiled
+def display_compact_day():
+    """Display one selected day as a single table of meals and nutrition"""
+    meal_plan = st.session_state.meal_plan
+    today = datetime.now().strftime("%A")
+    day = st.radio("Day", DAYS, index=DAYS.index(today) if today in DAYS else 0, horizontal=True, key="compact_plan_day")
     
-    st.divider()
+    day_plan = meal_plan.get(day)
+    if not isinstance(day_plan, dict):
+        st.error(f"No meal plan available for {day}")
+        return
     
-    # Regenerate meal plan button
-    if st.button("🔄 Regenerate Meal Plan"):
-        with st.spinner("Generating new meal plan..."):
-            meal_plan = generate_meal_plan(st.session_state.user_profile)
-            st.session_state.meal_plan = meal_plan
-            
-            # Regenerate grocery list and prep reminders
-            st.session_state.grocery_list = generate_grocery_list(meal_plan)
-            st.session_state.prep_reminders = generate_prep_reminders(meal_plan)
-            st.session_state.grocery_checked = {}  # Reset checkbox states
-        st.rerun()
+    rows = []
+    for meal_type in MEAL_TYPES:
+        meal = day_plan.get(meal_type)
+        if isinstance(meal, dict):
+            rows.append({
+                "Meal": MEAL_LABELS[meal_type],
+                "Dish": meal.get("meal", ""),
+                **{label: meal.get(nutrient) for nutrient, label in NUTRIENT_LABELS.items()},
+                "Ingredients": ", ".join(meal.get("ingredients", [])),
+                "Prep Note": meal.get("prep_notes", ""),
+            })
+    totals = day_nutrition_totals(day_plan)
+    rows.append({"Meal": "📊 Total", "Dish": "", **{label: totals[nutrient] for nutrient, label in NUTRIENT_LABELS.items()}})
+    st.dataframe(rows, hide_index=True)
+
+# Switching days reruns only the day view where the installed Streamlit supports fragments
+if hasattr(st, "fragment"):
+    display_compact_day = st.fragment(display_compact_day)
 
+@profiled
+def display_compact_weekly_summary():
+    """Display per-day nutrition totals and the daily average as one table"""
+    st.subheader("📈 Weekly Nutrition Summary")
+    meal_plan = st.session_state.meal_plan
+    
+    rows = []
+    weekly = dict.fromkeys(NUTRIENTS, 0)
+    for day in DAYS:
+        if isinstance(meal_plan.get(day), dict):
+            totals = day_nutrition_totals(meal_plan[day])
+            rows.append({"Day": day, **{label: totals[nutrient] for nutrient, label in NUTRIENT_LABELS.items()}})
+            for nutrient in NUTRIENTS:
+                weekly[nutrient] += totals[nutrient]
+    
+    rows.append({"Day": "Weekly Total", **{label: weekly[nutrient] for nutrient, label in NUTRIENT_LABELS.items()}})
+    rows.append({"Day": "Daily Avg", **{label: weekly[nutrient] // 7 for nutrient, label in NUTRIENT_LABELS.items()}})
+    st.dataframe(rows, hide_index=True)
+
+def answer_chat(question, chat_log):
+    """Answer a chat question from the plan, the shared answer cache or the LLM, in that order"""
+    # Plan, nutrition and prep lookups are answered from session data
+    with span("chat.local_answer"):
+        response = answer_locally(question, st.session_state.meal_plan, st.session_state.prep_reminders)
+    if response is not None:
+        return response
+    
+    # Generic questions are shared between users with the same diet, allergies and conditions,
+    # first from this process and then from the other replicas through the shared store.
+    # Only a conversation's opening question is shared: any later one may lean on earlier turns
+    # ("How long in the oven?") in ways no word list catches
+    key = chat_cache_key(question, st.session_state.user_profile) if len(chat_log) <= 1 else None
+    if key is not None:
+        response = response_cache.get(key)
+        if response is None:
+            response = store_get(f"chat:{key}")
+            if response is not None:
+                response_cache.put(key, response)
+        if response is not None:
+            return response
+    
+    if key is not None:
+        # A shared answer is generated from what its key covers: the question and the keyed facets
+        response = get_openai_response([{"role": "user", "content": question}], facet_context(st.session_state.user_profile))
+    else:
+        # Get AI response with user context; only the in-memory turns are sent
+        user_context = format_user_profile_for_ai(st.session_state.user_profile)
+        response = get_openai_response(chat_log.recent(), user_context)
+    if key is not None and not response.startswith("Error:"):
+        response_cache.put(key, response)
+        store_set(f"chat:{key}", response, response_cache.ttl_seconds)
+    return response
+
+@profiled
 def chat_sidebar():
     """Chat functionality in sidebar"""
     with st.sidebar:
         st.header("💬 Chat with AI")
         st.markdown("Ask any cooking or nutrition questions!")
         
+        chat_log = st.session_state.chat_log
+        
+        # Page through long conversations instead of rendering every message
+        page_count = chat_log.page_count(CHAT_PAGE_SIZE)
+        page = min(st.session_state.chat_page, page_count - 1)
+        if page_count > 1:
+            pcol1, pcol2, pcol3 = st.columns([1, 2, 1])
+            with pcol1:
+                if st.button("⬆️", key="chat_older", disabled=page >= page_count - 1, help="Older messages"):
+                    st.session_state.chat_page = page + 1
+                    st.rerun()
+            with pcol2:
+                st.caption(f"Page {page_count - page} of {page_count}")
+            with pcol3:
+                if st.button("⬇️", key="chat_newer", disabled=page == 0, help="Newer messages"):
+                    st.session_state.chat_page = page - 1
+                    st.rerun()
+        
         # Display chat history
         chat_container = st.container()
         with chat_container:
-            for message in st.session_state.chat_history:
+            for message in chat_log.page(page, CHAT_PAGE_SIZE):
                 with st.chat_message(message["role"]):
                     st.markdown(message["content"])
         
@@ -800,25 +1171,23 @@ def chat_sidebar():
             if st.button("Send", key="send_chat"):
                 if user_input:
                     # Add user message
-                    st.session_state.chat_history.append({"role": "user", "content": user_input})
-                    st.session_state.messages.append({"role": "user", "content": user_input})
+                    chat_log.append("user", user_input)
                     
-                    # Get AI response with user context
-                    user_context = format_user_profile_for_ai(st.session_state.user_profile)
-                    response = get_openai_response(st.session_state.messages, user_context)
+                    response = answer_chat(user_input, chat_log)
                     
                     # Add AI response
-                    st.session_state.chat_history.append({"role": "assistant", "content": response})
-                    st.session_state.messages.append({"role": "assistant", "content": response})
+                    chat_log.append("assistant", response)
+                    st.session_state.chat_page = 0
                     
                     st.rerun()
         
         with col2:
             if st.button("Clear", key="clear_chat"):
-                st.session_state.chat_history = []
-                st.session_state.messages = []
+                chat_log.clear()
+                st.session_state.chat_page = 0
                 st.rerun()
 
+@profiled
 def display_grocery_list():
     """Display interactive grocery shopping list"""
     st.header("🛒 Grocery Shopping List")
@@ -873,6 +1242,7 @@ def display_grocery_list():
                     st.session_state.grocery_checked[category][item] = False
             st.rerun()
 
+@profiled
 def display_prep_reminders():
     """Display intelligent meal prep reminders for each day"""
     st.header("⏰ Smart Meal Prep Reminders")
@@ -884,7 +1254,6 @@ def display_prep_reminders():
     st.markdown("**🎯 Plan ahead for stress-free cooking! Here's your personalized prep schedule:**")
     
     # Show today's reminders prominently if available
-    from datetime import datetime
     today = datetime.now().strftime("%A")
     
     if today in st.session_state.prep_reminders:
@@ -953,6 +1322,7 @@ def display_prep_reminders():
                 if day == "Sunday":
                     st.balloons()  # Fun touch for Sunday
 
+@profiled
 def display_user_summary():
     """Display user profile summary"""
     if st.session_state.user_profile:
@@ -975,6 +1345,220 @@ def display_user_summary():
             if profile.get('health_goals'):
                 st.write(f"**Goals:** {', '.join(profile['health_goals'])}")
 
+def session_snapshot():
+    """The parts of the session that are saved to the shared store"""
+    return {
+        "user_profile": st.session_state.user_profile,
+        "profile_completed": st.session_state.profile_completed,
+        "meal_plan": st.session_state.meal_plan,
+        "grocery_checked": st.session_state.grocery_checked,
+        "prep_completed": st.session_state.prep_completed,
+        "plan_history": st.session_state.plan_history,
+        "repeated_meals": st.session_state.repeated_meals,
+        "pending_job": st.session_state.pending_job,
+        "chat": st.session_state.chat_log.recent(),
+    }
+
+def restore_session():
+    """Tie this session to a saved one through the URL and reload its state, once per session"""
+    if "session_id" in st.session_state or get_store() is None:
+        return
+    
+    session_id = st.query_params.get(SESSION_QUERY_PARAM)
+    snapshot = store_get(f"session:{session_id}") if session_id else None
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        st.query_params[SESSION_QUERY_PARAM] = session_id
+    st.session_state.session_id = session_id
+    st.session_state.session_saved_key = None
+    if not snapshot:
+        return
+    
+    for field in ("user_profile", "profile_completed", "meal_plan", "grocery_checked",
+                  "prep_completed", "plan_history", "repeated_meals", "pending_job"):
+        st.session_state[field] = snapshot[field]
+    
+    # Derived state is rebuilt rather than stored
+    meal_plan = st.session_state.meal_plan
+    st.session_state.grocery_list = generate_grocery_list(meal_plan) if meal_plan else {}
+    st.session_state.prep_reminders = generate_prep_reminders(meal_plan) if meal_plan else {}
+    st.session_state.variety_index = build_index(st.session_state.plan_history)
+    for message in snapshot["chat"]:
+        st.session_state.chat_log.append(message["role"], message["content"])
+    st.session_state.session_saved_key = canonical_request_key(session_snapshot())
+    
+    serve_pregenerated_plan()
+
+def serve_pregenerated_plan():
+    """Switch to the week's plan generated off-peak by pregenerate.py once that week has started"""
+    key = f"next_plan:{st.session_state.session_id}"
+    entry = store_get(key)
+    if not entry or datetime.now().date().isoformat() < entry["week_start"]:
+        return
+    store_delete(key)
+    # A profile edited since the plan was made, or a plan already on its way, wins
+    if entry["profile_key"] != meal_plan_key(st.session_state.user_profile) or st.session_state.pending_job:
+        return
+    
+    archive_current_plan()
+    st.session_state.meal_plan = entry["meal_plan"]
+    st.session_state.grocery_list = entry["grocery_list"]
+    st.session_state.prep_reminders = entry["prep_reminders"]
+    st.session_state.grocery_checked = {}
+    st.session_state.prep_completed = {}
+    st.session_state.repeated_meals = find_repeats(entry["meal_plan"], st.session_state.variety_index)
+    st.session_state.plan_notice = f"📅 Your plan for the week of {entry['week_start']} is ready!"
+
+def persist_session():
+    """Save the session to the shared store when it has changed since the last save"""
+    if "session_id" not in st.session_state:
+        return
+    snapshot = session_snapshot()
+    key = canonical_request_key(snapshot)
+    if key != st.session_state.session_saved_key:
+        if store_set(f"session:{st.session_state.session_id}", snapshot, SESSION_TTL_SECONDS):
+            st.session_state.session_saved_key = key
+
+@profiled
+def display_nutrition_tips():
+    """Show daily calorie and macro targets and tips for the user's profile"""
+    st.header("📊 Nutrition Tips")
+    if st.session_state.user_profile:
+        profile = st.session_state.user_profile
+        
+        # Calculate and display nutrition info
+        if profile.get('weight') and profile.get('height') and profile.get('age'):
+            # Basic BMR calculation (Mifflin-St Jeor Equation)
+            if profile.get('gender') == 'Male':
+                bmr = 10 * profile['weight'] + 6.25 * profile['height'] - 5 * profile['age'] + 5
+            else:
+                bmr = 10 * profile['weight'] + 6.25 * profile['height'] - 5 * profile['age'] - 161
+            
+            activity_multipliers = {
+                "Sedentary": 1.2,
+                "Lightly Active": 1.375,
+                "Moderately Active": 1.55,
+                "Very Active": 1.725,
+                "Extremely Active": 1.9
+            }
+            
+            multiplier = activity_multipliers.get(profile.get('activity_level', 'Moderately Active'), 1.55)
+            daily_calories = bmr * multiplier
+            
+            col1, col2, col3, col4, col5 = st.columns(5)
+            with col1:
+                st.metric("Daily Calories", f"{daily_calories:.0f}")
+            with col2:
+                recommended_protein = profile['weight'] * 1.2
+                if 'Muscle Building' in profile.get('health_goals', []):
+                    recommended_protein = profile['weight'] * 1.8
+                st.metric("Protein (g)", f"{recommended_protein:.0f}")
+            with col3:
+                # Carbs: 45-65% of total calories
+                carb_calories = daily_calories * 0.50  # Using 50% as middle ground
+                carb_grams = carb_calories / 4  # 4 calories per gram of carbs
+                st.metric("Carbs (g)", f"{carb_grams:.0f}")
+                # Fat: 20-35% of total calories
+                fat_calories = daily_calories * 0.25  # Using 25% as middle ground
+                fat_grams = fat_calories / 9  # 9 calories per gram of fat
+                st.metric("Fat (g)", f"{fat_grams:.0f}")
+            with col5:
+                st.metric("Water (L)", f"{profile['weight'] * 0.035:.1f}")
+        
+        # Health tips based on profile
+        st.subheader("💡 Personalized Tips")
+        
+        tips = []
+        if 'Weight Loss' in profile.get('health_goals', []):
+            tips.append("🔥 Focus on creating a moderate caloric deficit through balanced nutrition and exercise")
+        if 'Muscle Building' in profile.get('health_goals', []):
+            tips.append("💪 Ensure adequate protein intake (1.6-2.2g per kg body weight)")
+        if profile.get('diet_type') == 'Vegetarian':
+            tips.append("🌱 Include complementary proteins like rice & beans for complete amino acid profiles")
+        if profile.get('allergies'):
+            tips.append("⚠️ Always check ingredient labels and inform restaurants about your allergies")
+        
+        for tip in tips:
+            st.info(tip)
+
+@profiled
+def display_debug_panel():
+    """Show per-stage latency percentiles and token usage in the sidebar"""
+    with st.sidebar.expander("🛠️ Debug: Pipeline Timings"):
+        summary = stage_summary()
+        if summary:
+            st.dataframe([
+                {
+                    "Stage": stage,
+                    "Count": stats["count"],
+                    "p50 (ms)": round(stats["p50"] * 1000, 1),
+                    "p95 (ms)": round(stats["p95"] * 1000, 1),
+                    "Max (ms)": round(stats["max"] * 1000, 1),
+                }
+                for stage, stats in summary.items()
+            ], hide_index=True)
+        else:
+            st.write("No spans recorded yet.")
+        
+        cache_stats = response_cache.stats()
+        if cache_stats["hits"] or cache_stats["misses"]:
+            st.write(f"**Chat answer cache:** {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                     f"{cache_stats['entries']} entries")
+        
+        usage = token_usage_snapshot()
+        if usage:
+            st.write("**Token usage**")
+            st.dataframe([
+                {"Endpoint": endpoint, **totals} for endpoint, totals in sorted(usage.items())
+            ], hide_index=True)
+        
+        if get_store() is not None:
+            counts = store_stats()
+            st.write(f"**Shared store:** {counts['hits']} hits, {counts['misses']} misses, "
+                     f"{counts['writes']} writes, {counts['errors']} errors")
+        
+        call_stats = llm_call_stats()
+        if call_stats:
+            st.write("**LLM calls, hedges and timeouts**")
+            st.dataframe([
+                {"Endpoint": endpoint, **counts} for endpoint, counts in sorted(call_stats.items())
+            ], hide_index=True)
+
+@profiled
+def display_ui_profile_overlay():
+    """Show where the previous rerun of this session spent its time, elements and memory"""
+    report = st.session_state.get("ui_profile")
+    with st.sidebar.expander("⏱️ Render Profile (previous rerun)"):
+        if not report:
+            st.write("No profiled rerun yet.")
+            return
+        st.write(f"**{report['total_ms']:.1f} ms**, {report['elements']} elements")
+        st.dataframe([
+            {
+                "Function": path.rsplit(";", 1)[-1],
+                "Stack": path,
+                "Total (ms)": round(totals["ms"], 1),
+                "Self (ms)": round(totals["self_ms"], 1),
+                "Elements": totals["elements"],
+                **({"Alloc (KB)": round(totals["alloc_kb"], 1)} if report["allocations_sampled"] else {}),
+            }
+            for path, totals in sorted(report["sections"].items(), key=lambda item: -item[1]["ms"])
+        ], hide_index=True)
+        st.caption("Elements by type: " + ", ".join(f"{kind} {count}" for kind, count in report["element_types"].items()))
+        if report.get("top_allocations"):
+            st.write("**Top allocation sites**")
+            st.dataframe(report["top_allocations"], hide_index=True)
+        st.download_button(
+            "🔥 Download flamegraph stacks",
+            collapsed_stacks(),
+            file_name="meal_planner_ui.folded",
+            help="Collapsed stacks of self time in microseconds, for flamegraph.pl or speedscope",
+        )
+
+def remember_ui_profile(report):
+    """Keep the rerun's profile for the overlay shown on the next rerun"""
+    st.session_state.ui_profile = report
+
 def main():
     # Page configuration
     st.set_page_config(
@@ -985,18 +1569,43 @@ def main():
     
     # Initialize session state
     initialize_session_state()
+    restore_session()
+    generation_pending = collect_pending_meal_plan()
+    
+    # Warm the per-diet fallback templates on the first run in this process
+    fallback_bundles()
     
     # App title
     st.title("🍽️ Personalized Meal Planner AI")
     st.markdown("Get personalized meal plans and cooking advice based on your profile!")
     
+    # Shown once, e.g. when an off-peak plan for the new week was just switched in
+    notice = st.session_state.pop("plan_notice", None)
+    if notice:
+        st.success(notice)
+    
     # Check API key
     if not os.getenv("OPENAI_API_KEY"):
         st.error("❌ OpenAI API key not found! Please check your .env file.")
         return
     
+    # Optional Prometheus endpoint for stage latency histograms
+    metrics_port = os.getenv("MEAL_PLANNER_METRICS_PORT")
+    if metrics_port:
+        try:
+            start_metrics_server(int(metrics_port))
+        except (OSError, ValueError) as e:
+            st.warning(f"Metrics endpoint not started: {str(e)}")
+    
     # Chat sidebar
-    chat_sidebar()
+    with span("render.chat_sidebar"):
+        chat_sidebar()
+    
+    if os.getenv("MEAL_PLANNER_DEBUG"):
+        display_debug_panel()
+    
+    if profiling_enabled():
+        display_ui_profile_overlay()
     
     # Main content area
     if not st.session_state.profile_completed:
@@ -1007,7 +1616,6 @@ def main():
         
         # Quick prep reminder dashboard
         if st.session_state.prep_reminders:
-            from datetime import datetime
             today = datetime.now().strftime("%A")
             
             if today in st.session_state.prep_reminders:
@@ -1031,13 +1639,13 @@ def main():
         # Main tabs
         tab1, tab2, tab3, tab4, tab5 = st.tabs(["📅 Meal Plan", "🛒 Grocery List", "⏰ Prep Reminders", "👤 Edit Profile", "📊 Nutrition Tips"])
         
-        with tab1:
+        with tab1, span("render.meal_plan"):
             display_meal_plan()
         
-        with tab2:
+        with tab2, span("render.grocery_list"):
             display_grocery_list()
         
-        with tab3:
+        with tab3, span("render.prep_reminders"):
             display_prep_reminders()
         
         with tab4:
@@ -1045,64 +1653,15 @@ def main():
             user_profile_form()
         
         with tab5:
-            st.header("📊 Nutrition Tips")
-            if st.session_state.user_profile:
-                profile = st.session_state.user_profile
-                
-                # Calculate and display nutrition info
-                if profile.get('weight') and profile.get('height') and profile.get('age'):
-                    # Basic BMR calculation (Mifflin-St Jeor Equation)
-                    if profile.get('gender') == 'Male':
-                        bmr = 10 * profile['weight'] + 6.25 * profile['height'] - 5 * profile['age'] + 5
-                    else:
-                        bmr = 10 * profile['weight'] + 6.25 * profile['height'] - 5 * profile['age'] - 161
-                    
-                    activity_multipliers = {
-                        "Sedentary": 1.2,
-                        "Lightly Active": 1.375,
-                        "Moderately Active": 1.55,
-                        "Very Active": 1.725,
-                        "Extremely Active": 1.9
-                    }
-                    
-                    multiplier = activity_multipliers.get(profile.get('activity_level', 'Moderately Active'), 1.55)
-                    daily_calories = bmr * multiplier
-                    
-                    col1, col2, col3, col4, col5 = st.columns(5)
-                    with col1:
-                        st.metric("Daily Calories", f"{daily_calories:.0f}")
-                    with col2:
-                        recommended_protein = profile['weight'] * 1.2
-                        if 'Muscle Building' in profile.get('health_goals', []):
-                            recommended_protein = profile['weight'] * 1.8
-                        st.metric("Protein (g)", f"{recommended_protein:.0f}")
-                    with col3:
-                        # Carbs: 45-65% of total calories
-                        carb_calories = daily_calories * 0.50  # Using 50% as middle ground
-                        carb_grams = carb_calories / 4  # 4 calories per gram of carbs
-                        st.metric("Carbs (g)", f"{carb_grams:.0f}")
-                        # Fat: 20-35% of total calories
-                        fat_calories = daily_calories * 0.25  # Using 25% as middle ground
-                        fat_grams = fat_calories / 9  # 9 calories per gram of fat
-                        st.metric("Fat (g)", f"{fat_grams:.0f}")
-                    with col5:
-                        st.metric("Water (L)", f"{profile['weight'] * 0.035:.1f}")
-                
-                # Health tips based on profile
-                st.subheader("💡 Personalized Tips")
-                
-                tips = []
-                if 'Weight Loss' in profile.get('health_goals', []):
-                    tips.append("🔥 Focus on creating a moderate caloric deficit through balanced nutrition and exercise")
-                if 'Muscle Building' in profile.get('health_goals', []):
-                    tips.append("💪 Ensure adequate protein intake (1.6-2.2g per kg body weight)")
-                if profile.get('diet_type') == 'Vegetarian':
-                    tips.append("🌱 Include complementary proteins like rice & beans for complete amino acid profiles")
-                if profile.get('allergies'):
-                    tips.append("⚠️ Always check ingredient labels and inform restaurants about your allergies")
-                
-                for tip in tips:
-                    st.info(tip)
+            display_nutrition_tips()
+    
+    persist_session()
+    
+    # Poll until the background meal plan replaces the placeholder
+    if generation_pending:
+        time.sleep(PLACEHOLDER_POLL_SECONDS)
+        st.rerun()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    with profile_rerun(session=lambda: st.session_state.get("session_id"), on_report=remember_ui_profile):
+        main() 
\ No newline at end of file
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the meal planner's pure functions.
+
+Times grocery list and prep reminder generation, profile formatting, the JSON
+cleanup and compact-format decoding of model output, and nutrition totals on
+synthetic plans from one week to thousands of days, with ingredient
+vocabularies from a hundred to tens of thousands of names. Plans come from a
+seeded generator, so every run and every commit measures the same inputs.
+
+Each benchmark is timed over a grid of parameters (asv-style) and reported as
+the best per-call time of several repeats. With --save the results are
+appended to a history file together with the current git commit; --compare
+checks them against the last saved run and exits with code 1 when any case
+got slower than the threshold.
+
+Usage: python benchmark.py [--quick] [--filter grocery] [--save] [--compare]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+
+from meal_data import DAYS, MEAL_TYPES, NUTRIENTS
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks", "history.jsonl")
+DEFAULT_SEED = 1729
+# A case counts as a regression when it is this much slower than the last saved run
+DEFAULT_THRESHOLD = 1.25
+
+DAY_COUNTS = (7, 70, 700, 3500)
+VOCABULARY_SIZES = (100, 10000)
+QUICK_DAY_COUNTS = (7, 70)
+QUICK_VOCABULARY_SIZES = (100,)
+
+_BASE_INGREDIENTS = (
+    "chicken breast", "salmon", "tofu", "eggs", "lentils", "chickpeas", "brown rice", "quinoa",
+    "rolled oats", "spinach", "broccoli", "bell pepper", "sweet potato", "avocado", "greek yogurt",
+    "almonds", "blueberries", "banana", "olive oil", "garlic", "ginger", "soy sauce", "black beans",
+    "whole wheat bread", "cheddar cheese", "turkey", "shrimp", "cottage cheese", "walnuts", "kale",
+)
+_VARIANT_WORDS = (
+    "smoked", "roasted", "wild", "heirloom", "baby", "red", "golden", "spiced", "pickled", "toasted",
+    "sicilian", "kashmiri", "nordic", "andean", "thai", "persian", "alpine", "coastal", "highland", "valley",
+)
+_QUANTITIES = ("", "", "120 g ", "1 cup ", "2 tbsp ", "1/2 cup ", "2 ", "a handful of ")
+_DESCRIPTORS = ("", "", "chopped ", "fresh ", "diced ", "organic ")
+_PREP_NOTES = (
+    "Marinate overnight in the fridge",
+    "Soak the grains the night before",
+    "Chop vegetables in the morning",
+    "Defrost in the fridge 24 hours ahead",
+    "Cook fresh, about 20 minutes",
+    "",
+)
+_MEAL_STYLES = ("bowl", "stir-fry", "salad", "curry", "wrap", "omelet", "skillet", "soup", "tacos", "parfait")
+
+
+def ingredient_vocabulary(size, seed=DEFAULT_SEED):
+    """Deterministic list of distinct ingredient names, real ones first"""
+    rng = random.Random(seed)
+    names = list(_BASE_INGREDIENTS[:size])
+    seen = set(names)
+    serial = 0
+    while len(names) < size:
+        base = rng.choice(_BASE_INGREDIENTS)
+        first, second = rng.sample(_VARIANT_WORDS, 2)
+        name = f"{first} {second} {base}" if rng.random() < 0.5 else f"{first} {base} {serial}"
+        serial += 1
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def _synthetic_meal(rng, vocabulary, ingredients_per_meal):
+    ingredients = [
+        rng.choice(_QUANTITIES) + rng.choice(_DESCRIPTORS) + rng.choice(vocabulary)
+        for _ in range(ingredients_per_meal)
+    ]
+    main = ingredients[0].split()[-1]
+    meal = {
+        "meal": f"{rng.choice(_VARIANT_WORDS).title()} {main} {rng.choice(_MEAL_STYLES)}",
+        "ingredients": ingredients,
+        "prep_notes": rng.choice(_PREP_NOTES),
+    }
+    for nutrient in NUTRIENTS:
+        meal[nutrient] = rng.randint(1, 700 if nutrient == "calories" else 60)
+    return meal
+
+
+def synthetic_weeks(days, vocabulary_size=100, ingredients_per_meal=5, seed=DEFAULT_SEED):
+    """Plans covering the given number of days, one plan dict per week (the last may be partial)"""
+    rng = random.Random(seed)
+    vocabulary = ingredient_vocabulary(vocabulary_size, seed)
+    weeks = []
+    for start in range(0, days, len(DAYS)):
+        week_days = DAYS[:min(len(DAYS), days - start)]
+        weeks.append({
+            day: {meal_type: _synthetic_meal(rng, vocabulary, ingredients_per_meal) for meal_type in MEAL_TYPES}
+            for day in week_days
+        })
+    return weeks
+
+
+def synthetic_profile(list_items, seed=DEFAULT_SEED):
+    """Profile whose free-text fields list the given number of foods each"""
+    rng = random.Random(seed)
+    foods = ingredient_vocabulary(max(list_items * 3, 1), seed)
+
+    def listing():
+        return ", ".join(rng.sample(foods, list_items))
+
+    return {
+        "gender": "Female", "age": 34, "weight": 62.5, "height": 168, "diet_type": "Omnivore",
+        "activity_level": "Moderately Active", "health_goals": "Maintain weight and eat more fiber",
+        "allergies": listing(), "dislikes": listing(), "likes": listing(), "medical_conditions": "None",
+    }
+
+
+# Each setup returns the function to time; app is imported lazily
+# so the generator can be used on its own without streamlit
+
+def _grocery_list(days, vocabulary, seed):
+    from app import generate_grocery_list
+    weeks = synthetic_weeks(days, vocabulary, seed=seed)
+    return lambda: [generate_grocery_list(week) for week in weeks]
+
+
+def _prep_reminders(days, vocabulary, seed):
+    from app import generate_prep_reminders
+    weeks = synthetic_weeks(days, vocabulary, seed=seed)
+    return lambda: [generate_prep_reminders(week) for week in weeks]
+
+
+def _json_cleanup(days, vocabulary, seed):
+    from app import clean_json_response
+    # Model output as it usually arrives: fenced and pretty-printed
+    responses = ["```json\n" + json.dumps(week, indent=2) + "\n```" for week in synthetic_weeks(days, vocabulary, seed=seed)]
+    return lambda: [json.loads(clean_json_response(response)[1]) for response in responses]
+
+
+def _tsv_decode(days, vocabulary, seed):
+    from plan_wire import decode_plan_tsv, encode_plan_tsv
+    responses = [encode_plan_tsv(week) for week in synthetic_weeks(days, vocabulary, seed=seed)]
+    return lambda: [decode_plan_tsv(response) for response in responses]
+
+
+def _nutrition_totals(days, vocabulary, seed):
+    from app import day_nutrition_totals
+    day_plans = [day_plan for week in synthetic_weeks(days, vocabulary, seed=seed) for day_plan in week.values()]
+    return lambda: [day_nutrition_totals(day_plan) for day_plan in day_plans]
+
+
+def _local_nutrition(days, vocabulary, seed):
+    from nutrition import meal_nutrition
+    meals = [meal for week in synthetic_weeks(days, vocabulary, seed=seed) for day_plan in week.values() for meal in day_plan.values()]
+    return lambda: [meal_nutrition(meal["ingredients"]) for meal in meals]
+
+
+def _profile_format(list_items, _vocabulary, seed):
+    from app import format_user_profile_for_ai
+    profile = synthetic_profile(list_items, seed)
+    return lambda: format_user_profile_for_ai(profile)
+
+
+# name -> (setup, size parameter name); sized benchmarks scale with days, the profile one with list length
+BENCHMARKS = {
+    "grocery_list": (_grocery_list, "days"),
+    "prep_reminders": (_prep_reminders, "days"),
+    "json_cleanup": (_json_cleanup, "days"),
+    "tsv_decode": (_tsv_decode, "days"),
+    "nutrition_totals": (_nutrition_totals, "days"),
+    "local_nutrition": (_local_nutrition, "days"),
+    "profile_format": (_profile_format, "items"),
+}
+PROFILE_ITEM_COUNTS = (3, 30, 300)
+
+
+def time_call(fn, repeat=5):
+    """Best per-call time in seconds over several repeats of about 0.2 s each"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_benchmarks(names, day_counts, vocabulary_sizes, repeat, seed=DEFAULT_SEED):
+    """Results as a list of {benchmark, size parameter, vocabulary, seconds} records"""
+    results = []
+    for name in names:
+        setup, size_name = BENCHMARKS[name]
+        sizes = PROFILE_ITEM_COUNTS if size_name == "items" else day_counts
+        vocabularies = (None,) if size_name == "items" else vocabulary_sizes
+        for vocabulary in vocabularies:
+            for size in sizes:
+                fn = setup(size, vocabulary, seed)
+                seconds = time_call(fn, repeat=repeat)
+                results.append({"benchmark": name, size_name: size, "vocabulary": vocabulary, "seconds": seconds})
+                print(_format_row(results[-1]), flush=True)
+    return results
+
+
+def case_key(result):
+    """Identifies a benchmark case across runs"""
+    size_name = "items" if "items" in result else "days"
+    return f"{result['benchmark']}[{size_name}={result[size_name]},vocabulary={result['vocabulary']}]"
+
+
+def _format_time(seconds):
+    if seconds >= 1:
+        return f"{seconds:8.2f} s "
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds * 1e6:8.2f} µs"
+
+
+def _format_row(result):
+    line = f"{case_key(result):<48} {_format_time(result['seconds'])}"
+    if "days" in result:
+        line += f"   {_format_time(result['seconds'] / result['days'])}/day"
+    return line
+
+
+def git_commit():
+    """Short hash of the checked-out commit, with a marker for uncommitted changes"""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=repo_dir, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=repo_dir, stderr=subprocess.DEVNULL).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("+dirty" if dirty else "")
+
+
+def load_history(path=HISTORY_PATH):
+    """Saved runs, oldest first"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_run(results, seed, path=HISTORY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    run = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": seed,
+        "results": {case_key(result): result["seconds"] for result in results},
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    return run
+
+
+def compare_runs(results, baseline, threshold):
+    """Cases slower than the baseline by more than the threshold, as (case, old, new) tuples"""
+    regressions = []
+    for result in results:
+        key = case_key(result)
+        old = baseline["results"].get(key)
+        if old and result["seconds"] > old * threshold:
+            regressions.append((key, old, result["seconds"]))
+    return regressions
+
+
+def print_history(history):
+    """Per-case times of every saved run, one column per commit"""
+    if not history:
+        print("ℹ️ No saved runs")
+        return
+    cases = sorted({key for run in history for key in run["results"]})
+    print(f"{'case':<48} " + " ".join(f"{run['commit']:>14}" for run in history))
+    for key in cases:
+        cells = [_format_time(run["results"][key]) if key in run["results"] else " " * 11 for run in history]
+        print(f"{key:<48} " + " ".join(f"{cell:>14}" for cell in cells))
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the meal planner's pure functions on synthetic plans")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="Small sizes only, for a fast sanity run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--save", action="store_true", help=f"Append the results to {os.path.relpath(HISTORY_PATH)}")
+    parser.add_argument("--compare", action="store_true", help="Fail if any case is slower than the last saved run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--history", action="store_true", help="Print saved runs per case and exit")
+    args = parser.parse_args()
+
+    if args.history:
+        print_history(load_history())
+        return
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    day_counts = QUICK_DAY_COUNTS if args.quick else DAY_COUNTS
+    vocabulary_sizes = QUICK_VOCABULARY_SIZES if args.quick else VOCABULARY_SIZES
+
+    # Baseline is read before saving so a run never compares against itself
+    history = load_history()
+    started = time.perf_counter()
+    results = run_benchmarks(names, day_counts, vocabulary_sizes, args.repeat, args.seed)
+    print(f"⏱️ {len(results)} cases in {time.perf_counter() - started:.1f} s")
+
+    if args.save:
+        run = save_run(results, args.seed)
+        print(f"💾 Saved as {run['commit']}")
+
+    if args.compare:
+        if not history:
+            print("ℹ️ No saved run to compare against; use --save first")
+            return
+        baseline = history[-1]
+        regressions = compare_runs(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ Slower than {baseline['commit']} by more than {args.threshold:.2f}x:")
+            for key, old, new in regressions:
+                print(f"   {key:<48} {_format_time(old)} -> {_format_time(new)} ({new / old:.2f}x)")
+            sys.exit(1)
+        print(f"✅ No regressions against {baseline['commit']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Process-wide cache of chat answers to generic cooking questions.
+
+Questions are normalized (lowercased, punctuation and stopwords removed,
+words reduced to a rough lemma) and combined with the profile facets that
+change the answer, so "How long do I soak chickpeas?" and "how long to soak
+chickpeas" from two users with the same diet and allergies share one answer.
+Cacheable turns are answered from those facets and the question alone, so an
+answer never carries another user's name, weight or goals. Only the opening
+question of a conversation is cached, and not even that when it refers to
+something else ("what about that one?"). Entries are evicted
+least-recently-used and expire after a TTL.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from llm_runtime import canonical_request_key
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# Profile fields that change the answer to a generic cooking question
+PROFILE_FACETS = ("diet_type", "allergies", "medical_conditions")
+
+_WORD_RE = re.compile(r"[a-z]+")
+_LIST_SPLIT_RE = re.compile(r"[,;\n]+")
+
+STOPWORDS = frozenset({
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "is", "are", "was", "be",
+    "do", "does", "did", "can", "could", "would", "will", "to", "of", "in", "on", "at", "for",
+    "with", "and", "or", "what", "whats", "how", "please", "should", "there", "any", "some",
+    "s", "am", "it", "tell", "about",
+})
+# Words that tie a question to earlier turns ("what about that one?", "make it spicier")
+REFERENCE_WORDS = frozenset({
+    "it", "its", "that", "this", "these", "those", "they", "them", "one", "ones", "more", "else",
+    "also", "again", "instead", "above", "previous", "earlier", "same", "another", "other",
+    "first", "second", "last", "option", "options", "suggestion", "suggested", "mentioned",
+})
+_LEMMA_EXCEPTIONS = frozenset({"cheese", "rice", "molasses", "hummus", "couscous", "asparagus", "less"})
+
+
+def _lemma(word):
+    """Rough lemma: strip plural and verb endings so "baking", "baked" and "bake" match"""
+    if word in _LEMMA_EXCEPTIONS or len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("ing") and len(word) > 5:
+        word = word[:-3]
+        # "stirring" -> "stir"
+        if word[-1] == word[-2] and word[-1] not in "ls":
+            word = word[:-1]
+    elif word.endswith("ed") and len(word) > 4:
+        word = word[:-2]
+        if word[-1] == word[-2] and word[-1] not in "ls":
+            word = word[:-1]
+    elif word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us")):
+        word = word[:-1]
+    # Drop a silent final "e" so "bake" and "bak(ing)" share a stem
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def normalize_question(question):
+    """Lowercased, punctuation-free, stopword-free and lemmatized question text"""
+    words = _WORD_RE.findall(str(question).lower().replace("'", ""))
+    return " ".join(_lemma(word) for word in words if word not in STOPWORDS)
+
+
+def is_conversation_dependent(question):
+    """True if the question only makes sense with the earlier turns"""
+    words = _WORD_RE.findall(str(question).lower().replace("'", ""))
+    return bool(REFERENCE_WORDS.intersection(words)) or len(normalize_question(question).split()) < 2
+
+
+def _facet_value(value):
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = _LIST_SPLIT_RE.split(str(value or ""))
+    return sorted({" ".join(str(item).lower().split()) for item in items} - {"", "none", "no"})
+
+
+def cache_key(question, profile):
+    """Cache key for a generic question, or None if the turn should not be cached"""
+    if is_conversation_dependent(question):
+        return None
+    profile = profile or {}
+    facets = {facet: _facet_value(profile.get(facet)) for facet in PROFILE_FACETS}
+    return canonical_request_key("chat_answer", normalize_question(question), facets)
+
+
+def facet_context(profile):
+    """Profile context for a cacheable turn: only the facets in its cache key"""
+    profile = profile or {}
+    lines = [f"- {facet.replace('_', ' ').title()}: {', '.join(_facet_value(profile.get(facet))) or 'None'}"
+             for facet in PROFILE_FACETS]
+    return "\n".join(lines)
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with per-entry expiry; unset limits are read from the environment on first use"""
+
+    def __init__(self, max_entries=None, ttl_seconds=None):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Read lazily, so values from .env loaded after this module was imported still apply
+    @property
+    def max_entries(self):
+        if self._max_entries is None:
+            self._max_entries = int(os.getenv("MEAL_PLANNER_CHAT_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+        return self._max_entries
+
+    @property
+    def ttl_seconds(self):
+        if self._ttl_seconds is None:
+            self._ttl_seconds = float(os.getenv("MEAL_PLANNER_CHAT_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        return self._ttl_seconds
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Cached answer for a key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, answer):
+        """Store an answer, evicting the least recently used entries over the cap"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Hit and miss counters with the current size"""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,174 @@
+"""
+Local answers for chat questions about the current plan.
+
+Lookups such as "how much protein on Tuesday?", "what's Friday's dinner?" or
+"what do I prep tonight?" are answered straight from the session's meal plan
+and prep reminders. Anything open-ended, or anything the router is not sure
+about, returns None and goes to the LLM as before.
+"""
+
+import re
+from datetime import datetime, timedelta
+
+from meal_data import DAYS, MEAL_LABELS, MEAL_TYPES, NUTRIENT_LABELS
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+_DAY_WORDS = {day.lower(): day for day in DAYS}
+_DAY_WORDS.update({"tues": "Tuesday", "weds": "Wednesday", "thurs": "Thursday"})
+# Relative day words -> offset from today
+_RELATIVE_DAYS = {"today": 0, "tonight": 0, "tomorrow": 1, "yesterday": -1}
+_WEEK_WORDS = frozenset({"week", "weekly", "weeks"})
+
+_MEAL_WORDS = {
+    "breakfast": ("breakfast",), "lunch": ("lunch",), "dinner": ("dinner",), "supper": ("dinner",),
+    "snack": ("snack1", "snack2"), "snacks": ("snack1", "snack2"),
+}
+_NUTRIENT_WORDS = {
+    "calories": ("calories",), "calorie": ("calories",), "kcal": ("calories",), "cals": ("calories",),
+    "protein": ("protein",), "proteins": ("protein",),
+    "carbs": ("carbs",), "carb": ("carbs",), "carbohydrates": ("carbs",), "carbohydrate": ("carbs",),
+    "fat": ("fat",), "fats": ("fat",),
+    "fiber": ("fiber",), "fibre": ("fiber",),
+    "macros": ("calories", "protein", "carbs", "fat", "fiber"), "nutrition": ("calories", "protein", "carbs", "fat", "fiber"),
+}
+_PREP_WORDS = frozenset({"prep", "prepare", "preparation", "soak", "marinate", "defrost", "thaw"})
+_INGREDIENT_WORDS = frozenset({"ingredient", "ingredients", "in"})
+
+# A lookup has to be phrased as one; "how do I make Friday's dinner?" is not
+_LOOKUP_CUES = frozenset({"what", "whats", "show", "list", "tell", "much", "many", "total"})
+# Words that tie a question to the user's own plan rather than to meals in general
+_PLAN_WORDS = frozenset({"my", "plan", "planned"})
+# The one phrasing that means today's plan without saying so
+_TODAY_LOOKUP_RE = re.compile(r"^\s*what(?:'s|’s|s| is)\s+for\s+(?:breakfast|lunch|dinner|supper|snacks?)\s*\??\s*$", re.IGNORECASE)
+# Words that make a question open-ended even when it mentions the plan
+_OPEN_ENDED_WORDS = frozenset({
+    "why", "substitute", "substitution", "alternative", "alternatives", "instead", "swap", "replace",
+    "recipe", "recipes", "cook", "make", "healthier", "healthy", "suggest", "recommend", "change",
+    "enough", "need", "too", "better", "idea", "ideas", "if", "without",
+})
+
+
+def _words(question):
+    return _WORD_RE.findall(question.lower().replace("’", "'").replace("'s", "").replace("'", ""))
+
+
+def _mentioned_days(words, today):
+    """Days referred to in order, each with whether it follows "for" ("prep for Friday")"""
+    days = []
+    for index, word in enumerate(words):
+        day = _DAY_WORDS.get(word)
+        if day is None and word in _RELATIVE_DAYS:
+            day = (today + timedelta(days=_RELATIVE_DAYS[word])).strftime("%A")
+        if day and day not in (seen for seen, _ in days):
+            days.append((day, index > 0 and words[index - 1] == "for"))
+    return days
+
+
+def _mentioned(words, table):
+    found = []
+    for word in words:
+        for value in table.get(word, ()):
+            if value not in found:
+                found.append(value)
+    return found
+
+
+def _day_meals(meal_plan, day, meal_types):
+    day_plan = meal_plan.get(day)
+    if not isinstance(day_plan, dict):
+        return []
+    return [(meal_type, day_plan[meal_type]) for meal_type in meal_types if isinstance(day_plan.get(meal_type), dict)]
+
+
+def _nutrition_answer(meal_plan, days, meal_types, nutrients, whole_week):
+    lines = []
+    if whole_week:
+        meals = [meal for day in DAYS for _, meal in _day_meals(meal_plan, day, MEAL_TYPES)]
+        for nutrient in nutrients:
+            total = sum(meal.get(nutrient, 0) for meal in meals)
+            lines.append(f"📊 **{NUTRIENT_LABELS[nutrient]} this week:** {total:,} (about {total // 7:,} a day)")
+        return "\n\n".join(lines)
+
+    for day in days:
+        meals = _day_meals(meal_plan, day, meal_types or MEAL_TYPES)
+        if not meals:
+            return None
+        scope = f"{day} " + " + ".join(MEAL_LABELS[meal_type] for meal_type, _ in meals) if meal_types else day
+        for nutrient in nutrients:
+            total = sum(meal.get(nutrient, 0) for _, meal in meals)
+            lines.append(f"📊 **{NUTRIENT_LABELS[nutrient]}, {scope}:** {total}")
+    return "\n\n".join(lines)
+
+
+def _plan_answer(meal_plan, days, meal_types, show_ingredients):
+    lines = []
+    for day in days:
+        meals = _day_meals(meal_plan, day, meal_types or MEAL_TYPES)
+        if not meals:
+            return None
+        lines.append(f"📅 **{day}**")
+        for meal_type, meal in meals:
+            lines.append(f"**{MEAL_LABELS[meal_type]}:** {meal.get('meal', 'Unknown meal')} ({meal.get('calories', 0)} cal)")
+            if show_ingredients and meal.get("ingredients"):
+                lines.append(f"🛒 {', '.join(meal['ingredients'])}")
+    return "\n\n".join(lines)
+
+
+def _prep_answer(prep_reminders, days):
+    lines = []
+    for day, is_target in days:
+        # Reminders are keyed by the evening they happen; "prep for Friday" means the tasks for Friday's meals
+        if is_target:
+            reminders = [reminder for evening in prep_reminders.values() for reminder in evening if reminder["for_day"] == day]
+            lines.append(f"⏰ **Prep for {day}**")
+        else:
+            reminders = prep_reminders.get(day, [])
+            lines.append(f"⏰ **{day} evening prep**")
+        if not reminders:
+            lines.append("Nothing to prep. ✅")
+        for number, reminder in enumerate(reminders, 1):
+            lines.append(f"{number}. {reminder['prep_note']} ({reminder['for_day']} {reminder['meal_type']}: {reminder['meal']})")
+    return "\n\n".join(lines)
+
+
+def answer_locally(question, meal_plan, prep_reminders, today=None):
+    """Answer a plan, nutrition or prep lookup from session data, or None to ask the LLM"""
+    if not meal_plan or "error" in meal_plan or not question:
+        return None
+    words = _words(question)
+    if not words or _OPEN_ENDED_WORDS.intersection(words):
+        return None
+
+    today = today or datetime.now()
+    days = _mentioned_days(words, today)
+    whole_week = bool(_WEEK_WORDS.intersection(words))
+    meal_types = _mentioned(words, _MEAL_WORDS)
+    nutrients = _mentioned(words, _NUTRIENT_WORDS)
+
+    if _PREP_WORDS.intersection(words):
+        # "What do I prep tonight?" needs no other lookup cue
+        if not days or meal_types or nutrients:
+            return None
+        return _prep_answer(prep_reminders or {}, days)
+
+    if not _LOOKUP_CUES.intersection(words):
+        return None
+    # "What is a good breakfast for a runner?" is about breakfasts in general, not the plan
+    this_week = whole_week and any(word == "this" and following in _WEEK_WORDS for word, following in zip(words, words[1:]))
+    asks_today = bool(_TODAY_LOOKUP_RE.match(question))
+    if not (days or asks_today or this_week or _PLAN_WORDS.intersection(words)):
+        return None
+    if not days and meal_types and not whole_week:
+        # "What's for dinner?" and "what's in my dinner?" mean today's
+        days = [(today.strftime("%A"), False)]
+    if not (days or whole_week):
+        return None
+    if nutrients:
+        if whole_week and (days or meal_types):
+            return None
+        return _nutrition_answer(meal_plan, [day for day, _ in days], meal_types, nutrients, whole_week)
+    if whole_week:
+        return None
+    show_ingredients = bool(_INGREDIENT_WORDS.intersection(words))
+    return _plan_answer(meal_plan, [day for day, _ in days], meal_types, show_ingredients)
@@ -0,0 +1,90 @@
+"""
+Bounded per-session chat log.
+
+Only the most recent messages stay in memory; older turns are appended to a
+JSON-lines spill file for the session and read back only when the user pages
+through old history. The spill file is removed when the log is cleared or
+garbage collected with its session.
+"""
+
+import json
+import os
+import tempfile
+import uuid
+import weakref
+from collections import deque
+
+DEFAULT_MEMORY_CAP = 50
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _default_spill_dir():
+    return os.getenv("MEAL_PLANNER_CHAT_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "meal_planner_chat")
+
+
+class ChatLog:
+    """Chat messages for one session, capped in memory with older turns spilled to disk"""
+
+    def __init__(self, memory_cap=None, spill_dir=None):
+        self.memory_cap = max(1, int(memory_cap or os.getenv("MEAL_PLANNER_CHAT_MEMORY_CAP", DEFAULT_MEMORY_CAP)))
+        self.spill_dir = spill_dir or _default_spill_dir()
+        self.spill_path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.jsonl")
+        self._recent = deque()
+        self._spilled = 0
+        weakref.finalize(self, _remove_file, self.spill_path)
+
+    def __len__(self):
+        return self._spilled + len(self._recent)
+
+    def append(self, role, content):
+        """Add a message, moving the oldest in-memory one to disk if over the cap"""
+        self._recent.append({"role": role, "content": content})
+        overflow = len(self._recent) - self.memory_cap
+        if overflow > 0:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for _ in range(overflow):
+                    f.write(json.dumps(self._recent.popleft()) + "\n")
+            self._spilled += overflow
+
+    def recent(self, count=None):
+        """The newest in-memory messages, oldest first"""
+        messages = list(self._recent)
+        return messages if count is None else messages[-count:]
+
+    def _read_spilled(self, start, end):
+        if start >= end:
+            return []
+        messages = []
+        with open(self.spill_path, encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                if index >= end:
+                    break
+                if index >= start:
+                    messages.append(json.loads(line))
+        return messages
+
+    def page(self, page, page_size):
+        """Messages on a page counted back from the newest (page 0), oldest first"""
+        total = len(self)
+        end = max(0, total - page * page_size)
+        start = max(0, end - page_size)
+        spilled = self._read_spilled(start, min(end, self._spilled))
+        in_memory = list(self._recent)[max(0, start - self._spilled):max(0, end - self._spilled)]
+        return spilled + in_memory
+
+    def page_count(self, page_size):
+        """Number of pages needed to show the whole conversation"""
+        return max(1, -(-len(self) // page_size))
+
+    def clear(self):
+        """Drop all messages, including those spilled to disk"""
+        self._recent.clear()
+        self._spilled = 0
+        _remove_file(self.spill_path)
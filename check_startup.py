@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Cold-start budget check for the meal planner app.
+
+Imports app.py in fresh interpreters and fails (exit code 1) when the import
+takes longer than the budget or pulls in modules that should load lazily.
+Streamlit itself is imported before timing starts because a running server
+has already loaded it before executing the script.
+
+Usage: python check_startup.py [--budget-ms 150] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 150
+# Heavy modules that must only be imported on first use
+LAZY_MODULES = ("openai", "pandas")
+
+PROBE = """
+import json, sys, time
+import streamlit
+started = time.perf_counter()
+import app
+elapsed_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({"import_ms": elapsed_ms, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def run_probe(app_dir):
+    """Import app in a fresh interpreter and return the probe result"""
+    output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=app_dir, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _import_times(app_dir, statement):
+    """Map of module name to cumulative import time in ms from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=app_dir, capture_output=True, text=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        timings[name.strip()] = int(cumulative_us.strip()) / 1000
+    return timings
+
+
+def slowest_imports(app_dir, limit=10):
+    """Slowest modules imported by app beyond what streamlit already loads"""
+    baseline = _import_times(app_dir, "import streamlit")
+    timings = _import_times(app_dir, "import streamlit, app")
+    app_only = [(ms, name) for name, ms in timings.items() if name not in baseline]
+    return sorted(app_only, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if app.py cold start exceeds its budget")
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("MEAL_PLANNER_STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    results = [run_probe(app_dir) for _ in range(args.runs)]
+    best_ms = min(result["import_ms"] for result in results)
+    eagerly_loaded = sorted({module for result in results for module in result["loaded"]})
+
+    print(f"⏱️ app import: best {best_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if best_ms > args.budget_ms:
+        print("❌ Cold start is over budget. Slowest imports:")
+        for cumulative_ms, name in slowest_imports(app_dir):
+            print(f"   {cumulative_ms:8.1f} ms  {name}")
+        failed = True
+    if eagerly_loaded:
+        print(f"❌ Modules that should load lazily were imported at startup: {', '.join(eagerly_loaded)}")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Cold start within budget")
+
+
+if __name__ == "__main__":
+    main()
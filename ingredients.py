@@ -0,0 +1,205 @@
+"""
+Ingredient canonicalization for grocery list dedupe.
+
+Ingredient strings from the model vary in plurals, descriptors and synonyms
+("Chicken Breasts", "Boneless Chicken Breast"). Each string is normalized,
+mapped through a synonym dictionary and, failing that, fuzzy-matched against
+the dictionary with a character trigram index. Dictionary ingredients are
+interned once per process, so every session shares the same id and display
+string. Any other name is identified by its normalized key and shown as the
+session's own text with quantities and descriptors removed, so nothing one
+session sends is kept for, or shown to, another.
+"""
+
+import re
+import sys
+from functools import lru_cache
+
+# Canonical ingredient -> alternative names that mean the same grocery item
+CANONICAL_INGREDIENTS = {
+    "Chicken Breast": ["chicken breasts", "chicken breast fillet"],
+    "Chicken Thighs": ["chicken thigh"],
+    "Salmon Fillet": ["salmon", "salmon fillets"],
+    "Cod Fillet": ["cod", "cod fillets"],
+    "Shrimp": ["prawns", "prawn"],
+    "Lean Beef": ["lean ground beef", "beef strips"],
+    "Firm Tofu": ["tofu", "extra firm tofu"],
+    "Eggs": ["egg", "whole eggs"],
+    "Chickpeas": ["garbanzo beans", "chick peas", "garbanzos"],
+    "Black Beans": ["black bean"],
+    "Red Lentils": ["red lentil"],
+    "Rolled Oats": ["old fashioned oats", "oatmeal", "oats"],
+    "Brown Rice": ["brown rice grains"],
+    "Quinoa": ["quinoa grains"],
+    "Whole Grain Bread": ["whole wheat bread", "wholegrain bread"],
+    "Tortilla": ["tortillas", "flour tortilla", "wraps"],
+    "Bell Peppers": ["bell pepper", "capsicum", "sweet peppers"],
+    "Green Onions": ["scallions", "spring onions"],
+    "Zucchini": ["courgette", "courgettes"],
+    "Eggplant": ["aubergine"],
+    "Arugula": ["rocket"],
+    "Cilantro": ["coriander leaves", "fresh coriander"],
+    "Tomatoes": ["tomato"],
+    "Broccoli": ["broccoli florets"],
+    "Spinach": ["baby spinach", "spinach leaves"],
+    "Avocado": ["avocados"],
+    "Banana": ["bananas"],
+    "Mixed Berries": ["berries", "berry mix"],
+    "Greek Yogurt": ["greek yoghurt", "plain greek yogurt"],
+    "Yogurt": ["yoghurt", "plain yogurt", "natural yogurt"],
+    "Milk": ["whole milk", "skim milk", "cow milk"],
+    "Olive Oil": ["extra virgin olive oil", "evoo"],
+    "Soy Sauce": ["soya sauce", "low sodium soy sauce", "tamari"],
+    "Maple Syrup": ["pure maple syrup"],
+    "Peanut Butter": ["natural peanut butter"],
+    "Garlic": ["garlic cloves", "garlic clove"],
+    "Ginger": ["ginger root", "fresh ginger"],
+    "Herbs": ["mixed herbs", "fresh herbs"],
+}
+
+# Words that describe preparation or quality rather than the item itself
+DESCRIPTOR_WORDS = frozenset({
+    "boneless", "skinless", "fresh", "organic", "chopped", "diced", "sliced", "minced",
+    "grated", "shredded", "large", "small", "medium", "ripe", "raw", "canned", "cooked",
+    "unsweetened", "plain", "low-fat", "lowfat", "optional",
+})
+# Quantity words dropped from both the canonical key and the display name
+UNIT_WORDS = frozenset({
+    "cup", "cups", "tbsp", "tsp", "tablespoon", "tablespoons", "teaspoon", "teaspoons",
+    "g", "gram", "grams", "kg", "oz", "ounce", "ounces", "lb", "lbs", "pound", "pounds",
+    "ml", "l", "pinch", "handful", "of",
+})
+# Words whose trailing "s" is not a plural
+_SINGULAR_EXCEPTIONS = frozenset({"molasses", "brussels", "swiss", "series"})
+# Plurals in "-ies" whose singular ends in "-ie" or "-i" rather than "-y"
+_IRREGULAR_PLURALS = {
+    "chilies": "chili", "chillies": "chilli", "cookies": "cookie", "brownies": "brownie",
+    "veggies": "veggie", "smoothies": "smoothie", "pies": "pie",
+}
+# Minimum trigram Dice similarity for a fuzzy match against the dictionary
+FUZZY_THRESHOLD = 0.75
+
+_WORD_RE = re.compile(r"[a-z][a-z'-]*")
+
+
+def _singular(word):
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if word in _SINGULAR_EXCEPTIONS or len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    # "bay leaves", "loaves", "halves"; not "olives" or "chives"
+    if word.endswith(("eaves", "oaves", "lves")):
+        return word[:-3] + "f"
+    if word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def normalize(ingredient):
+    """Lowercase, drop descriptors and quantities, and singularise each word"""
+    words = [
+        word for word in _WORD_RE.findall(str(ingredient).lower())
+        if word not in DESCRIPTOR_WORDS and word not in UNIT_WORDS
+    ]
+    return " ".join(_singular(word) for word in words)
+
+
+def _trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _trigram_similarity(grams_a, grams_b):
+    if not grams_a or not grams_b:
+        return 0.0
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def _build_dictionary():
+    """Map every normalized name and synonym to its canonical key"""
+    synonyms = {}
+    display = {}
+    for canonical, alternatives in CANONICAL_INGREDIENTS.items():
+        key = normalize(canonical)
+        display[key] = canonical
+        synonyms[key] = key
+        for alternative in alternatives:
+            synonyms.setdefault(normalize(alternative), key)
+    return synonyms, display
+
+
+_SYNONYMS, _DICTIONARY_DISPLAY = _build_dictionary()
+
+# Character trigram -> dictionary keys containing it, for fuzzy lookups
+_TRIGRAM_INDEX = {}
+_KEY_TRIGRAMS = {}
+for _key in _SYNONYMS:
+    _KEY_TRIGRAMS[_key] = _trigrams(_key)
+    for _gram in _KEY_TRIGRAMS[_key]:
+        _TRIGRAM_INDEX.setdefault(_gram, set()).add(_key)
+
+
+def fuzzy_match(key):
+    """Closest dictionary key for a normalized name, or None"""
+    grams = _trigrams(key)
+    candidates = set()
+    for gram in grams:
+        candidates.update(_TRIGRAM_INDEX.get(gram, ()))
+
+    word_count = key.count(" ")
+    best_key, best_score = None, FUZZY_THRESHOLD
+    for candidate in candidates:
+        # Only compare names with the same number of words ("oat milk" is not "goat milk")
+        if candidate.count(" ") != word_count or candidate[0] != key[0]:
+            continue
+        score = _trigram_similarity(grams, _KEY_TRIGRAMS[candidate])
+        if score >= best_score:
+            best_key, best_score = candidate, score
+    return _SYNONYMS[best_key] if best_key else None
+
+
+# Only the fixed dictionary is interned, so the table cannot grow with model output
+_ids = {key: index for index, key in enumerate(_DICTIONARY_DISPLAY)}
+_display_names = [sys.intern(name) for name in _DICTIONARY_DISPLAY.values()]
+
+
+@lru_cache(maxsize=8192)
+def canonical_key(ingredient):
+    """Normalized name an ingredient string resolves to: a dictionary key, or its own normalized form"""
+    key = normalize(ingredient)
+    if not key:
+        return " ".join(str(ingredient).lower().split())
+    if key in _SYNONYMS:
+        return _SYNONYMS[key]
+    return fuzzy_match(key) or key
+
+
+def canonical_id(ingredient):
+    """Process-wide integer id for a dictionary ingredient, or the normalized key for any other"""
+    key = canonical_key(ingredient)
+    return _ids.get(key, key)
+
+
+def _cleaned_display(ingredient):
+    """Title-cased ingredient text without quantities, units or descriptors, plurals kept"""
+    words = [
+        word for word in _WORD_RE.findall(str(ingredient).lower())
+        if word not in DESCRIPTOR_WORDS and word not in UNIT_WORDS
+    ]
+    return " ".join(words).title() or " ".join(str(ingredient).split()).title()
+
+
+def display_name(ingredient_id, ingredient=None):
+    """Shared name for a dictionary ingredient id, otherwise the caller's own ingredient text cleaned up"""
+    if isinstance(ingredient_id, int):
+        return _display_names[ingredient_id]
+    return _cleaned_display(ingredient if ingredient is not None else ingredient_id)
+
+
+def canonical_name(ingredient):
+    """Display name of the canonical ingredient for a raw ingredient string"""
+    return display_name(canonical_id(ingredient), ingredient)
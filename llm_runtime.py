@@ -0,0 +1,319 @@
+"""
+Process-wide helpers for the OpenAI calls made by the meal planner app.
+
+Streamlit re-executes app.py on every rerun, so any state that must be shared
+between sessions (in-flight requests, counters) lives in this imported module.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+_inflight_lock = threading.Lock()
+_inflight = {}
+
+
+def canonical_request_key(*parts):
+    """Build a stable hash key from JSON-serialisable request parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def single_flight(key, fn, *args, **kwargs):
+    """Run fn once per key; concurrent callers with the same key share its result"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[key] = future
+
+    if is_leader:
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+
+    # Every caller gets its own copy so sessions never share mutable results
+    return copy.deepcopy(future.result())
+
+
+def inflight_count():
+    """Number of distinct requests currently being computed"""
+    with _inflight_lock:
+        return len(_inflight)
+
+
+_usage_lock = threading.Lock()
+_token_usage = {}
+
+
+def record_usage(endpoint, response):
+    """Add the token counts from a completion response to the per-endpoint totals"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    call_usage = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+    with _usage_lock:
+        totals = _token_usage.setdefault(endpoint, {
+            "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0
+        })
+        totals["calls"] += 1
+        for field, count in call_usage.items():
+            totals[field] += count
+
+    return call_usage
+
+
+def token_usage_snapshot():
+    """Copy of the aggregated token counts, keyed by endpoint"""
+    with _usage_lock:
+        return copy.deepcopy(_token_usage)
+
+
+_env_loaded = False
+_client_lock = threading.Lock()
+_clients = {}
+
+
+def load_environment():
+    """Load variables from .env the first time it is called in this process"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    _env_loaded = True
+
+
+def get_openai_client():
+    """Shared OpenAI client; the openai package is only imported on first LLM use"""
+    api_key = os.getenv("OPENAI_API_KEY")
+    with _client_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            import openai
+            # No client retries: every call runs within one latency budget, and a retry would outlive it
+            client = _clients[api_key] = openai.OpenAI(api_key=api_key, max_retries=0)
+    return client
+
+
+_executor_lock = threading.Lock()
+_executor = None
+
+
+def submit_background(fn, *args, **kwargs):
+    """Run fn on the shared background worker pool and return its Future"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("MEAL_PLANNER_BACKGROUND_WORKERS", "8"))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="meal-plan")
+    return _executor.submit(fn, *args, **kwargs)
+
+
+# Seconds an LLM call may take in total
+DEFAULT_LATENCY_BUDGETS = {"chat": 30.0, "meal_plan": 90.0, "meal_swap": 20.0, "json_repair": 30.0}
+DEFAULT_LATENCY_BUDGET = 30.0
+# Successful calls needed before an endpoint's p95 is trusted as a hedge delay
+HEDGE_MIN_SAMPLES = 20
+
+_latency_lock = threading.Lock()
+_latencies = {}
+_call_stats = {}
+_llm_executor_lock = threading.Lock()
+_llm_executor = None
+
+
+def latency_budget(endpoint):
+    """Latency budget in seconds for an endpoint, overridable with MEAL_PLANNER_<ENDPOINT>_TIMEOUT"""
+    override = os.getenv(f"MEAL_PLANNER_{endpoint.upper()}_TIMEOUT")
+    return float(override) if override else DEFAULT_LATENCY_BUDGETS.get(endpoint, DEFAULT_LATENCY_BUDGET)
+
+
+def _llm_pool():
+    global _llm_executor
+    with _llm_executor_lock:
+        if _llm_executor is None:
+            workers = int(os.getenv("MEAL_PLANNER_LLM_WORKERS", "32"))
+            _llm_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-call")
+    return _llm_executor
+
+
+def _stats_for(endpoint):
+    return _call_stats.setdefault(endpoint, {"calls": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "aborts": 0})
+
+
+def _hedge_delay(endpoint):
+    """Rolling p95 latency to wait before hedging, or None when hedging is off or over its rate cap"""
+    rate = float(os.getenv("MEAL_PLANNER_HEDGE_RATE", "0"))
+    if rate <= 0:
+        return None
+    with _latency_lock:
+        samples = sorted(_latencies.get(endpoint, ()))
+        stats = _stats_for(endpoint)
+        if len(samples) < HEDGE_MIN_SAMPLES or stats["hedges"] >= rate * stats["calls"]:
+            return None
+    return samples[int(0.95 * (len(samples) - 1))]
+
+
+def _is_sdk_timeout(error):
+    """True for the openai SDK's and httpx's timeout errors, matched by name so neither is imported here"""
+    return isinstance(error, TimeoutError) or any(
+        cls.__name__ in ("APITimeoutError", "TimeoutException") for cls in type(error).__mro__
+    )
+
+
+def _budget_exceeded(endpoint, budget, what="request"):
+    """Count a timeout for the endpoint and build the TimeoutError callers handle"""
+    with _latency_lock:
+        _stats_for(endpoint)["timeouts"] += 1
+    return TimeoutError(f"{endpoint} {what} exceeded its {budget:g}s latency budget")
+
+
+def _create_before(deadline, create, request):
+    """Start a queued request only if time is left, and give it no more than what is left"""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("latency budget spent before the request could start")
+    return create(timeout=remaining, **request)
+
+
+def create_completion(endpoint, budget=None, **request):
+    """Chat completion within the endpoint's latency budget, hedged after the rolling p95 if enabled"""
+    client = get_openai_client()
+    budget = budget or latency_budget(endpoint)
+    started = time.monotonic()
+    deadline = started + budget
+    with _latency_lock:
+        _stats_for(endpoint)["calls"] += 1
+
+    pool = _llm_pool()
+    create = client.chat.completions.create
+    primary = pool.submit(_create_before, deadline, create, request)
+    pending = {primary}
+
+    delay = _hedge_delay(endpoint)
+    if delay is not None and delay < budget and not wait(pending, timeout=delay)[0]:
+        # The first request is slower than 95% of recent ones; race a duplicate against it
+        with _latency_lock:
+            _stats_for(endpoint)["hedges"] += 1
+        pending.add(pool.submit(_create_before, deadline, create, request))
+
+    error = None
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise _budget_exceeded(endpoint, budget)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                with _latency_lock:
+                    _latencies.setdefault(endpoint, deque(maxlen=200)).append(time.monotonic() - started)
+                    if future is not primary:
+                        _stats_for(endpoint)["hedge_wins"] += 1
+                return future.result()
+        if _is_sdk_timeout(error):
+            # The SDK's own timeout, so callers only need to handle TimeoutError
+            raise _budget_exceeded(endpoint, budget) from error
+        raise error
+    finally:
+        # Abandoned requests still queued never start; running ones end at the deadline through their timeout
+        for future in pending:
+            future.cancel()
+
+
+def stream_completion(endpoint, on_text, budget=None, **request):
+    """Streamed chat completion passing each text delta to on_text; an exception from on_text aborts the stream"""
+    client = get_openai_client()
+    budget = budget or latency_budget(endpoint)
+    started = time.monotonic()
+    deadline = started + budget
+    with _latency_lock:
+        _stats_for(endpoint)["calls"] += 1
+
+    try:
+        stream = client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, timeout=deadline - time.monotonic(), **request
+        )
+    except Exception as e:
+        if not _is_sdk_timeout(e):
+            raise
+        raise _budget_exceeded(endpoint, budget, "stream") from e
+    # The HTTP timeout only bounds each read, so a stream stalled mid-response is closed at the deadline
+    expired = threading.Event()
+
+    def close_stream():
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+    def expire():
+        expired.set()
+        close_stream()
+
+    watchdog = threading.Timer(max(0.0, deadline - time.monotonic()), expire)
+    watchdog.daemon = True
+    watchdog.start()
+    parts = []
+    usage = None
+    aborted = False
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                text = choice.delta.content
+                if not text:
+                    continue
+                parts.append(text)
+                try:
+                    on_text(text)
+                except Exception:
+                    aborted = True
+                    with _latency_lock:
+                        _stats_for(endpoint)["aborts"] += 1
+                    raise
+            if time.monotonic() > deadline:
+                expired.set()
+                break
+    except Exception as e:
+        # Closing the stream from the watchdog surfaces as whatever the reader was doing at the time
+        if aborted or not (expired.is_set() or _is_sdk_timeout(e)):
+            raise
+        raise _budget_exceeded(endpoint, budget, "stream") from e
+    finally:
+        watchdog.cancel()
+        # Closing drops the connection, so an aborted generation stops being produced (and billed)
+        close_stream()
+    # Closing the stream can also end iteration quietly instead of raising
+    if expired.is_set():
+        raise _budget_exceeded(endpoint, budget, "stream")
+
+    # Same shape as a non-streamed response, so callers and record_usage need not care
+    message = SimpleNamespace(content="".join(parts))
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def llm_call_stats():
+    """Copy of the per-endpoint call, hedge, timeout and abort counters"""
+    with _latency_lock:
+        return copy.deepcopy(_call_stats)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Multi-session load test for the meal planner using Streamlit's AppTest.
+
+Drives N simulated sessions through the real app flows (profile submit,
+reruns from tab switches, grocery checkbox toggles, chat sends) with the
+OpenAI client replaced by an in-process stub, then reports per-rerun latency
+percentiles, resident memory per session and overall throughput.
+
+Each worker process stands in for one replica: its sessions stay alive
+together and take turns rerunning, since AppTest cannot run in parallel
+threads.
+
+Usage: python load_test.py --sessions 20 --concurrency 2 --llm-latency 0.5
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import llm_runtime
+from meal_data import FALLBACK_TEMPLATES, thaw
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+CHAT_QUESTIONS = (
+    "How long should I soak chickpeas?",
+    "What can I substitute for eggs in pancakes?",
+    "Is quinoa a complete protein?",
+    "How do I keep cut avocado from browning?",
+)
+
+
+class _StubCompletions:
+    """Stands in for client.chat.completions with fixed latency and canned output"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def create(self, model, messages, max_tokens, **kwargs):
+        time.sleep(self.latency)
+        if max_tokens >= 2000:
+            plan = thaw(random.choice(list(FALLBACK_TEMPLATES.values())))
+            content = json.dumps(plan)
+        else:
+            content = "Stub answer: soak overnight, rinse well and cook until tender."
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(m["content"]) // 4 for m in messages),
+            completion_tokens=len(content) // 4,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+        )
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def install_llm_stub(latency):
+    """Route every OpenAI call in this process to the stub client"""
+    client = SimpleNamespace(chat=SimpleNamespace(completions=_StubCompletions(latency)))
+    llm_runtime.get_openai_client = lambda: client
+
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is a peak value in KiB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def session_steps(session_number, args, timings, errors):
+    """Generator running one session's scenario, yielding after every rerun"""
+    from streamlit.testing.v1 import AppTest
+
+    def timed_run(action, fn):
+        started = time.perf_counter()
+        result = fn()
+        timings.setdefault(action, []).append(time.perf_counter() - started)
+        if result.exception:
+            errors.append(f"{action}: {result.exception[0].message}")
+        return result
+
+    rng = random.Random(session_number)
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    at = timed_run("initial_load", at.run)
+    yield
+
+    at.selectbox[1].set_value(rng.choice(at.selectbox[1].options))
+    submit = next(button for button in at.button if "Save Profile" in str(button.label))
+    at = timed_run("profile_submit", submit.click().run)
+    yield
+
+    # Tab switches happen in the browser; the server sees a plain rerun per interaction
+    for _ in range(args.tab_switches):
+        at = timed_run("rerun", at.run)
+        yield
+
+    grocery_keys = [checkbox.key for checkbox in at.checkbox if str(checkbox.key).startswith("grocery_")]
+    for key in rng.sample(grocery_keys, min(args.grocery_toggles, len(grocery_keys))):
+        checkbox = at.checkbox(key=key)
+        at = timed_run("grocery_toggle", checkbox.set_value(not checkbox.value).run)
+        yield
+
+    for _ in range(args.chat_sends):
+        at.text_input(key="chat_input").input(rng.choice(CHAT_QUESTIONS))
+        at = timed_run("chat_send", at.button(key="send_chat").click().run)
+        yield
+
+
+def run_worker(args, session_numbers):
+    """Interleave several sessions in one process, as a replica would serve them"""
+    # AppTest is not thread-safe, so sessions in a worker take turns rerunning
+    install_llm_stub(args.llm_latency)
+    timings, errors = {}, []
+    baseline_rss = rss_bytes()
+
+    active = [session_steps(number, args, timings, errors) for number in session_numbers]
+    while active:
+        for steps in list(active):
+            try:
+                next(steps)
+            except StopIteration:
+                active.remove(steps)
+            except Exception as e:
+                errors.append(f"session failed: {e!r}")
+                active.remove(steps)
+
+    # Measured while every session's generator and AppTest have been alive at once
+    return {"timings": timings, "errors": errors, "rss_delta": max(0, rss_bytes() - baseline_rss)}
+
+
+def run_load_test(args):
+    """Split sessions across worker processes and merge their measurements"""
+    workers = max(1, min(args.concurrency, args.sessions))
+    shards = [list(range(args.sessions))[i::workers] for i in range(workers)]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_worker, [args] * workers, shards))
+    wall_time = time.perf_counter() - started
+
+    timings, errors = {}, []
+    for result in results:
+        errors.extend(result["errors"])
+        for action, samples in result["timings"].items():
+            timings.setdefault(action, []).extend(samples)
+    reruns = sum(len(samples) for samples in timings.values())
+    return {
+        "sessions": args.sessions,
+        "workers": workers,
+        "wall_time_s": wall_time,
+        "reruns": reruns,
+        "reruns_per_s": reruns / wall_time,
+        "rss_per_session_mb": sum(result["rss_delta"] for result in results) / args.sessions / 2**20,
+        "actions": {action: summarize(samples) for action, samples in sorted(timings.items())},
+        "errors": errors,
+    }
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    """Latency distribution in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def print_report(report):
+    print(f"🍽️ {report['sessions']} sessions across {report['workers']} worker process(es), "
+          f"{report['wall_time_s']:.1f}s wall time")
+    print(f"{'action':<16}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+    for action, stats in report["actions"].items():
+        print(f"{action:<16}{stats['count']:>7}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+    print(f"📈 Throughput: {report['reruns_per_s']:.1f} reruns/s ({report['reruns']} reruns)")
+    print(f"💾 RSS per session: {report['rss_per_session_mb']:.2f} MB")
+    if report["errors"]:
+        print(f"❌ {len(report['errors'])} error(s), first: {report['errors'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the meal planner with simulated sessions")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Worker processes; each interleaves its share of the sessions")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the stub LLM waits per call")
+    parser.add_argument("--tab-switches", type=int, default=3)
+    parser.add_argument("--grocery-toggles", type=int, default=5)
+    parser.add_argument("--chat-sends", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=60, help="Per-rerun timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    # main() stops early without a key; the stub never uses it
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+
+    report = run_load_test(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Static reference data for the meal planner, built once per process.
+
+Streamlit re-executes app.py on every rerun, so large literal tables defined
+there would be rebuilt on each interaction. Tables here are created when the
+module is first imported and exposed as read-only structures.
+"""
+
+from types import MappingProxyType
+
+
+def freeze(value):
+    """Recursively convert dicts and lists into read-only mappings and tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Recursively copy frozen data back into plain dicts and lists"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack1", "snack2")
+MEAL_LABELS = freeze({
+    "breakfast": "🌅 Breakfast", "lunch": "🍽️ Lunch", "dinner": "🌙 Dinner",
+    "snack1": "🍎 Snack 1", "snack2": "🥜 Snack 2"
+})
+NUTRIENTS = ("calories", "protein", "carbs", "fat", "fiber")
+NUTRIENT_LABELS = freeze({
+    "calories": "Calories", "protein": "Protein (g)", "carbs": "Carbs (g)",
+    "fat": "Fat (g)", "fiber": "Fiber (g)"
+})
+
+# Keyword lists used to sort ingredients into grocery categories, checked in order
+GROCERY_CATEGORIES = freeze({
+    "Proteins": ["chicken", "fish", "beef", "pork", "turkey", "eggs", "tofu", "tempeh", "beans", "lentils", "chickpeas", "quinoa", "nuts", "almonds", "walnuts", "peanuts"],
+    "Grains & Carbs": ["rice", "bread", "pasta", "oats", "quinoa", "barley", "wheat", "flour", "tortillas", "noodles"],
+    "Vegetables": ["broccoli", "spinach", "kale", "tomatoes", "cucumber", "bell peppers", "onions", "garlic", "carrots", "celery", "mushrooms", "zucchini", "cauliflower", "lettuce", "greens"],
+    "Fruits": ["banana", "apple", "berries", "blueberries", "strawberries", "oranges", "lemons", "avocado", "grapes", "mango", "pineapple"],
+    "Dairy & Alternatives": ["milk", "yogurt", "cheese", "butter", "cream", "oat milk", "almond milk", "soy milk", "coconut milk", "almond yogurt"],
+    "Herbs & Spices": ["herbs", "basil", "oregano", "thyme", "rosemary", "cilantro", "parsley", "ginger", "turmeric", "cumin", "paprika", "black pepper", "salt"],
+    "Pantry Items": ["olive oil", "coconut oil", "vinegar", "soy sauce", "honey", "maple syrup", "tahini", "peanut butter", "vanilla", "baking soda", "flour"]
+})
+# Order in which categories are shown on the grocery list
+GROCERY_CATEGORY_ORDER = (
+    "Proteins", "Grains & Carbs", "Vegetables", "Fruits", "Dairy & Alternatives",
+    "Pantry Items", "Herbs & Spices", "Others"
+)
+
+# Ingredients that commonly need advance preparation
+PREP_INGREDIENTS = freeze({
+    "soak_overnight": ["oats", "chia seeds", "quinoa", "beans", "lentils", "rice", "almonds", "chickpeas"],
+    "marinate": ["chicken", "fish", "beef", "pork", "turkey", "tofu", "paneer"],
+    "defrost": ["frozen", "meat", "fish", "chicken", "seafood"],
+    "chill": ["yogurt", "milk", "cream", "cheese"],
+    "prep_vegetables": ["salad", "vegetables", "greens", "herbs"]
+})
+
+# Words in an explicit prep note that mark it as advance preparation
+PREP_NOTE_KEYWORDS = ("soak", "marinate", "overnight", "freeze", "defrost", "advance", "chill", "prepare")
+SOAK_GRAINS = ("quinoa", "rice", "beans", "lentils")
+MARINADE_METHODS = ("grilled", "bbq", "tandoori", "marinated")
+PREP_VEGETABLES = ("salad mix", "herbs", "greens")
+
+# Allergy or dislike terms that also rule out the foods they cover
+EXCLUSION_FAMILIES = freeze({
+    "nut": ("almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia", "peanut", "nut butter"),
+    "tree nut": ("almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia"),
+    "dairy": ("milk", "cheese", "yogurt", "butter", "cream", "feta", "parmesan", "mozzarella", "whey", "ghee"),
+    "lactose": ("milk", "cheese", "yogurt", "cream", "whey"),
+    "gluten": ("wheat", "bread", "pasta", "flour", "barley", "rye", "pita", "tortilla", "couscous", "wrap", "noodle", "seitan"),
+    "wheat": ("bread", "pasta", "flour", "pita", "tortilla", "couscous", "wrap", "noodle", "seitan"),
+    "egg": ("omelet", "omelette", "mayonnaise", "frittata"),
+    "soy": ("tofu", "tempeh", "edamame", "soy sauce", "miso", "tamari"),
+    "fish": ("salmon", "cod", "tuna", "tilapia", "trout", "sardine", "mackerel", "anchovy", "halibut"),
+    "shellfish": ("shrimp", "prawn", "crab", "lobster", "scallop", "mussel", "clam", "oyster"),
+    "seafood": ("fish", "salmon", "cod", "tuna", "tilapia", "trout", "shrimp", "prawn", "crab", "lobster", "scallop"),
+    "meat": ("chicken", "beef", "pork", "turkey", "lamb", "bacon", "ham"),
+    "red meat": ("beef", "pork", "lamb"),
+    "spicy": ("chili", "chilli", "jalapeno", "sriracha", "cayenne", "hot sauce", "curry"),
+})
+
+# Diverse default meals served when the AI response cannot be used
+FALLBACK_DAILY_MEALS = freeze({
+    "Monday": {
+        "breakfast": {
+            "meal": "Overnight oats with fruits and nuts",
+            "ingredients": ["rolled oats", "banana", "almonds", "blueberries", "milk", "honey"],
+            "prep_notes": "Mix oats with milk and honey the night before, refrigerate overnight",
+            "calories": 350, "protein": 12, "carbs": 45, "fat": 10, "fiber": 8
+        },
+        "lunch": {
+            "meal": "Grilled chicken Caesar salad",
+            "ingredients": ["chicken breast", "romaine lettuce", "parmesan cheese", "croutons", "caesar dressing"],
+            "prep_notes": "Marinate chicken with herbs overnight, prepare salad components",
+            "calories": 450, "protein": 30, "carbs": 25, "fat": 15, "fiber": 6
+        },
+        "dinner": {
+            "meal": "Baked salmon with quinoa and roasted vegetables",
+            "ingredients": ["salmon fillet", "quinoa", "broccoli", "bell peppers", "olive oil", "lemon"],
+            "prep_notes": "Rinse quinoa thoroughly, marinate salmon for 30 minutes",
+            "calories": 520, "protein": 35, "carbs": 42, "fat": 18, "fiber": 7
+        },
+        "snack1": {"meal": "Greek yogurt with berries", "ingredients": ["Greek yogurt", "mixed berries", "honey"], "prep_notes": "Use chilled yogurt", "calories": 150, "protein": 10, "carbs": 15, "fat": 5, "fiber": 3},
+        "snack2": {"meal": "Apple with almond butter", "ingredients": ["apple", "almond butter"], "prep_notes": "Slice apple fresh", "calories": 120, "protein": 4, "carbs": 12, "fat": 8, "fiber": 4}
+    },
+    "Tuesday": {
+        "breakfast": {
+            "meal": "Scrambled eggs with whole grain toast",
+            "ingredients": ["eggs", "whole grain bread", "spinach", "tomatoes", "olive oil"],
+            "prep_notes": "Use fresh eggs at room temperature for fluffier scramble",
+            "calories": 340, "protein": 18, "carbs": 30, "fat": 14, "fiber": 5
+        },
+        "lunch": {
+            "meal": "Mediterranean bowl with hummus",
+            "ingredients": ["chickpeas", "cucumber", "tomatoes", "feta cheese", "olive oil", "pita bread"],
+            "prep_notes": "Soak chickpeas overnight if using dried ones",
+            "calories": 480, "protein": 18, "carbs": 55, "fat": 20, "fiber": 12
+        },
+        "dinner": {
+            "meal": "Stir-fried tofu with brown rice",
+            "ingredients": ["firm tofu", "brown rice", "broccoli", "carrots", "soy sauce", "ginger"],
+            "prep_notes": "Press tofu overnight to remove moisture, cook brown rice in advance",
+            "calories": 490, "protein": 20, "carbs": 60, "fat": 15, "fiber": 8
+        },
+        "snack1": {"meal": "Smoothie bowl", "ingredients": ["banana", "spinach", "protein powder", "granola"], "prep_notes": "Freeze banana overnight", "calories": 180, "protein": 12, "carbs": 25, "fat": 4, "fiber": 6},
+        "snack2": {"meal": "Hummus with vegetables", "ingredients": ["hummus", "carrots", "celery", "bell peppers"], "prep_notes": "Pre-cut vegetables", "calories": 110, "protein": 5, "carbs": 10, "fat": 6, "fiber": 4}
+    },
+    "Wednesday": {
+        "breakfast": {
+            "meal": "Chia pudding with tropical fruits",
+            "ingredients": ["chia seeds", "coconut milk", "mango", "pineapple", "honey"],
+            "prep_notes": "Prepare chia pudding the night before, let it set in refrigerator",
+            "calories": 320, "protein": 8, "carbs": 35, "fat": 16, "fiber": 12
+        },
+        "lunch": {
+            "meal": "Turkey and avocado wrap",
+            "ingredients": ["turkey slices", "avocado", "tortilla", "lettuce", "tomatoes", "mustard"],
+            "prep_notes": "Use fresh ingredients, prepare vegetables in advance",
+            "calories": 420, "protein": 25, "carbs": 35, "fat": 18, "fiber": 8
+        },
+        "dinner": {
+            "meal": "Lean beef stir-fry with vegetables",
+            "ingredients": ["lean beef", "mixed vegetables", "jasmine rice", "garlic", "soy sauce"],
+            "prep_notes": "Marinate beef for 2 hours, prep vegetables night before",
+            "calories": 510, "protein": 32, "carbs": 45, "fat": 16, "fiber": 6
+        },
+        "snack1": {"meal": "Protein energy balls", "ingredients": ["dates", "almonds", "protein powder", "coconut"], "prep_notes": "Make energy balls in advance and refrigerate", "calories": 140, "protein": 8, "carbs": 12, "fat": 7, "fiber": 3},
+        "snack2": {"meal": "Cottage cheese with fruit", "ingredients": ["cottage cheese", "peaches", "cinnamon"], "prep_notes": "Use chilled cottage cheese", "calories": 130, "protein": 12, "carbs": 15, "fat": 2, "fiber": 2}
+    },
+    "Thursday": {
+        "breakfast": {
+            "meal": "Avocado toast with poached egg",
+            "ingredients": ["whole grain bread", "avocado", "eggs", "tomatoes", "lime", "pepper"],
+            "prep_notes": "Use ripe avocado, prepare fresh",
+            "calories": 380, "protein": 16, "carbs": 30, "fat": 22, "fiber": 10
+        },
+        "lunch": {
+            "meal": "Lentil soup with crusty bread",
+            "ingredients": ["red lentils", "vegetables", "vegetable broth", "bread", "herbs"],
+            "prep_notes": "Soak lentils for 2 hours, chop vegetables night before",
+            "calories": 440, "protein": 20, "carbs": 65, "fat": 8, "fiber": 15
+        },
+        "dinner": {
+            "meal": "Grilled chicken with sweet potato",
+            "ingredients": ["chicken thighs", "sweet potato", "asparagus", "herbs", "olive oil"],
+            "prep_notes": "Marinate chicken overnight, pre-cut sweet potato",
+            "calories": 500, "protein": 35, "carbs": 40, "fat": 18, "fiber": 8
+        },
+        "snack1": {"meal": "Trail mix", "ingredients": ["nuts", "dried fruits", "dark chocolate"], "prep_notes": "Store in airtight container", "calories": 160, "protein": 5, "carbs": 15, "fat": 10, "fiber": 3},
+        "snack2": {"meal": "Vegetable smoothie", "ingredients": ["cucumber", "celery", "apple", "lime"], "prep_notes": "Use fresh vegetables", "calories": 100, "protein": 2, "carbs": 20, "fat": 1, "fiber": 5}
+    },
+    "Friday": {
+        "breakfast": {
+            "meal": "Protein pancakes with berries",
+            "ingredients": ["protein powder", "banana", "eggs", "oats", "berries"],
+            "prep_notes": "Prepare batter the night before, cook fresh",
+            "calories": 360, "protein": 25, "carbs": 35, "fat": 12, "fiber": 6
+        },
+        "lunch": {
+            "meal": "Asian-style poke bowl",
+            "ingredients": ["tuna", "sushi rice", "edamame", "cucumber", "sesame oil"],
+            "prep_notes": "Use sushi-grade fish, prepare rice in advance",
+            "calories": 460, "protein": 28, "carbs": 50, "fat": 14, "fiber": 5
+        },
+        "dinner": {
+            "meal": "Vegetable curry with basmati rice",
+            "ingredients": ["mixed vegetables", "coconut milk", "curry spices", "basmati rice"],
+            "prep_notes": "Soak basmati rice for 30 minutes, prep vegetables",
+            "calories": 470, "protein": 12, "carbs": 70, "fat": 16, "fiber": 10
+        },
+        "snack1": {"meal": "Banana with peanut butter", "ingredients": ["banana", "peanut butter"], "prep_notes": "Use natural peanut butter", "calories": 170, "protein": 6, "carbs": 20, "fat": 8, "fiber": 3},
+        "snack2": {"meal": "Herbal tea with honey almonds", "ingredients": ["almonds", "honey", "herbal tea"], "prep_notes": "Lightly toast almonds", "calories": 110, "protein": 4, "carbs": 8, "fat": 8, "fiber": 2}
+    },
+    "Saturday": {
+        "breakfast": {
+            "meal": "Weekend brunch omelet",
+            "ingredients": ["eggs", "cheese", "mushrooms", "spinach", "herbs"],
+            "prep_notes": "Use fresh herbs, room temperature eggs",
+            "calories": 390, "protein": 22, "carbs": 8, "fat": 28, "fiber": 3
+        },
+        "lunch": {
+            "meal": "Quinoa stuffed bell peppers",
+            "ingredients": ["bell peppers", "quinoa", "black beans", "corn", "cheese"],
+            "prep_notes": "Pre-cook quinoa, hollow out peppers night before",
+            "calories": 420, "protein": 18, "carbs": 55, "fat": 12, "fiber": 12
+        },
+        "dinner": {
+            "meal": "Pan-seared cod with roasted vegetables",
+            "ingredients": ["cod fillet", "zucchini", "bell peppers", "onions", "herbs"],
+            "prep_notes": "Bring fish to room temperature, prep vegetables",
+            "calories": 480, "protein": 30, "carbs": 25, "fat": 15, "fiber": 8
+        },
+        "snack1": {"meal": "Fruit salad with yogurt", "ingredients": ["mixed fruits", "yogurt", "mint"], "prep_notes": "Cut fruits fresh, chill", "calories": 140, "protein": 6, "carbs": 25, "fat": 3, "fiber": 4},
+        "snack2": {"meal": "Dark chocolate with nuts", "ingredients": ["dark chocolate", "walnuts"], "prep_notes": "Use 70% cacao chocolate", "calories": 130, "protein": 3, "carbs": 10, "fat": 9, "fiber": 2}
+    },
+    "Sunday": {
+        "breakfast": {
+            "meal": "Smoothie bowl with granola",
+            "ingredients": ["frozen fruits", "yogurt", "granola", "chia seeds", "honey"],
+            "prep_notes": "Freeze fruits overnight, use thick yogurt",
+            "calories": 370, "protein": 15, "carbs": 50, "fat": 12, "fiber": 8
+        },
+        "lunch": {
+            "meal": "Grilled vegetable and hummus sandwich",
+            "ingredients": ["whole grain bread", "zucchini", "eggplant", "hummus", "arugula"],
+            "prep_notes": "Grill vegetables in advance, store in refrigerator",
+            "calories": 400, "protein": 16, "carbs": 55, "fat": 14, "fiber": 10
+        },
+        "dinner": {
+            "meal": "Herb-crusted chicken with mashed cauliflower",
+            "ingredients": ["chicken breast", "cauliflower", "herbs", "garlic", "olive oil"],
+            "prep_notes": "Marinate chicken with herbs overnight, prep cauliflower",
+            "calories": 450, "protein": 35, "carbs": 20, "fat": 16, "fiber": 6
+        },
+        "snack1": {"meal": "Overnight oats parfait", "ingredients": ["oats", "yogurt", "berries", "nuts"], "prep_notes": "Layer ingredients night before", "calories": 180, "protein": 8, "carbs": 25, "fat": 6, "fiber": 5},
+        "snack2": {"meal": "Herbal tea with dates", "ingredients": ["herbal tea", "dates", "almonds"], "prep_notes": "Stuff dates with almonds", "calories": 120, "protein": 3, "carbs": 18, "fat": 4, "fiber": 3}
+    }
+})
+
+DIET_TYPES = (
+    "Vegetarian", "Non-Vegetarian", "Vegan", "Pescatarian",
+    "Keto", "Paleo", "Mediterranean", "Other"
+)
+DEFAULT_DIET_TYPE = "Non-Vegetarian"
+# Exclusion terms (expanded through EXCLUSION_FAMILIES) that a diet type rules out; kept
+# narrow on purpose, so plant milks, creams and nut butters are not mistaken for dairy
+DIET_EXCLUSIONS = freeze({
+    "Vegetarian": ("meat", "fish", "shellfish"),
+    "Vegan": ("meat", "fish", "shellfish", "egg", "cheese", "yogurt", "ghee", "whey", "honey", "feta", "parmesan", "mozzarella"),
+    "Pescatarian": ("meat",),
+})
+# Words that make a diet exclusion a plant-based stand-in: almond yogurt, cashew cheese, flax egg
+PLANT_QUALIFIERS = ("almond", "soy", "oat", "coconut", "cashew", "vegan", "flax")
+
+# Fish meals that stand in for the template's meat lunches and dinners
+PESCATARIAN_SWAPS = freeze({
+    "lunch": {
+        "meal": "Tuna and white bean salad",
+        "ingredients": ["canned tuna", "white beans", "mixed greens", "cherry tomatoes", "olive oil", "lemon"],
+        "prep_notes": "Rinse beans and whisk the lemon dressing the night before",
+        "calories": 420, "protein": 32, "carbs": 30, "fat": 16, "fiber": 9
+    },
+    "dinner": {
+        "meal": "Garlic shrimp with brown rice and greens",
+        "ingredients": ["shrimp", "brown rice", "spinach", "garlic", "olive oil", "lemon"],
+        "prep_notes": "Defrost shrimp in the fridge overnight",
+        "calories": 470, "protein": 34, "carbs": 48, "fat": 14, "fiber": 5
+    },
+})
+
+
+def _build_fallback_template(diet_type):
+    """Fallback week for one diet type, as plain mutable dicts"""
+    plan = {day: thaw(FALLBACK_DAILY_MEALS[day]) for day in DAYS}
+    if diet_type in ['Vegetarian', 'Vegan']:
+        for day in DAYS:
+            plan[day]["lunch"]["meal"] = "Vegetarian protein bowl with legumes"
+            plan[day]["lunch"]["ingredients"] = ["quinoa", "black beans", "chickpeas", "mixed vegetables", "tahini", "lemon"]
+            plan[day]["dinner"]["meal"] = "Tofu stir-fry with brown rice and vegetables"
+            plan[day]["dinner"]["ingredients"] = ["firm tofu", "brown rice", "broccoli", "bell peppers", "soy sauce", "ginger", "garlic"]
+            if diet_type == 'Vegan':
+                plan[day]["snack1"]["meal"] = "Almond yogurt with berries"
+                plan[day]["snack1"]["ingredients"] = ["almond yogurt", "mixed berries", "maple syrup"]
+                plan[day]["breakfast"]["meal"] = "Overnight oats with fruits and nuts"
+                plan[day]["breakfast"]["ingredients"] = ["rolled oats", "banana", "almonds", "blueberries", "oat milk", "maple syrup"]
+                plan[day]["breakfast"]["prep_notes"] = "Mix oats with oat milk and maple syrup the night before, refrigerate overnight"
+                plan[day]["snack2"] = thaw(FALLBACK_DAILY_MEALS["Tuesday"]["snack2"])
+    elif diet_type == 'Pescatarian':
+        for day in DAYS:
+            for meal_type, swap in PESCATARIAN_SWAPS.items():
+                if any(meat in plan[day][meal_type]["meal"].lower() for meat in EXCLUSION_FAMILIES["meat"]):
+                    plan[day][meal_type] = thaw(swap)
+    return plan
+
+
+# Read-only fallback week for every diet type offered in the profile form
+FALLBACK_TEMPLATES = freeze({diet_type: _build_fallback_template(diet_type) for diet_type in DIET_TYPES})
+
+
+def fallback_template(diet_type):
+    """Frozen fallback week for a diet type, defaulting to the non-vegetarian plan"""
+    return FALLBACK_TEMPLATES.get(diet_type, FALLBACK_TEMPLATES[DEFAULT_DIET_TYPE])
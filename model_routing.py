@@ -0,0 +1,94 @@
+"""
+Per-task model routing for the meal planner's OpenAI calls.
+
+Each task (full plan, single-meal swap, chat, JSON repair) gets its own model,
+temperature, token cap and latency budget. Defaults live here; any of them
+can be overridden from a JSON file named by MEAL_PLANNER_MODEL_ROUTES, which
+is re-read whenever it changes, so routes can be tuned without code edits or
+restarts. A route may name a faster fallback model that is tried once when
+the primary model runs over its latency budget.
+"""
+
+import copy
+import json
+import os
+import threading
+
+from llm_runtime import create_completion, latency_budget, stream_completion
+
+DEFAULT_ROUTES = {
+    "meal_plan": {"model": "gpt-3.5-turbo", "temperature": 0.3, "max_tokens": 3000},
+    "meal_swap": {"model": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 300},
+    "chat": {"model": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 1000},
+    "json_repair": {"model": "gpt-3.5-turbo", "temperature": 0.0, "max_tokens": 3000},
+}
+# Route fields and the types a config file may set them to
+ROUTE_FIELDS = {
+    "model": str,
+    "temperature": (int, float),
+    "max_tokens": int,
+    "timeout": (int, float),
+    "fallback_model": str,
+    "fallback_timeout": (int, float),
+}
+
+_routes_lock = threading.Lock()
+_routes_cache = {}
+
+
+def _read_routes(path):
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    if not isinstance(overrides, dict):
+        raise ValueError(f"Invalid model routes in {path}: expected an object keyed by task")
+
+    routes = copy.deepcopy(DEFAULT_ROUTES)
+    for task, fields in overrides.items():
+        if task not in routes or not isinstance(fields, dict):
+            raise ValueError(f"Invalid model routes in {path}: unknown task or malformed route {task!r}")
+        for field, value in fields.items():
+            if field not in ROUTE_FIELDS or not isinstance(value, ROUTE_FIELDS[field]) or isinstance(value, bool):
+                raise ValueError(f"Invalid model routes in {path}: bad field {task}.{field}")
+        routes[task].update(fields)
+    return routes
+
+
+def load_routes():
+    """Current routes: the defaults merged with the MEAL_PLANNER_MODEL_ROUTES file, if any"""
+    path = os.getenv("MEAL_PLANNER_MODEL_ROUTES")
+    if not path:
+        return DEFAULT_ROUTES
+    mtime = os.path.getmtime(path)
+    with _routes_lock:
+        cached = _routes_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _routes_cache[path] = (mtime, _read_routes(path))
+        return cached[1]
+
+
+def route_for(task):
+    """Model settings for one task"""
+    return load_routes()[task]
+
+
+def _complete(endpoint, budget, stream_to, **request):
+    if stream_to is None:
+        return create_completion(endpoint, budget=budget, **request)
+    return stream_completion(endpoint, stream_to.feed, budget=budget, **request)
+
+
+def routed_completion(task, messages, stream_to=None):
+    """Chat completion using the task's route (streamed into stream_to.feed if given), retrying once on its fallback model after a timeout"""
+    route = route_for(task)
+    request = {"messages": messages, "temperature": route["temperature"], "max_tokens": route["max_tokens"]}
+    try:
+        return _complete(task, route.get("timeout"), stream_to, model=route["model"], **request)
+    except TimeoutError:
+        if not route.get("fallback_model"):
+            raise
+    # Counted under its own endpoint so fallbacks show up separately in call stats
+    budget = route.get("fallback_timeout") or latency_budget(task)
+    if stream_to is not None:
+        # The fallback response starts over, so drop what the consumer saw of the first one
+        stream_to.reset()
+    return _complete(f"{task}.fallback", budget, stream_to, model=route["fallback_model"], **request)
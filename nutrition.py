@@ -0,0 +1,151 @@
+"""
+Local nutrition estimates from the bundled nutrient table.
+
+data/nutrients.csv lists USDA-style values per 100 g for common ingredients,
+with a typical per-meal portion, the weight of one cup and, for countable
+items, the weight of one piece. Rows are keyed by canonical ingredient key (see ingredients.py) and kept
+column-wise in arrays, so a meal's macros come from a few index lookups per
+ingredient instead of numbers guessed by the model.
+"""
+
+import csv
+import os
+import re
+import threading
+from array import array
+
+from ingredients import canonical_key, normalize
+from meal_data import DAYS, MEAL_TYPES, NUTRIENTS
+
+NUTRIENT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nutrients.csv")
+
+# Grams per unit for weights and for units whose weight hardly depends on the food
+UNIT_GRAMS = {
+    "g": 1, "gram": 1, "grams": 1, "kg": 1000, "oz": 28.35, "ounce": 28.35, "ounces": 28.35,
+    "lb": 453.6, "lbs": 453.6, "pound": 453.6, "pounds": 453.6,
+    "pinch": 0.5, "handful": 30, "slice": 30, "slices": 30, "clove": 5, "cloves": 5,
+}
+# Cups per volume unit; a cup of spinach weighs 30 g and one of honey 339 g, so the
+# table's grams per cup (or, where it has none, its typical portion) sets the weight
+UNIT_CUPS = {
+    "cup": 1, "cups": 1, "tbsp": 1 / 16, "tablespoon": 1 / 16, "tablespoons": 1 / 16,
+    "tsp": 1 / 48, "teaspoon": 1 / 48, "teaspoons": 1 / 48, "ml": 1 / 240, "l": 1000 / 240,
+}
+_FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3}
+_QUANTITY_RE = re.compile(r"^\s*(\d+(?:\.\d+)?(?:\s*/\s*\d+)?|[½¼¾⅓⅔])\s*([a-z]+\b)?", re.IGNORECASE)
+
+
+class NutrientTable:
+    """Nutrient columns per 100 g, indexed by table row, with a canonical key -> row index"""
+
+    def __init__(self, path=NUTRIENT_TABLE_PATH):
+        self.portion_g = array("f")
+        self.piece_g = array("f")
+        self.cup_g = array("f")
+        self.columns = {nutrient: array("f") for nutrient in NUTRIENTS}
+        self.row_of = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                key = canonical_key(record["ingredient"])
+                if key in self.row_of:
+                    continue
+                self.row_of[key] = len(self.portion_g)
+                self.portion_g.append(float(record["portion_g"]))
+                self.piece_g.append(float(record["piece_g"] or 0))
+                self.cup_g.append(float(record["cup_g"] or 0))
+                for nutrient in NUTRIENTS:
+                    self.columns[nutrient].append(float(record[nutrient]))
+
+    def __len__(self):
+        return len(self.portion_g)
+
+    def row(self, ingredient):
+        """Table row for an ingredient line, falling back to its last word ("cherry tomatoes"), or -1"""
+        candidates = [ingredient]
+        words = normalize(ingredient).split()
+        if len(words) > 1:
+            candidates.append(words[-1])
+        for candidate in candidates:
+            row = self.row_of.get(canonical_key(candidate), -1)
+            if row >= 0:
+                return row
+        return -1
+
+
+_table_lock = threading.Lock()
+_table = None
+
+
+def nutrient_table():
+    """Process-wide nutrient table, loaded on first use"""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = NutrientTable()
+    return _table
+
+
+def _parse_amount(text):
+    text = text.strip()
+    if text in _FRACTIONS:
+        return _FRACTIONS[text]
+    if "/" in text:
+        numerator, denominator = text.split("/")
+        return float(numerator) / float(denominator or 1)
+    return float(text)
+
+
+def ingredient_grams(ingredient, table, row):
+    """Grams of an ingredient line: from its quantity if it has one, else a typical portion"""
+    match = _QUANTITY_RE.match(str(ingredient))
+    if match:
+        amount = _parse_amount(match.group(1))
+        unit = (match.group(2) or "").lower()
+        if unit in UNIT_GRAMS:
+            return amount * UNIT_GRAMS[unit]
+        if unit in UNIT_CUPS:
+            return amount * UNIT_CUPS[unit] * (table.cup_g[row] or table.portion_g[row])
+        # A bare count ("2 eggs") is a number of pieces, or of portions for uncountable items
+        return amount * (table.piece_g[row] or table.portion_g[row])
+    return table.portion_g[row]
+
+
+def meal_nutrition(ingredients):
+    """Estimated nutrient totals for an ingredient list, or None if no ingredient is in the table"""
+    table = nutrient_table()
+    totals = dict.fromkeys(NUTRIENTS, 0.0)
+    known = 0
+    for ingredient in ingredients:
+        row = table.row(ingredient)
+        if row < 0:
+            continue
+        known += 1
+        scale = ingredient_grams(ingredient, table, row) / 100
+        for nutrient in NUTRIENTS:
+            totals[nutrient] += table.columns[nutrient][row] * scale
+    if not known:
+        return None
+    return {nutrient: int(round(value)) for nutrient, value in totals.items()}
+
+
+def fill_meal_nutrition(meal):
+    """Set a meal's nutrient fields from its ingredients; False if none were recognised"""
+    nutrition = meal_nutrition(meal.get("ingredients", []))
+    if nutrition is None:
+        return False
+    meal.update(nutrition)
+    return True
+
+
+def fill_plan_nutrition(meal_plan):
+    """Compute nutrient fields for every meal of a plan in place; returns how many meals were filled"""
+    filled = 0
+    for day in DAYS:
+        day_plan = meal_plan.get(day)
+        if not isinstance(day_plan, dict):
+            continue
+        for meal_type in MEAL_TYPES:
+            meal = day_plan.get(meal_type)
+            if isinstance(meal, dict) and fill_meal_nutrition(meal):
+                filled += 1
+    return filled
@@ -0,0 +1,190 @@
+"""
+Incremental validation of a meal plan while it is being streamed.
+
+A plan that breaks an allergy, the diet type or the expected shape used to be
+found only after the whole response (up to 3000 tokens) had been generated and
+parsed. PlanStreamValidator is fed the response text as it arrives, checks
+each meal as soon as its JSON object (or TSV line) is complete, and raises
+PlanViolation on the first problem, so the caller can close the stream and
+ask again while most of the generation time is still unspent.
+"""
+
+import json
+
+from meal_data import DAYS, DIET_EXCLUSIONS, MEAL_TYPES, NUTRIENTS, PLANT_QUALIFIERS
+from plan_wire import decode_meal_line
+from profile_diff import compile_exclusions, exclusion_terms, meal_text
+
+
+class PlanViolation(Exception):
+    """A streamed plan broke a rule; the message says where and how"""
+
+    def __init__(self, reason, day=None, meal_type=None):
+        self.reason = reason
+        self.day = day
+        self.meal_type = meal_type
+        # Day and slot keys as they appear in the plan format, so the model can act on the message
+        where = " ".join(part for part in (day, meal_type) if part)
+        super().__init__(f"{where}: {reason}" if where else reason)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def meal_problem(meal, matchers, require_nutrients=True):
+    """Why a single meal is unacceptable, or None; matchers are (label, compiled pattern) pairs"""
+    if not isinstance(meal, dict):
+        return "meal is not an object"
+    if not isinstance(meal.get("meal"), str) or not meal["meal"].strip():
+        return "meal has no description"
+    ingredients = meal.get("ingredients")
+    if not isinstance(ingredients, list) or not ingredients or not all(isinstance(item, str) for item in ingredients):
+        return "meal has no ingredient list"
+    if require_nutrients:
+        missing = [nutrient for nutrient in NUTRIENTS if not _is_number(meal.get(nutrient))]
+        if missing:
+            return f"missing {', '.join(missing)}"
+    text = meal_text(meal)
+    for label, matcher in matchers:
+        found = sorted({match.lower() for match in matcher.findall(text)})
+        if found:
+            return f"contains {', '.join(found)}, ruled out by {label}"
+    return None
+
+
+def profile_matchers(profile):
+    """(label, pattern) pairs for the user's allergies and diet type"""
+    matchers = []
+    allergies = compile_exclusions(exclusion_terms((profile or {}).get("allergies")))
+    if allergies is not None:
+        matchers.append(("the user's allergies", allergies))
+    diet_type = (profile or {}).get("diet_type")
+    diet = compile_exclusions(tuple(DIET_EXCLUSIONS.get(diet_type, ())), skip_after=PLANT_QUALIFIERS)
+    if diet is not None:
+        matchers.append((f"the {diet_type} diet", diet))
+    return matchers
+
+
+class PlanStreamValidator:
+    """Checks a streamed plan meal by meal; feed() raises PlanViolation on the first bad meal"""
+
+    def __init__(self, profile, wire_format="json", require_nutrients=True):
+        self.matchers = profile_matchers(profile)
+        self.wire_format = wire_format
+        self.require_nutrients = require_nutrients
+        self.reset()
+
+    def reset(self):
+        """Forget everything fed so far, for a request that starts over"""
+        self.text = ""
+        self.meals_checked = 0
+        # Meals that passed, by day and slot, so an aborted plan can keep them
+        self.meals = {}
+        self._position = 0
+        # JSON scanner state
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None
+        self._key = None
+        self._day = None
+        self._meal_type = None
+        self._meal_start = None
+        # TSV state
+        self._current_day = None
+
+    def feed(self, text):
+        """Take the next piece of the response and check every meal it completes"""
+        self.text += text
+        if self.wire_format == "tsv":
+            self._scan_lines(final=False)
+        else:
+            self._scan_json()
+
+    def finish(self):
+        """Check the end of the response: every day present with all of its meals"""
+        if self.wire_format == "tsv":
+            self._scan_lines(final=True)
+            if self._current_day is not None:
+                self._check_day_complete(self._current_day)
+        elif self._depth:
+            raise PlanViolation("response ended before the plan was complete")
+        missing = [day for day in DAYS if day not in self.meals]
+        if missing:
+            raise PlanViolation(f"plan has no meals for {', '.join(missing)}")
+
+    def _check_meal(self, day, meal_type, meal):
+        if day not in DAYS:
+            raise PlanViolation(f"unexpected day {day!r}")
+        if meal_type not in MEAL_TYPES:
+            raise PlanViolation(f"unexpected meal slot {meal_type!r}", day)
+        problem = meal_problem(meal, self.matchers, self.require_nutrients)
+        if problem:
+            raise PlanViolation(problem, day, meal_type)
+        self.meals.setdefault(day, {})[meal_type] = meal
+        self.meals_checked += 1
+
+    def _check_day_complete(self, day):
+        missing = [meal_type for meal_type in MEAL_TYPES if meal_type not in self.meals.get(day, ())]
+        if missing:
+            raise PlanViolation(f"missing {', '.join(missing)}", day)
+
+    def _scan_json(self):
+        # Only the new characters are scanned; day and slot objects are tracked by brace depth
+        text = self.text
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:index]
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char == ":":
+                self._key = self._last_string
+            elif char == "{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._day = self._key
+                elif self._depth == 3:
+                    self._meal_type = self._key
+                    self._meal_start = index
+            elif char == "}" and self._depth:
+                if self._depth == 3:
+                    try:
+                        meal = json.loads(text[self._meal_start:index + 1])
+                    except json.JSONDecodeError as e:
+                        self._position = index + 1
+                        raise PlanViolation(f"malformed JSON ({e.msg})", self._day, self._meal_type)
+                    self._position = index + 1
+                    self._check_meal(self._day, self._meal_type, meal)
+                elif self._depth == 2:
+                    self._position = index + 1
+                    self._check_day_complete(self._day)
+                self._depth -= 1
+        self._position = len(text)
+
+    def _scan_lines(self, final):
+        end = len(self.text) if final else self.text.rfind("\n") + 1
+        if end <= self._position:
+            return
+        lines = self.text[self._position:end].splitlines()
+        self._position = end
+        for line in lines:
+            decoded = decode_meal_line(line.strip())
+            if decoded is None:
+                continue
+            day, meal_type, meal = decoded
+            if day != self._current_day:
+                if self._current_day is not None:
+                    self._check_day_complete(self._current_day)
+                self._current_day = day
+            self._check_meal(day, meal_type, meal)
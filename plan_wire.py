@@ -0,0 +1,127 @@
+"""
+Compact line-oriented wire format for generated meal plans.
+
+The JSON plan format repeats every key ("breakfast", "ingredients",
+"prep_notes", "calories", ...) for each of the 35 meals, and those keys are
+output tokens the model has to generate. With MEAL_PLANNER_PLAN_FORMAT=tsv the
+model instead writes one tab-separated line per meal:
+
+    Mon<TAB>B<TAB>meal<TAB>ingredient; ingredient<TAB>prep notes<TAB>calories<TAB>protein<TAB>carbs<TAB>fat<TAB>fiber
+
+and decode_plan_tsv expands the lines into the usual nested plan dict. The
+nutrient columns are omitted when nutrition is computed locally.
+"""
+
+import os
+import re
+
+from meal_data import DAYS, MEAL_TYPES, NUTRIENTS
+
+PLAN_FORMATS = ("json", "tsv")
+DAY_CODES = {day: day[:3] for day in DAYS}
+SLOT_CODES = {"breakfast": "B", "lunch": "L", "dinner": "D", "snack1": "S1", "snack2": "S2"}
+INGREDIENT_SEPARATOR = "; "
+
+# Accept codes, full names and case variations for the first two columns
+_DAY_LOOKUP = {**{code.lower(): day for day, code in DAY_CODES.items()}, **{day.lower(): day for day in DAYS}}
+_SLOT_LOOKUP = {
+    **{code.lower(): slot for slot, code in SLOT_CODES.items()},
+    **{slot: slot for slot in MEAL_TYPES},
+    "snack 1": "snack1", "snack 2": "snack2",
+}
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def plan_format():
+    """Wire format requested for generated plans: "json" (default) or "tsv" """
+    value = os.getenv("MEAL_PLANNER_PLAN_FORMAT", "json").strip().lower()
+    return value if value in PLAN_FORMATS else "json"
+
+
+def _clean_field(value):
+    return " ".join(str(value).replace("\t", " ").split())
+
+
+def encode_plan_tsv(meal_plan, include_nutrients=True):
+    """Plan dict as wire-format lines; the inverse of decode_plan_tsv"""
+    lines = []
+    for day in DAYS:
+        day_plan = meal_plan.get(day)
+        if not isinstance(day_plan, dict):
+            continue
+        for meal_type in MEAL_TYPES:
+            meal = day_plan.get(meal_type)
+            if not isinstance(meal, dict):
+                continue
+            fields = [
+                DAY_CODES[day],
+                SLOT_CODES[meal_type],
+                _clean_field(meal.get("meal", "")),
+                INGREDIENT_SEPARATOR.join(_clean_field(item).replace(";", ",") for item in meal.get("ingredients", [])),
+                _clean_field(meal.get("prep_notes", "")),
+            ]
+            if include_nutrients:
+                fields.extend(str(meal.get(nutrient, 0)) for nutrient in NUTRIENTS)
+            lines.append("\t".join(fields))
+    return "\n".join(lines)
+
+
+def _split_line(line):
+    fields = line.split("\t")
+    # Some models turn tabs into pipes or runs of spaces
+    if len(fields) < 3 and "|" in line:
+        fields = line.strip().strip("|").split("|")
+    if len(fields) < 3:
+        fields = re.split(r" {2,}", line)
+    return [field.strip() for field in fields]
+
+
+def _number(value):
+    match = _NUMBER_RE.search(value)
+    return int(round(float(match.group()))) if match else 0
+
+
+def decode_meal_line(line):
+    """(day, meal type, meal dict) for one wire-format line, or None if it is not a meal line"""
+    fields = _split_line(line)
+    if len(fields) < 3:
+        return None
+    day = _DAY_LOOKUP.get(fields[0].lower())
+    meal_type = _SLOT_LOOKUP.get(fields[1].lower())
+    if day is None or meal_type is None or not fields[2]:
+        return None
+
+    meal = {
+        "meal": fields[2],
+        "ingredients": [item.strip() for item in fields[3].split(";") if item.strip()] if len(fields) > 3 else [],
+        "prep_notes": fields[4] if len(fields) > 4 else "",
+    }
+    for nutrient, value in zip(NUTRIENTS, fields[5:]):
+        meal[nutrient] = _number(value)
+    return day, meal_type, meal
+
+
+def decode_plan_tsv(text):
+    """Expand wire-format lines into a plan dict; raises ValueError unless every day has every meal"""
+    meal_plan = {}
+    for line in str(text).splitlines():
+        line = line.strip()
+        if not line or line.startswith("```"):
+            continue
+        decoded = decode_meal_line(line)
+        if decoded is None:
+            continue
+        day, meal_type, meal = decoded
+        meal_plan.setdefault(day, {})[meal_type] = meal
+    if not meal_plan:
+        raise ValueError("No meal lines found in the compact plan response")
+    # A truncated response would otherwise pass as a shorter plan
+    missing = [
+        f"{day} {meal_type}" for day in DAYS for meal_type in MEAL_TYPES
+        if meal_type not in meal_plan.get(day, {})
+    ]
+    if missing:
+        shown = ", ".join(missing[:5]) + (f" and {len(missing) - 5} more" if len(missing) > 5 else "")
+        raise ValueError(f"Compact plan response is missing {shown}")
+    # Same day order as the JSON format
+    return {day: meal_plan[day] for day in DAYS}
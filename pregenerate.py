@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Off-peak pre-generation of next week's meal plans.
+
+Plan requests spike when users open the app at the start of the week. Run
+from cron during quiet hours, this walks the sessions saved in the shared
+store (MEAL_PLANNER_STORE), generates each user's plan for the coming week,
+swaps out meals that repeat their recent weeks, and stores the plan with its
+grocery list and prep reminders under next_plan:<session id>. The app
+switches to it when the user opens a session on or after that Monday.
+
+Work is bounded by an off-peak window, a plans-per-minute rate and a token
+budget per week. Progress is saved after every plan, so an interrupted or
+out-of-budget run continues where it stopped the next time it is started.
+Run a single instance at a time.
+
+Usage: python pregenerate.py --window 01:00-05:00 --rate 6 --max-tokens 2000000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from llm_runtime import load_environment, token_usage_snapshot
+from shared_store import get_store, store_get, store_keys, store_set
+
+DEFAULT_WINDOW = "01:00-05:00"
+DEFAULT_RATE_PER_MINUTE = 6.0
+# Next-week plans are kept until a week after the week they are for has started
+NEXT_PLAN_TTL_SECONDS = 14 * 24 * 60 * 60
+PROGRESS_TTL_SECONDS = 21 * 24 * 60 * 60
+
+
+def next_week_start(today):
+    """Monday of the week after the one containing today"""
+    return today + timedelta(days=7 - today.weekday())
+
+
+def parse_window(window):
+    """(start, end) times from "HH:MM-HH:MM"; the window may wrap past midnight"""
+    start, _, end = window.partition("-")
+    return (datetime.strptime(start.strip(), "%H:%M").time(), datetime.strptime(end.strip(), "%H:%M").time())
+
+
+def in_window(moment, window):
+    start, end = window
+    now = moment.time()
+    return start <= now < end if start <= end else (now >= start or now < end)
+
+
+def tokens_used():
+    """Prompt plus completion tokens spent by this process so far"""
+    return sum(totals["prompt_tokens"] + totals["completion_tokens"] for totals in token_usage_snapshot().values())
+
+
+def load_progress(week_start):
+    progress = store_get(f"pregen:{week_start}") or {}
+    return {
+        "done": list(progress.get("done", [])),
+        "failed": dict(progress.get("failed", {})),
+        "plans": progress.get("plans", 0),
+        "tokens": progress.get("tokens", 0),
+    }
+
+
+def save_progress(week_start, progress):
+    progress["updated"] = datetime.now().isoformat(timespec="seconds")
+    store_set(f"pregen:{week_start}", progress, PROGRESS_TTL_SECONDS)
+
+
+def pending_sessions(done):
+    """(session id, snapshot) for saved sessions with a finished profile that still need a plan"""
+    done = set(done)
+    for key in store_keys("session:"):
+        session_id = key[len("session:"):]
+        if session_id in done:
+            continue
+        snapshot = store_get(key)
+        if snapshot and snapshot.get("profile_completed") and snapshot.get("user_profile"):
+            yield session_id, snapshot
+
+
+def build_next_plan(snapshot, week_start, plans_by_profile):
+    """Next week's plan entry for one saved session, or an error message"""
+    import app
+    from variety_index import build_index, find_repeats
+
+    profile = snapshot["user_profile"]
+    profile_key = app.meal_plan_key(profile)
+
+    # Users with equivalent profiles share one base plan, as they do interactively
+    meal_plan = plans_by_profile.get(profile_key)
+    if meal_plan is None:
+        meal_plan = app.generate_meal_plan(profile, fresh=True)
+        if not app.is_usable_plan(meal_plan) or meal_plan.get("generated_with_fallback"):
+            return None, meal_plan.get("error") or meal_plan.get("original_error") or "unusable plan"
+        plans_by_profile[profile_key] = meal_plan
+    meal_plan = app.thaw(meal_plan)
+
+    # Replace meals that repeat this user's recent weeks, including the current one
+    history = [plan for plan in snapshot.get("plan_history", []) + [snapshot.get("meal_plan")] if app.is_usable_plan(plan)]
+    repeats = find_repeats(meal_plan, build_index(history[-app.MEAL_HISTORY_WEEKS:]))
+    if repeats:
+        updates = app.regenerate_slots(profile, {
+            (repeat["day"], repeat["meal_type"]): [repeat["similar_to"]] + app.same_slot_meals(meal_plan, repeat["meal_type"])
+            for repeat in repeats
+        })
+        for (day, meal_type), meal in updates.items():
+            meal_plan[day][meal_type] = meal
+
+    return {
+        "week_start": week_start,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "profile_key": profile_key,
+        "meal_plan": meal_plan,
+        "grocery_list": app.generate_grocery_list(meal_plan),
+        "prep_reminders": app.generate_prep_reminders(meal_plan),
+    }, None
+
+
+def run(args):
+    """Generate plans until the sessions, the window or the budget run out; returns the progress record"""
+    week_start = args.week_start or next_week_start(date.today()).isoformat()
+    window = parse_window(args.window)
+    progress = load_progress(week_start)
+    interval = 60.0 / args.rate if args.rate > 0 else 0.0
+    plans_by_profile = {}
+    started_tokens = tokens_used()
+    last_started = None
+
+    print(f"🗓️ Pre-generating plans for the week of {week_start} "
+          f"({len(progress['done'])} done, {progress['tokens']} tokens spent so far)")
+
+    for session_id, snapshot in pending_sessions(progress["done"]):
+        if not args.ignore_window and not in_window(datetime.now(), window):
+            print(f"🌅 Off-peak window {args.window} is over; stopping")
+            break
+        # Stop before a plan that would likely overrun the budget, judging by the average so far
+        average = progress["tokens"] / progress["plans"] if progress["plans"] else 0
+        if args.max_tokens and progress["tokens"] + average > args.max_tokens:
+            print(f"💰 Token budget of {args.max_tokens} reached; stopping")
+            break
+        if args.max_plans and progress["plans"] >= args.max_plans:
+            print(f"💰 Plan budget of {args.max_plans} reached; stopping")
+            break
+        if args.dry_run:
+            print(f"   would generate for session {session_id}")
+            continue
+
+        if last_started is not None and interval:
+            time.sleep(max(0.0, last_started + interval - time.monotonic()))
+        last_started = time.monotonic()
+
+        before = tokens_used()
+        try:
+            entry, error = build_next_plan(snapshot, week_start, plans_by_profile)
+        except Exception as e:
+            entry, error = None, str(e)
+        progress["tokens"] += tokens_used() - before
+
+        if entry is not None and store_set(f"next_plan:{session_id}", entry, NEXT_PLAN_TTL_SECONDS):
+            progress["done"].append(session_id)
+            progress["failed"].pop(session_id, None)
+            progress["plans"] += 1
+            print(f"✅ {session_id}")
+        else:
+            # Left out of "done", so the next run tries again
+            progress["failed"][session_id] = error or "could not write to the shared store"
+            print(f"❌ {session_id}: {progress['failed'][session_id]}")
+        save_progress(week_start, progress)
+
+    print(f"📊 {progress['plans']} plans ready, {len(progress['failed'])} failed, "
+          f"{tokens_used() - started_tokens} tokens this run, {progress['tokens']} this week")
+    return progress
+
+
+def main():
+    # Before anything reads MEAL_PLANNER_* settings, so the ones kept in .env apply
+    load_environment()
+    parser = argparse.ArgumentParser(description="Generate next week's meal plans for saved sessions during off-peak hours")
+    parser.add_argument("--window", default=os.getenv("MEAL_PLANNER_PREGEN_WINDOW", DEFAULT_WINDOW),
+                        help="Local off-peak hours as HH:MM-HH:MM; the run stops when they end")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_MINUTE, help="Plans started per minute at most")
+    parser.add_argument("--max-tokens", type=int, default=0, help="Token budget for the week across runs (0: unlimited)")
+    parser.add_argument("--max-plans", type=int, default=0, help="Plan budget for the week across runs (0: unlimited)")
+    parser.add_argument("--week-start", help="Monday of the week to plan, YYYY-MM-DD (default: next Monday)")
+    parser.add_argument("--ignore-window", action="store_true", help="Run now regardless of the off-peak window")
+    parser.add_argument("--dry-run", action="store_true", help="List the sessions that would get a plan")
+    args = parser.parse_args()
+
+    if get_store() is None:
+        sys.exit("❌ MEAL_PLANNER_STORE is not set; saved sessions and plans live in the shared store")
+    if not args.ignore_window and not in_window(datetime.now(), parse_window(args.window)):
+        print(f"🌙 Outside the off-peak window {args.window}; nothing to do")
+        return
+
+    progress = run(args)
+    sys.exit(1 if progress["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
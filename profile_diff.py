@@ -0,0 +1,94 @@
+"""
+Profile diffs and allergy/dislike matching for partial replanning.
+
+When a profile edit only adds or removes allergies and dislikes, the plan does
+not need to be regenerated: every term, with the foods it covers, is compiled
+into one regular expression, and a single pass over the plan finds the meals
+that are now ruled out. Only those meals are replaced.
+"""
+
+import re
+from functools import lru_cache
+
+from meal_data import DAYS, EXCLUSION_FAMILIES, MEAL_TYPES
+
+# Profile fields whose changes can be handled by replacing only the meals they rule out
+EXCLUSION_FIELDS = frozenset({"allergies", "dislikes"})
+
+_TERM_SPLIT_RE = re.compile(r"[,;/\n]+|\band\b|\bor\b")
+_FILLER_WORDS = frozenset({"food", "foods", "dish", "dishes", "no", "any", "all", "products", "allergy"})
+
+
+def _singular(word):
+    if len(word) > 3 and word.endswith("es") and word[:-2].endswith(("sh", "ch", "x", "o")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def exclusion_terms(text):
+    """Normalized terms from a comma-separated allergies or dislikes field"""
+    terms = set()
+    for part in _TERM_SPLIT_RE.split(str(text or "").lower()):
+        words = [_singular(word) for word in re.findall(r"[a-z]+", part) if word not in _FILLER_WORDS]
+        if words:
+            terms.add(" ".join(words))
+    return tuple(sorted(terms))
+
+
+def _normalized(profile, field):
+    value = (profile or {}).get(field)
+    if field in EXCLUSION_FIELDS:
+        return exclusion_terms(value)
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    if isinstance(value, (list, tuple)):
+        return tuple(sorted(str(item).strip().lower() for item in value))
+    return value
+
+
+def changed_fields(old_profile, new_profile):
+    """Names of the profile fields whose meaning differs between two profiles"""
+    fields = set(old_profile or {}) | set(new_profile or {})
+    return {field for field in fields if _normalized(old_profile, field) != _normalized(new_profile, field)}
+
+
+@lru_cache(maxsize=256)
+def compile_exclusions(terms, skip_after=()):
+    """One case-insensitive pattern for a tuple of terms and the foods they cover, or None;
+    a match right after one of the skip_after words does not count"""
+    words = set()
+    for term in terms:
+        words.add(term)
+        words.update(EXCLUSION_FAMILIES.get(term, ()))
+    if not words:
+        return None
+    # Longest first so "soy sauce" is reported rather than "soy"; optional plural endings
+    alternatives = "|".join(re.escape(word).replace(r"\ ", r"\s+") for word in sorted(words, key=len, reverse=True))
+    qualifiers = "".join(rf"(?<!\b{re.escape(word)} )" for word in skip_after)
+    return re.compile(rf"{qualifiers}\b(?:{alternatives})(?:e?s)?\b", re.IGNORECASE)
+
+
+def meal_text(meal):
+    """Meal name and ingredients as one searchable string"""
+    return " | ".join([str(meal.get("meal", ""))] + [str(ingredient) for ingredient in meal.get("ingredients", [])])
+
+
+def find_excluded_meals(meal_plan, matcher):
+    """Meals in a plan that mention anything the matcher rules out"""
+    if matcher is None:
+        return []
+    excluded = []
+    for day in DAYS:
+        day_plan = meal_plan.get(day)
+        if not isinstance(day_plan, dict):
+            continue
+        for meal_type in MEAL_TYPES:
+            meal = day_plan.get(meal_type)
+            if not isinstance(meal, dict):
+                continue
+            matches = sorted({match.lower() for match in matcher.findall(meal_text(meal))})
+            if matches:
+                excluded.append({"day": day, "meal_type": meal_type, "meal": meal.get("meal", ""), "matches": matches})
+    return excluded
@@ -0,0 +1,325 @@
+"""
+Shared state for running several app replicas.
+
+Generated plans, background job status and session snapshots can be kept in a
+store that every replica sees, so a plan computed on one replica is reused by
+the others and a session survives being routed to a different replica. The
+backend is chosen with MEAL_PLANNER_STORE:
+
+    sqlite:///var/lib/meal_planner/state.db      one node, any number of processes
+    tcp://10.0.0.5:7400                          a store_server.py instance
+    tcp://10.0.0.5:7400,tcp://10.0.0.6:7400      several servers, consistent-hash sharded
+
+When it is unset there is no shared store and all state stays in the process.
+Values are JSON documents; store errors are counted and treated as misses so
+an unreachable store only costs the cache, never the request.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+
+DEFAULT_PORT = 7400
+# Points per node on the hash ring; more points spread keys more evenly
+RING_REPLICAS = 128
+SOCKET_TIMEOUT_SECONDS = 2.0
+
+
+def _json_default(value):
+    # Frozen tables from meal_data are mapping proxies
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode(value):
+    return json.dumps(value, default=_json_default, separators=(",", ":"))
+
+
+def _expiry(ttl):
+    return time.time() + ttl if ttl else None
+
+
+class MemoryBackend:
+    """Process-local backend; used by store_server.py when no database file is given"""
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, payload = item
+            if expires is not None and expires <= time.time():
+                del self._items[key]
+                return None
+        return json.loads(payload)
+
+    def set(self, key, value, ttl=None):
+        payload = encode(value)
+        with self._lock:
+            self._items[key] = (_expiry(ttl), payload)
+            self._writes += 1
+            # Sweep expired entries now and then so keys nobody reads again are freed
+            if self._writes % 1000 == 0:
+                now = time.time()
+                for stale in [k for k, (expires, _) in self._items.items() if expires is not None and expires <= now]:
+                    del self._items[stale]
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def keys(self, prefix=""):
+        now = time.time()
+        with self._lock:
+            return sorted(
+                key for key, (expires, _) in self._items.items()
+                if key.startswith(prefix) and (expires is None or expires > now)
+            )
+
+
+class SQLiteBackend:
+    """Single-file backend shared by every process on one machine"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+            # Lets the expiry sweep on every write find stale rows without scanning the table
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv(expires)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5.0)
+            # Readers do not block the writer, so replicas can share the file
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                (key, encode(value), _expiry(ttl)),
+            )
+            conn.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (now,))
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def keys(self, prefix=""):
+        rows = self._connection().execute(
+            "SELECT key FROM kv WHERE substr(key, 1, ?) = ? AND (expires IS NULL OR expires > ?) ORDER BY key",
+            (len(prefix), prefix, time.time()),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+
+class SocketBackend:
+    """Client for one store_server.py instance, speaking newline-delimited JSON"""
+
+    def __init__(self, host, port=DEFAULT_PORT):
+        self.host = host
+        self.port = int(port)
+        self._local = threading.local()
+
+    def __repr__(self):
+        return f"tcp://{self.host}:{self.port}"
+
+    def _request(self, message):
+        line = (encode(message) + "\n").encode("utf-8")
+        # One reconnect covers a server restart between calls
+        for attempt in range(2):
+            stream = getattr(self._local, "stream", None)
+            try:
+                if stream is None:
+                    conn = socket.create_connection((self.host, self.port), timeout=SOCKET_TIMEOUT_SECONDS)
+                    stream = self._local.stream = conn.makefile("rwb")
+                stream.write(line)
+                stream.flush()
+                reply = stream.readline()
+                if not reply:
+                    raise ConnectionError(f"{self!r} closed the connection")
+                break
+            except OSError:
+                self._local.stream = None
+                if stream is not None:
+                    try:
+                        stream.close()
+                    except OSError:
+                        pass
+                if attempt:
+                    raise
+        response = json.loads(reply)
+        if "error" in response:
+            raise RuntimeError(f"{self!r}: {response['error']}")
+        return response.get("value")
+
+    def get(self, key):
+        return self._request({"op": "get", "key": key})
+
+    def set(self, key, value, ttl=None):
+        self._request({"op": "set", "key": key, "value": value, "ttl": ttl})
+
+    def delete(self, key):
+        self._request({"op": "delete", "key": key})
+
+    def keys(self, prefix=""):
+        return self._request({"op": "keys", "key": prefix})
+
+
+def _ring_point(label):
+    return int.from_bytes(hashlib.md5(label.encode("utf-8")).digest()[:8], "big")
+
+
+class ShardedBackend:
+    """Spreads keys over several backends with a consistent-hash ring"""
+
+    def __init__(self, backends, replicas=RING_REPLICAS):
+        self.backends = list(backends)
+        ring = sorted(
+            (_ring_point(f"{backend!r}#{replica}"), index)
+            for index, backend in enumerate(self.backends)
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [index for _, index in ring]
+
+    def backend_for(self, key):
+        """Backend that owns a key; adding a node only moves the keys it takes over"""
+        position = bisect.bisect(self._points, _ring_point(key)) % len(self._points)
+        return self.backends[self._owners[position]]
+
+    def get(self, key):
+        return self.backend_for(key).get(key)
+
+    def set(self, key, value, ttl=None):
+        self.backend_for(key).set(key, value, ttl)
+
+    def delete(self, key):
+        self.backend_for(key).delete(key)
+
+    def keys(self, prefix=""):
+        return sorted(key for backend in self.backends for key in backend.keys(prefix))
+
+
+def _socket_backend(address):
+    host, _, port = address.partition(":")
+    return SocketBackend(host or "127.0.0.1", port or DEFAULT_PORT)
+
+
+def open_store(url):
+    """Backend for a MEAL_PLANNER_STORE value"""
+    if url.startswith("sqlite://"):
+        return SQLiteBackend(url[len("sqlite://"):])
+    if url.startswith("tcp://"):
+        addresses = [part.strip()[len("tcp://"):] for part in url.split(",") if part.strip()]
+        backends = [_socket_backend(address) for address in addresses]
+        return backends[0] if len(backends) == 1 else ShardedBackend(backends)
+    if url == "memory://":
+        return MemoryBackend()
+    raise ValueError(f"Unsupported MEAL_PLANNER_STORE: {url}")
+
+
+_store_lock = threading.Lock()
+_stores = {}
+_stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+
+def get_store():
+    """Configured shared backend, or None when MEAL_PLANNER_STORE is unset"""
+    url = os.getenv("MEAL_PLANNER_STORE")
+    if not url:
+        return None
+    with _store_lock:
+        store = _stores.get(url)
+        if store is None:
+            store = _stores[url] = open_store(url)
+    return store
+
+
+def _count(field):
+    with _store_lock:
+        _stats[field] += 1
+
+
+def store_get(key):
+    """Value for a key from the shared store; None if missing, unconfigured or unreachable"""
+    store = get_store()
+    if store is None:
+        return None
+    try:
+        value = store.get(key)
+    except Exception:
+        _count("errors")
+        return None
+    _count("misses" if value is None else "hits")
+    return value
+
+
+def store_set(key, value, ttl=None):
+    """Write a value to the shared store; returns False if it could not be written"""
+    store = get_store()
+    if store is None:
+        return False
+    try:
+        store.set(key, value, ttl)
+    except Exception:
+        _count("errors")
+        return False
+    _count("writes")
+    return True
+
+
+def store_delete(key):
+    """Remove a key from the shared store; returns False if it could not be removed"""
+    store = get_store()
+    if store is None:
+        return False
+    try:
+        store.delete(key)
+    except Exception:
+        _count("errors")
+        return False
+    return True
+
+
+def store_keys(prefix):
+    """Live keys starting with a prefix, for offline jobs; empty if unconfigured or unreachable"""
+    store = get_store()
+    if store is None:
+        return []
+    try:
+        return store.keys(prefix)
+    except Exception:
+        _count("errors")
+        return []
+
+
+def store_stats():
+    """Hit, miss, write and error counts for this process"""
+    with _store_lock:
+        return dict(_stats)
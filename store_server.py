@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Minimal shared-state server for multi-replica deployments.
+
+Serves get/set/delete (and key listing for offline jobs) over
+newline-delimited JSON on a TCP port, backed by memory or a SQLite file.
+Point replicas at it with MEAL_PLANNER_STORE=tcp://host:port; list several
+servers, comma-separated, to shard keys across them.
+
+Usage: python store_server.py --port 7400 --db /var/lib/meal_planner/shard0.db
+"""
+
+import argparse
+import json
+import socketserver
+
+from shared_store import DEFAULT_PORT, MemoryBackend, SQLiteBackend, encode
+
+
+class _StoreHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        backend = self.server.backend
+        for line in self.rfile:
+            try:
+                message = json.loads(line)
+                op, key = message["op"], message["key"]
+                if op == "get":
+                    response = {"value": backend.get(key)}
+                elif op == "set":
+                    backend.set(key, message["value"], message.get("ttl"))
+                    response = {"value": None}
+                elif op == "delete":
+                    backend.delete(key)
+                    response = {"value": None}
+                elif op == "keys":
+                    response = {"value": backend.keys(key)}
+                else:
+                    response = {"error": f"unknown op {op!r}"}
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write((encode(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class StoreServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, backend):
+        super().__init__(address, _StoreHandler)
+        self.backend = backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared state server for meal planner replicas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", help="SQLite file to keep state in (default: memory only)")
+    args = parser.parse_args()
+
+    backend = SQLiteBackend(args.db) if args.db else MemoryBackend()
+    with StoreServer((args.host, args.port), backend) as server:
+        print(f"🗄️ Store serving on {args.host}:{args.port} ({args.db or 'memory'})")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
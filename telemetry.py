@@ -0,0 +1,163 @@
+"""
+Stage-level latency telemetry for the meal planner.
+
+Spans are recorded into per-stage histograms that live for the whole process,
+exported in the Prometheus text format from a small local HTTP endpoint and
+summarised in the in-app debug panel.
+"""
+
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_runtime import llm_call_stats, token_usage_snapshot
+
+# Upper bounds in seconds; LLM calls routinely take tens of seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Recent raw samples kept per stage for exact percentiles in the debug panel
+RECENT_SAMPLES = 1024
+
+_lock = threading.Lock()
+_stages = {}
+_server = None
+
+
+def _new_stage():
+    return {
+        "bucket_counts": [0] * len(BUCKETS),
+        "count": 0,
+        "sum": 0.0,
+        "recent": deque(maxlen=RECENT_SAMPLES),
+    }
+
+
+def observe(stage, seconds):
+    """Record one duration for a stage"""
+    with _lock:
+        data = _stages.get(stage)
+        if data is None:
+            data = _stages[stage] = _new_stage()
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                data["bucket_counts"][i] += 1
+                break
+        data["count"] += 1
+        data["sum"] += seconds
+        data["recent"].append(seconds)
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block and record it under the given stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def timed(stage):
+    """Decorator form of span() for whole functions"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def stage_summary():
+    """Count and recent p50/p95/max in seconds for every recorded stage"""
+    with _lock:
+        snapshot = {stage: (data["count"], sorted(data["recent"])) for stage, data in _stages.items()}
+
+    summary = {}
+    for stage, (count, samples) in sorted(snapshot.items()):
+        summary[stage] = {
+            "count": count,
+            "p50": _percentile(samples, 0.50),
+            "p95": _percentile(samples, 0.95),
+            "max": samples[-1] if samples else 0.0,
+        }
+    return summary
+
+
+def render_prometheus():
+    """Render all stage histograms and LLM counters in Prometheus text format"""
+    with _lock:
+        snapshot = {
+            stage: (list(data["bucket_counts"]), data["count"], data["sum"])
+            for stage, data in _stages.items()
+        }
+
+    lines = [
+        "# HELP meal_planner_stage_duration_seconds Time spent in each pipeline stage",
+        "# TYPE meal_planner_stage_duration_seconds histogram",
+    ]
+    for stage, (bucket_counts, count, total) in sorted(snapshot.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'meal_planner_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'meal_planner_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'meal_planner_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+        lines.append(f'meal_planner_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+
+    lines.append("# HELP meal_planner_llm_tokens_total Tokens used by OpenAI calls")
+    lines.append("# TYPE meal_planner_llm_tokens_total counter")
+    for endpoint, totals in sorted(token_usage_snapshot().items()):
+        for kind in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            lines.append(f'meal_planner_llm_tokens_total{{endpoint="{endpoint}",kind="{kind}"}} {totals[kind]}')
+
+    lines.append("# HELP meal_planner_llm_requests_total OpenAI calls, hedged duplicates and budget timeouts")
+    lines.append("# TYPE meal_planner_llm_requests_total counter")
+    for endpoint, counts in sorted(llm_call_stats().items()):
+        for kind in ("calls", "hedges", "hedge_wins", "timeouts"):
+            lines.append(f'meal_planner_llm_requests_total{{endpoint="{endpoint}",kind="{kind}"}} {counts[kind]}')
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise flood the Streamlit console
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics from a background thread; later calls are no-ops"""
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
+
+
+def reset():
+    """Forget all recorded spans"""
+    with _lock:
+        _stages.clear()
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+
+from chat_router import answer_locally
+from meal_data import fallback_template, thaw
+
+# A Wednesday
+TODAY = datetime(2026, 10, 21, 12, 0)
+PLAN = thaw(fallback_template("Non-Vegetarian"))
+
+
+@pytest.mark.parametrize("question", [
+    "What is a good breakfast for a runner?",
+    "What time should I eat dinner?",
+    "Which snacks have nuts?",
+    "What is a high protein lunch?",
+    "How many calories should a snack have?",
+    "How much protein per week?",
+])
+def test_generic_meal_questions_go_to_the_llm(question):
+    assert answer_locally(question, PLAN, {}, today=TODAY) is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What's for dinner?", "Wednesday"),
+    ("what is for breakfast", "Wednesday"),
+    ("What's in my dinner?", "Wednesday"),
+    ("What's Friday's dinner?", "Friday"),
+    ("How much protein on Tuesday?", "Tuesday"),
+    ("Show tomorrow's meals", "Thursday"),
+    ("How many calories this week?", "this week"),
+])
+def test_plan_lookups_are_answered_locally(question, expected):
+    answer = answer_locally(question, PLAN, {}, today=TODAY)
+    assert answer is not None and expected in answer
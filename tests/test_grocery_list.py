@@ -0,0 +1,49 @@
+import pytest
+
+from app import generate_grocery_list
+from meal_data import DAYS, DIET_TYPES, FALLBACK_TEMPLATES, GROCERY_CATEGORIES, MEAL_TYPES, thaw
+from ingredients import canonical_name
+
+
+def _raw_keyword_category(ingredient):
+    """Category from matching keywords against the raw ingredient text, as the list did before canonical names"""
+    text = ingredient.lower()
+    for category, keywords in GROCERY_CATEGORIES.items():
+        if any(keyword in text for keyword in keywords):
+            return category
+    return "Others"
+
+
+def _categories(grocery_list):
+    return {name: category for category, names in grocery_list.items() for name in names}
+
+
+@pytest.mark.parametrize("diet", DIET_TYPES)
+def test_template_ingredients_keep_their_categories(diet):
+    plan = thaw(FALLBACK_TEMPLATES[diet])
+    categories = _categories(generate_grocery_list(plan))
+    for day in DAYS:
+        for meal_type in MEAL_TYPES:
+            for ingredient in plan[day][meal_type]["ingredients"]:
+                if _raw_keyword_category(ingredient) != "Others":
+                    assert categories[canonical_name(ingredient)] != "Others", ingredient
+
+
+def test_template_categories_and_names():
+    categories = _categories(generate_grocery_list(thaw(FALLBACK_TEMPLATES["Non-Vegetarian"])))
+    assert {name: categories.get(name) for name in (
+        "Almonds", "Walnuts", "Nuts", "Rolled Oats", "Carrots", "Mushrooms", "Onions", "Blueberries",
+        "Croutons", "Dates", "Almond Butter", "Peanut Butter",
+    )} == {
+        "Almonds": "Proteins", "Walnuts": "Proteins", "Nuts": "Proteins", "Rolled Oats": "Grains & Carbs",
+        "Carrots": "Vegetables", "Mushrooms": "Vegetables", "Onions": "Vegetables", "Blueberries": "Fruits",
+        "Croutons": "Others", "Dates": "Others", "Almond Butter": "Dairy & Alternatives", "Peanut Butter": "Pantry Items",
+    }
+    assert "Oat" not in categories and "Oats" not in categories
+    vegan = _categories(generate_grocery_list(thaw(FALLBACK_TEMPLATES["Vegan"])))
+    assert vegan["Oat Milk"] == vegan["Almond Yogurt"] == "Dairy & Alternatives"
+
+
+def test_names_outside_the_dictionary_stay_readable():
+    grocery_list = generate_grocery_list({"Monday": {"dinner": {"ingredients": ["2 chilies", "1 cup mixed greens", "oats"]}}})
+    assert _categories(grocery_list) == {"Chilies": "Others", "Mixed Greens": "Vegetables", "Rolled Oats": "Grains & Carbs"}
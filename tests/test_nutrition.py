@@ -0,0 +1,15 @@
+import pytest
+
+from nutrition import meal_nutrition
+
+
+@pytest.mark.parametrize("ingredient, calories", [
+    # A cup weighs what that food weighs per cup, not a flat 150 g
+    ("1 cup rolled oats", 315),
+    ("1 cup spinach", 7),
+    ("2 tbsp tahini", 178),
+    ("250 ml oat milk", 120),
+    ("120 g chicken breast", 198),
+])
+def test_quantities_convert_to_grams_per_food(ingredient, calories):
+    assert meal_nutrition([ingredient])["calories"] == pytest.approx(calories, abs=2)
@@ -0,0 +1,63 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import app
+from meal_data import DAYS, DIET_TYPES, FALLBACK_TEMPLATES, MEAL_TYPES, thaw
+from plan_validation import PlanStreamValidator, PlanViolation
+
+
+@pytest.mark.parametrize("diet", DIET_TYPES)
+def test_fallback_templates_pass_their_diet(diet):
+    validator = PlanStreamValidator({"diet_type": diet})
+    text = json.dumps(thaw(FALLBACK_TEMPLATES[diet]))
+    # Fed in small pieces, as a stream would be
+    for start in range(0, len(text), 40):
+        validator.feed(text[start:start + 40])
+    validator.finish()
+    assert validator.meals_checked == 35
+
+
+def _stream_plan(plan):
+    """Stand-in for routed_completion that streams the plan into the validator"""
+    def completion(task, messages, stream_to=None):
+        text = json.dumps(plan)
+        for start in range(0, len(text), 40):
+            stream_to.feed(text[start:start + 40])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=None)
+    return completion
+
+
+def test_aborted_plan_keeps_valid_meals_and_replaces_only_the_rest(monkeypatch):
+    plan = thaw(FALLBACK_TEMPLATES["Vegetarian"])
+    plan["Wednesday"]["lunch"]["ingredients"].append("chicken breast")
+    replaced = []
+
+    def replacement(profile, day, meal_type, avoid):
+        replaced.append((day, meal_type))
+        return {**thaw(FALLBACK_TEMPLATES["Vegetarian"][day][meal_type]), "meal": f"new {day} {meal_type}"}
+
+    monkeypatch.setattr(app, "routed_completion", _stream_plan(plan))
+    monkeypatch.setattr(app, "generate_meal_replacement", replacement)
+    result = app.request_validated_plan([], {"diet_type": "Vegetarian"}, "json", local_nutrition=False)
+
+    cut = DAYS.index("Wednesday") * len(MEAL_TYPES) + MEAL_TYPES.index("lunch")
+    slots = [(day, meal_type) for day in DAYS for meal_type in MEAL_TYPES]
+    assert sorted(replaced) == sorted(slots[cut:])
+    assert result["Monday"]["breakfast"] == plan["Monday"]["breakfast"]
+    assert result["Wednesday"]["lunch"]["meal"] == "new Wednesday lunch"
+    assert list(result) == list(DAYS)
+
+
+def test_plan_that_stays_invalid_is_not_accepted(monkeypatch):
+    plan = thaw(FALLBACK_TEMPLATES["Vegan"])
+    plan["Sunday"]["dinner"]["ingredients"].append("cheddar cheese")
+
+    def replacement(profile, day, meal_type, avoid):
+        return plan[day][meal_type]
+
+    monkeypatch.setattr(app, "routed_completion", _stream_plan(plan))
+    monkeypatch.setattr(app, "generate_meal_replacement", replacement)
+    with pytest.raises(PlanViolation):
+        app.request_validated_plan([], {"diet_type": "Vegan"}, "json", local_nutrition=False)
@@ -0,0 +1,16 @@
+import os
+
+from check_startup import DEFAULT_BUDGET_MS, LAZY_MODULES, run_probe
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = float(os.getenv("MEAL_PLANNER_STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS))
+
+
+def test_cold_start_within_budget():
+    # Best of three, as check_startup.py does, so one slow run on a busy machine does not fail the suite
+    results = [run_probe(APP_DIR) for _ in range(3)]
+    assert min(result["import_ms"] for result in results) <= BUDGET_MS
+
+
+def test_heavy_modules_load_lazily():
+    assert run_probe(APP_DIR)["loaded"] == [], f"expected {', '.join(LAZY_MODULES)} to load on first use"
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-rerun profiler for the Streamlit UI.
+
+Streamlit re-executes the script on every interaction. With
+MEAL_PLANNER_PROFILE_UI set, each rerun records, per render function: wall
+time (total and self), the number of elements and widgets it emitted, and the
+net memory it allocated. Allocations are sampled: tracemalloc slows every
+allocation down several times, so it only runs during every Nth rerun, which
+also reports its top allocation sites.
+
+Reports are appended as JSON lines to a size-rotated file and handed back to
+the app for an in-page overlay. Timings can be exported in collapsed-stack
+format for flamegraph.pl, speedscope or inferno, either for this process or
+from a report file:
+
+    python ui_profiler.py /tmp/meal_planner_ui_profile.jsonl > stacks.txt
+
+Render functions opt in with the @profiled decorator; outside a profiled
+rerun (or with profiling off) it costs one attribute lookup per call.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+DEFAULT_REPORT_BYTES = 5 * 1024 * 1024
+DEFAULT_REPORT_BACKUPS = 3
+# Only every Nth rerun traces allocations, since tracing slows the whole process down
+DEFAULT_ALLOCATION_SAMPLE_EVERY = 10
+TOP_ALLOCATIONS = 10
+
+_active = threading.local()
+_setup_lock = threading.Lock()
+_enqueue_patched = False
+_logger = None
+_rerun_count = 0
+# Reruns currently tracing allocations; tracemalloc is process-wide, so the last one out stops it
+_tracing_reruns = 0
+_started_tracing = False
+# Process-wide collapsed stacks (microseconds) for flamegraph export
+_stacks = Counter()
+
+
+def profiling_enabled():
+    """True when MEAL_PLANNER_PROFILE_UI asks for per-rerun profiles"""
+    return bool(os.getenv("MEAL_PLANNER_PROFILE_UI"))
+
+
+def report_path():
+    """Rolling report file for profiled reruns"""
+    return os.getenv("MEAL_PLANNER_PROFILE_UI_FILE") or os.path.join(tempfile.gettempdir(), "meal_planner_ui_profile.jsonl")
+
+
+def _report_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("meal_planner.ui_profile")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = RotatingFileHandler(
+            report_path(),
+            maxBytes=int(os.getenv("MEAL_PLANNER_PROFILE_UI_MAX_BYTES", DEFAULT_REPORT_BYTES)),
+            backupCount=DEFAULT_REPORT_BACKUPS,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def _patch_element_counter():
+    """Count every element a script thread sends to the browser, attributed to the open section"""
+    global _enqueue_patched
+    if _enqueue_patched:
+        return
+    try:
+        from streamlit.delta_generator import DeltaGenerator
+    except ImportError:
+        return
+    original = getattr(DeltaGenerator, "_enqueue", None)
+    if original is None:
+        return
+
+    @functools.wraps(original)
+    def counting_enqueue(self, delta_type, *args, **kwargs):
+        profiler = getattr(_active, "profiler", None)
+        if profiler is not None:
+            profiler.count_element(delta_type)
+        return original(self, delta_type, *args, **kwargs)
+
+    DeltaGenerator._enqueue = counting_enqueue
+    _enqueue_patched = True
+
+
+class _Section:
+    __slots__ = ("path", "started", "memory_before", "child_seconds", "elements")
+
+    def __init__(self, path, memory_before):
+        self.path = path
+        self.started = time.perf_counter()
+        self.memory_before = memory_before
+        self.child_seconds = 0.0
+        self.elements = 0
+
+
+class RerunProfiler:
+    """Timings, element counts and allocations for one rerun of one session"""
+
+    def __init__(self, trace_allocations=False):
+        self.trace_allocations = trace_allocations
+        self._snapshot = tracemalloc.take_snapshot() if trace_allocations else None
+        self.started = time.perf_counter()
+        self.sections = {}
+        self.element_types = Counter()
+        self._stack = [_Section("main", self._memory())]
+
+    def _memory(self):
+        return tracemalloc.get_traced_memory()[0] if self.trace_allocations else 0
+
+    def count_element(self, delta_type):
+        self.element_types[delta_type] += 1
+        self._stack[-1].elements += 1
+
+    def enter(self, name):
+        self._stack.append(_Section(f"{self._stack[-1].path};{name}", self._memory()))
+
+    def exit(self):
+        self._close(self._stack.pop())
+
+    def _close(self, section):
+        elapsed = time.perf_counter() - section.started
+        if self._stack:
+            self._stack[-1].child_seconds += elapsed
+        totals = self.sections.setdefault(section.path, {"calls": 0, "ms": 0.0, "self_ms": 0.0, "elements": 0, "alloc_kb": 0.0})
+        totals["calls"] += 1
+        totals["ms"] += elapsed * 1000
+        totals["self_ms"] += (elapsed - section.child_seconds) * 1000
+        totals["elements"] += section.elements
+        # Net growth of traced memory; other threads' allocations are included, so treat it as a hint
+        totals["alloc_kb"] += (self._memory() - section.memory_before) / 1024
+
+    def finish(self, session=None):
+        """Close every open section and build the rerun report"""
+        while self._stack:
+            self._close(self._stack.pop())
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "session": session,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "elements": sum(self.element_types.values()),
+            "allocations_sampled": self.trace_allocations,
+            "element_types": dict(self.element_types.most_common()),
+            "sections": {
+                path: {field: round(value, 3) if isinstance(value, float) else value for field, value in totals.items()}
+                for path, totals in self.sections.items()
+            },
+        }
+        if self._snapshot is not None:
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+            after = tracemalloc.take_snapshot().filter_traces(ignore)
+            growth = [stat for stat in after.compare_to(self._snapshot.filter_traces(ignore), "lineno") if stat.size_diff > 0]
+            growth.sort(key=lambda stat: stat.size_diff, reverse=True)
+            report["top_allocations"] = [
+                {"site": str(stat.traceback[0]), "kb": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+                for stat in growth[:TOP_ALLOCATIONS]
+            ]
+        return report
+
+
+def profiled(fn):
+    """Record calls to a render function as a section of the current rerun's profile"""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profiler = getattr(_active, "profiler", None)
+        if profiler is None:
+            return fn(*args, **kwargs)
+        profiler.enter(name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.exit()
+    return wrapper
+
+
+@contextmanager
+def profile_rerun(session=None, on_report=None):
+    """Profile the enclosed rerun when MEAL_PLANNER_PROFILE_UI is set, then write and hand back its report"""
+    global _rerun_count, _tracing_reruns, _started_tracing
+    if not profiling_enabled():
+        yield
+        return
+
+    with _setup_lock:
+        _patch_element_counter()
+        _rerun_count += 1
+        every = int(os.getenv("MEAL_PLANNER_PROFILE_UI_ALLOC_EVERY", DEFAULT_ALLOCATION_SAMPLE_EVERY))
+        trace_allocations = every > 0 and _rerun_count % every == 0
+        if trace_allocations:
+            _tracing_reruns += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracing = True
+
+    profiler = _active.profiler = RerunProfiler(trace_allocations)
+    try:
+        yield profiler
+    finally:
+        _active.profiler = None
+        report = profiler.finish(session() if callable(session) else session)
+        with _setup_lock:
+            if trace_allocations:
+                _tracing_reruns -= 1
+                if not _tracing_reruns and _started_tracing:
+                    tracemalloc.stop()
+                    _started_tracing = False
+            for path, totals in report["sections"].items():
+                _stacks[path] += int(totals["self_ms"] * 1000)
+        try:
+            _report_logger().info(json.dumps(report, separators=(",", ":")))
+        except OSError:
+            pass
+        if on_report is not None:
+            on_report(report)
+
+
+def collapsed_stacks(reports=None):
+    """Self time per stack in collapsed format ("main;fn;child 1234", microseconds)"""
+    if reports is None:
+        with _setup_lock:
+            stacks = Counter(_stacks)
+    else:
+        stacks = Counter()
+        for report in reports:
+            for path, totals in report["sections"].items():
+                stacks[path] += int(totals["self_ms"] * 1000)
+    return "\n".join(f"{path} {micros}" for path, micros in sorted(stacks.items()) if micros > 0) + "\n"
+
+
+def read_reports(path):
+    """Reports from a profile file and its rotated backups, oldest first"""
+    paths = [f"{path}.{index}" for index in range(DEFAULT_REPORT_BACKUPS, 0, -1)] + [path]
+    reports = []
+    for candidate in paths:
+        if not os.path.exists(candidate):
+            continue
+        with open(candidate, encoding="utf-8") as f:
+            reports.extend(json.loads(line) for line in f if line.strip())
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert UI profile reports to collapsed stacks for a flamegraph")
+    parser.add_argument("path", nargs="?", default=report_path(), help="Report file (rotated backups are read too)")
+    args = parser.parse_args()
+
+    reports = read_reports(args.path)
+    if not reports:
+        sys.exit(f"No profiled reruns found in {args.path}")
+    sys.stdout.write(collapsed_stacks(reports))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Cross-week variety index for meal plans.
+
+Each meal is reduced to a set of features (meal name words and ingredients),
+summarised with MinHash and bucketed with LSH banding, so near-duplicates of
+meals from earlier weeks can be found without comparing against every meal.
+"""
+
+import random
+import re
+import zlib
+
+from ingredients import normalize
+from meal_data import DAYS, MEAL_TYPES
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+# Estimated Jaccard similarity at or above which two meals count as a repeat
+DEFAULT_THRESHOLD = 0.5
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1729)
+_PERMUTATIONS = tuple((_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM))
+
+_WORD_RE = re.compile(r"[a-z]+")
+_NAME_STOPWORDS = frozenset({"with", "and", "in", "on", "of", "the", "a", "style", "fresh"})
+
+
+def meal_features(meal):
+    """Feature set for a meal: words from its name plus its ingredients"""
+    features = set()
+    for word in _WORD_RE.findall(str(meal.get("meal", "")).lower()):
+        if word not in _NAME_STOPWORDS:
+            # Crude singularisation so "eggs" and "egg" share a feature
+            features.add("n:" + (word[:-1] if len(word) > 3 and word.endswith("s") else word))
+    for ingredient in meal.get("ingredients", []):
+        # Normalized so "120 g salmon" and "Salmon" share a feature
+        features.add("i:" + (normalize(ingredient) or " ".join(str(ingredient).lower().split())))
+    return features
+
+
+def minhash_signature(features):
+    """MinHash signature of a feature set"""
+    if not features:
+        return (_MAX_HASH,) * NUM_PERM
+    hashes = [zlib.crc32(feature.encode("utf-8")) for feature in features]
+    return tuple(
+        min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimated_similarity(signature_a, signature_b):
+    """Fraction of matching signature slots, an estimate of Jaccard similarity"""
+    matches = sum(1 for x, y in zip(signature_a, signature_b) if x == y)
+    return matches / NUM_PERM
+
+
+def _band_keys(signature):
+    for band in range(BANDS):
+        start = band * ROWS_PER_BAND
+        yield band, signature[start:start + ROWS_PER_BAND]
+
+
+class VarietyIndex:
+    """MinHash/LSH index over meals from a user's previous plans"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._meals = {}
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._meals)
+
+    def add(self, key, meal):
+        """Index one meal under a caller-chosen key"""
+        if not isinstance(meal, dict):
+            return
+        signature = minhash_signature(meal_features(meal))
+        self._meals[key] = (meal.get("meal", ""), signature)
+        for band_key in _band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def add_plan(self, plan_id, meal_plan):
+        """Index every meal in a 7-day plan"""
+        for day in DAYS:
+            day_plan = meal_plan.get(day)
+            if isinstance(day_plan, dict):
+                for meal_type in MEAL_TYPES:
+                    self.add((plan_id, day, meal_type), day_plan.get(meal_type))
+
+    def query(self, meal):
+        """Indexed meals similar to the given one, most similar first"""
+        if not isinstance(meal, dict) or not self._meals:
+            return []
+        signature = minhash_signature(meal_features(meal))
+        candidates = set()
+        for band_key in _band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        matches = []
+        for key in candidates:
+            name, other = self._meals[key]
+            similarity = estimated_similarity(signature, other)
+            if similarity >= self.threshold:
+                matches.append({"key": key, "meal": name, "similarity": similarity})
+        return sorted(matches, key=lambda match: match["similarity"], reverse=True)
+
+
+def build_index(past_plans, threshold=DEFAULT_THRESHOLD):
+    """Index a list of earlier meal plans, oldest first"""
+    index = VarietyIndex(threshold)
+    for plan_id, meal_plan in enumerate(past_plans):
+        index.add_plan(plan_id, meal_plan)
+    return index
+
+
+def find_repeats(meal_plan, index):
+    """Meals in a plan that closely repeat a meal from an earlier plan"""
+    repeats = []
+    for day in DAYS:
+        day_plan = meal_plan.get(day)
+        if not isinstance(day_plan, dict):
+            continue
+        for meal_type in MEAL_TYPES:
+            matches = index.query(day_plan.get(meal_type))
+            if matches:
+                repeats.append({
+                    "day": day,
+                    "meal_type": meal_type,
+                    "meal": day_plan[meal_type].get("meal", ""),
+                    "similar_to": matches[0]["meal"],
+                    "similarity": matches[0]["similarity"],
+                })
+    return repeats